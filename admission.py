@@ -0,0 +1,168 @@
+"""
+Admission control: per-session rate limits and global concurrency caps.
+
+Every session gets one token bucket per Socket.IO event type, so a client
+that floods `command`, `get_ai_suggestions` or `get_system_info` only
+exhausts its own allowance for that event. Expensive work (spawned
+commands, LLM calls) is further capped across all sessions of the worker,
+and one session may only hold a share of the subprocess slots, so a few
+sessions cannot take all of them. Nothing here waits: an event without a
+token, or work without a free slot, is refused at once so the caller can
+answer "busy" instead of queueing behind everyone else on the single
+eventlet hub.
+
+Limits are `rate:burst` pairs, rate in events per second; a rate of 0
+disables limiting for that event. RATE_LIMITS overrides single events
+(e.g. `command=5:10,get_system_info=0.5:2`) and RATE_LIMIT_DEFAULT covers
+events not listed.
+"""
+
+import os
+import threading
+import time
+
+# (events per second, burst) per event type
+DEFAULT_RATE_LIMITS = {
+    'command': (10, 20),
+    'batch': (1, 3),
+    # Raw keystrokes, pastes and ^C for foreground programs
+    'terminal_input': (50, 100),
+    # Fired on every keystroke
+    'get_ai_suggestions': (10, 20),
+    'interpret_natural_language': (2, 5),
+    'explain_command': (2, 5),
+    # The sidebar polls every few seconds
+    'get_system_info': (1, 3),
+}
+DEFAULT_RATE_LIMIT = (20, 40)
+
+MAX_CONCURRENT_SUBPROCESSES = int(os.environ.get('MAX_CONCURRENT_SUBPROCESSES', 32))
+# Share of the worker-wide subprocess slots one session may hold at once
+MAX_SESSION_SUBPROCESSES = int(os.environ.get('MAX_SESSION_SUBPROCESSES', 8))
+MAX_CONCURRENT_LLM_CALLS = int(os.environ.get('MAX_CONCURRENT_LLM_CALLS', 4))
+
+
+class Busy(Exception):
+    """Work refused because every slot of a ConcurrencyLimit is taken"""
+
+
+def parse_limit(value):
+    """(rate, burst) from 'rate:burst' or 'rate' (burst defaults to the rate)"""
+    rate, _, burst = value.partition(':')
+    rate = float(rate)
+    burst = float(burst) if burst.strip() else max(rate, 1)
+    if rate < 0 or burst < 1:
+        raise ValueError(f'invalid rate limit {value!r}')
+    return rate, burst
+
+
+def limits_from_env():
+    """Per-event limits and the default, with RATE_LIMITS/RATE_LIMIT_DEFAULT applied"""
+    limits = dict(DEFAULT_RATE_LIMITS)
+    default = DEFAULT_RATE_LIMIT
+    value = os.environ.get('RATE_LIMIT_DEFAULT', '').strip()
+    if value:
+        try:
+            default = parse_limit(value)
+        except ValueError:
+            print(f"Warning: ignoring invalid RATE_LIMIT_DEFAULT {value!r}")
+    for entry in os.environ.get('RATE_LIMITS', '').split(','):
+        event, _, value = entry.partition('=')
+        if not entry.strip():
+            continue
+        try:
+            limits[event.strip()] = parse_limit(value)
+        except ValueError:
+            print(f"Warning: ignoring invalid RATE_LIMITS entry {entry.strip()!r}")
+    return limits, default
+
+
+class TokenBucket:
+    """`burst` tokens, refilled at `rate` per second"""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        """Spend a token if one is left"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self):
+        """Seconds until the next token is available"""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """Token buckets per (session, event type), created on first use"""
+
+    def __init__(self, limits=None, default=DEFAULT_RATE_LIMIT, clock=time.monotonic):
+        self.limits = DEFAULT_RATE_LIMITS if limits is None else limits
+        self.default = default
+        self.clock = clock
+        # sid -> {event: TokenBucket}
+        self.buckets = {}
+
+    @classmethod
+    def from_env(cls):
+        limits, default = limits_from_env()
+        return cls(limits, default)
+
+    def check(self, sid, event):
+        """None if the event may be handled now, else seconds to wait before retrying"""
+        rate, burst = self.limits.get(event, self.default)
+        if not rate:
+            return None
+        buckets = self.buckets.setdefault(sid, {})
+        bucket = buckets.get(event)
+        if bucket is None:
+            bucket = buckets[event] = TokenBucket(rate, burst, self.clock)
+        if bucket.take():
+            return None
+        return bucket.retry_after()
+
+    def forget(self, sid):
+        self.buckets.pop(sid, None)
+
+
+class ConcurrencyLimit:
+    """Non-blocking semaphore: at most `limit` holders at once (0 = unlimited)"""
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit or None
+        self.in_use = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a slot if one is free; never waits"""
+        with self._lock:
+            if self.limit is not None and self.in_use >= self.limit:
+                return False
+            self.in_use += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def busy_message(self):
+        return f'Server busy: all {self.limit} {self.name} slots are in use; try again shortly'
+
+
+# Shared by every session of this worker
+SUBPROCESS_SLOTS = ConcurrencyLimit('subprocess', MAX_CONCURRENT_SUBPROCESSES)
+LLM_SLOTS = ConcurrencyLimit('LLM call', MAX_CONCURRENT_LLM_CALLS)
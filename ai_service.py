@@ -1,14 +1,17 @@
-import openai
 import os
 import re
 from typing import Dict, List, Optional
 import json
+import time
+import metrics
+from admission import LLM_SLOTS, Busy
+from lazy import LazyObject
 
 class AICommandInterpreter:
     def __init__(self):
-        # Initialize OpenAI client
-        self.client = None
-        self.setup_openai()
+        # The OpenAI client (and the openai package) is loaded on first use
+        self._client = None
+        self._client_ready = False
         
         # Command patterns for fallback
         self.command_patterns = {
@@ -34,11 +37,19 @@ class AICommandInterpreter:
             'help': 'help'
         }
     
+    @property
+    def client(self):
+        if not self._client_ready:
+            self.setup_openai()
+        return self._client
+    
     def setup_openai(self):
         """Setup OpenAI client with API key from environment"""
+        self._client_ready = True
         api_key = os.getenv('OPENAI_API_KEY')
         if api_key:
-            self.client = openai.OpenAI(api_key=api_key)
+            import openai
+            self._client = openai.OpenAI(api_key=api_key)
         else:
             print("Warning: OPENAI_API_KEY not found. AI features will use fallback patterns.")
     
@@ -87,8 +98,8 @@ class AICommandInterpreter:
             
             Complete command:"""
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self._chat_completion(
+                'interpret',
                 messages=[
                     {"role": "system", "content": "You are a helpful terminal command interpreter. Always extract file/folder names and create complete commands."},
                     {"role": "user", "content": prompt}
@@ -116,6 +127,26 @@ class AICommandInterpreter:
         
         return None
     
+    def _chat_completion(self, operation: str, **kwargs):
+        """Call the chat completions API, recording latency and errors
+
+        Raises Busy without calling the API when MAX_CONCURRENT_LLM_CALLS
+        calls are already in flight; callers then use their fallback.
+        """
+        if not LLM_SLOTS.acquire():
+            metrics.LOAD_SHED.inc(operation, 'llm_concurrency')
+            raise Busy(LLM_SLOTS.busy_message())
+        metrics.LLM_CALLS.inc(operation)
+        started = time.perf_counter()
+        try:
+            return self.client.chat.completions.create(model="gpt-3.5-turbo", **kwargs)
+        except Exception:
+            metrics.LLM_ERRORS.inc(operation)
+            raise
+        finally:
+            LLM_SLOTS.release()
+            metrics.LLM_LATENCY.observe(operation, value=time.perf_counter() - started)
+    
     def _pattern_interpret(self, natural_language: str) -> Dict:
         """Fallback pattern matching for command interpretation"""
         confidence = 0.0
@@ -310,8 +341,8 @@ class AICommandInterpreter:
         try:
             prompt = f"Explain what this terminal command does in simple terms: {command}"
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self._chat_completion(
+                'explain',
                 messages=[
                     {"role": "system", "content": "You are a helpful terminal command explainer. Keep explanations simple and clear."},
                     {"role": "user", "content": prompt}
@@ -347,5 +378,5 @@ class AICommandInterpreter:
         base_command = command.split()[0].lower()
         return explanations.get(base_command, f"Executes the command: {command}")
 
-# Global AI service instance
-ai_service = AICommandInterpreter()
+# Global AI service instance, built on first use
+ai_service = LazyObject(AICommandInterpreter)
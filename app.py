@@ -1,21 +1,91 @@
-from flask import Flask, render_template, request, jsonify
-from flask_socketio import SocketIO, emit
-import subprocess
 import os
-import psutil
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+if os.environ.get('SOCKETIO_MESSAGE_QUEUE'):
+    # With a message queue the broker client uses blocking sockets, which must
+    # cooperate with the eventlet hub; patch before anything else imports them
+    import eventlet
+    eventlet.monkey_patch()
+elif 'EVENTLET_NO_GREENDNS' not in os.environ:
+    # Nothing resolves names through eventlet without monkey patching, so skip
+    # its green DNS resolver (dnspython), a large share of cold start time
+    os.environ['EVENTLET_NO_GREENDNS'] = 'yes'
+    import eventlet.green.socket
+    del os.environ['EVENTLET_NO_GREENDNS']
+
+from flask import Flask, render_template, request, jsonify, Response, send_file
+from flask_socketio import SocketIO, emit, join_room, leave_room
+import subprocess
 import json
 import shutil
+import shlex
+import hmac
+import signal
+import resource
 from datetime import datetime
+from functools import wraps
 import threading
 import queue
-import time
-import eventlet
-import eventlet.wsgi
+import uuid
+import urllib.parse
+import metrics
+from lazy import lazy_import, LazyObject
+from scrollback import ScrollbackStore, INLINE_MAX_CHARS
+from commands import CommandRegistry
+from jobs import JobSupervisor, JobError, parse_signal, STOPPED, RUNNING
+from batch import BatchRunner, BatchError, BATCH_MAX_PARALLEL, parse_request, succeeded
+from disk_probe import DiskProbe
+from transfer import SendfileMiddleware, TransferError, receive_upload, upload_status
+from tables import Table, FormatError, FORMATS, TEXT, encode, shape_result
+from admission import RateLimiter, ConcurrencyLimit, SUBPROCESS_SLOTS, MAX_SESSION_SUBPROCESSES
+from limits import ResourceLimits, SessionBudget, SessionCgroup, Usage, run_limited
+from session_store import create_store, valid_session_id
+
+# Loaded on first use: only some commands, PTY mode and admin endpoints need them
+psutil = lazy_import('psutil')
+pty_shell = lazy_import('pty_shell')
+profiler = lazy_import('profiler')
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'terminal_secret_key_fallback')
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
+# File downloads go out with sendfile() (see transfer.py); wrapped before
+# Socket.IO so its own requests never pass through
+app.wsgi_app = SendfileMiddleware(app.wsgi_app)
+# Several workers share broadcasts through a message queue (e.g. redis://)
+# and run behind a sticky load balancer; see cluster.py
+MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+WORKER_ID = os.environ.get('WORKER_ID', '0')
+# Compress polling payloads above 1 KB; large outputs are also spooled server-side
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet',
+                    http_compression=True, compression_threshold=1024,
+                    message_queue=MESSAGE_QUEUE,
+                    channel=os.environ.get('SOCKETIO_CHANNEL', 'terminal'))
+
+# Working directory and history per browser session, recoverable by any worker
+session_store = create_store(os.environ.get('SESSION_STORE', ''))
+METRICS_BROADCAST_INTERVAL = float(os.environ.get('METRICS_BROADCAST_INTERVAL', 5))
+
+# Limits on spawned commands; COMMAND_* apply to foreground commands and JOB_*
+# to background jobs and the PTY shell (see limits.py for all settings)
+COMMAND_TIMEOUT = float(os.environ.get('COMMAND_TIMEOUT', 15))
+COMMAND_LIMITS = ResourceLimits.from_env('COMMAND', cpu_default=30)
+JOB_LIMITS = ResourceLimits.from_env('JOB', cpu_default=1800)
+
+# 'spawn' runs each command in a fresh /bin/sh; 'pty' keeps one bash per session
+SHELL_MODE = os.environ.get('TERMINAL_SHELL_MODE', 'spawn')
+PTY_COMMAND_TIMEOUT = float(os.environ.get('PTY_COMMAND_TIMEOUT', 300))
+
+# Largest file accepted by /files/upload (empty = unlimited)
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES') or 0) or None
+
+# Token buckets per session and event type; see admission.py for the defaults
+rate_limiter = RateLimiter.from_env()
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+MAX_PROFILE_SECONDS = 60
 
 class AIService:
     """AI service using pattern matching (no external API required)"""
@@ -130,18 +200,87 @@ class AIService:
         cmd_base = command.split()[0] if command.split() else command
         return explanations.get(cmd_base, f'Command: {command}')
 
-# Initialize AI service
-ai_service = AIService()
+# Initialize AI service on first use
+ai_service = LazyObject(AIService)
+
+# Builtin commands, registered by the TerminalBackend handlers below and by plugins
+command_registry = CommandRegistry()
+# Shared by df, top and the sidebar so a hung mount is probed once, not per request
+disk_probe = DiskProbe(on_timeout=lambda mountpoint: metrics.DISK_PROBE_TIMEOUTS.inc())
 
 class TerminalBackend:
     def __init__(self):
         self.current_dir = os.getcwd()
         self.command_history = []
         self.history_index = -1
+        self.scrollback = ScrollbackStore()
+        self.shell = None
+        self.jobs = JobSupervisor(spawn=socketio.start_background_task, on_change=self._job_changed)
+        self.budget = SessionBudget.from_env()
+        self.cgroup = SessionCgroup.for_session(f'session-{uuid.uuid4().hex[:16]}')
+        # This session's share of SUBPROCESS_SLOTS
+        self.slots = ConcurrencyLimit('per-session subprocess', MAX_SESSION_SUBPROCESSES)
+        self.foreground_job = None
+        # Set by the socket layer to stream PTY output as it arrives and to
+        # report background job status changes
+        self.stream = None
+        self.notify = None
+        self.session_id = None
+    
+    def export_state(self):
+        """State that survives reconnecting to another worker"""
+        return {'current_dir': self.current_dir, 'command_history': self.command_history}
+    
+    def restore_state(self, state):
+        """Resume a session exported by this or another worker"""
+        if os.path.isdir(state.get('current_dir') or ''):
+            self.current_dir = state['current_dir']
+        self.command_history = list(state.get('command_history', []))
+        self.history_index = len(self.command_history) - 1
+    
+    @property
+    def busy(self):
+        """Whether a program is attached to the terminal and takes its input"""
+        return (self.foreground_job is not None
+                or (self.shell is not None and self.shell.busy))
+    
+    def send_input(self, data):
+        """Pass keystrokes to the foreground job or the program in the PTY shell"""
+        job = self.foreground_job
+        if job is not None:
+            if data == '\x03':
+                job.signal(signal.SIGINT)
+            elif data == '\x1a':
+                self.jobs.stop(job)
+            else:
+                job.send_input(data)
+        elif self.shell is not None and self.shell.busy:
+            self.shell.send_input(data)
+    
+    def close(self):
+        """Release per-session resources"""
+        self.jobs.close()
+        self.scrollback.clear()
+        if self.shell is not None:
+            self.shell.close()
+            self.shell = None
+        if self.cgroup is not None:
+            self.cgroup.remove()
     
     def execute_command(self, command):
         """Execute terminal commands and return output"""
         try:
+            # A trailing & runs the command as a background job
+            if is_background(command):
+                return self.start_job(command.rstrip()[:-1].rstrip())
+            
+            # Builtins are looked up by name after tokenising once
+            spec, args = command_registry.resolve(command)
+            if spec is not None:
+                if args is None:
+                    return {'type': 'error', 'output': f'{spec.name}: missing operand\nUsage: {spec.usage}'}
+                return self._run_builtin(spec.name, spec.handler, self, args)
+
             # Check if this is a natural language command
             if self._is_natural_language(command):
                 ai_result = ai_service.interpret_command(command)
@@ -160,76 +299,212 @@ class TerminalBackend:
                     else:
                         return {'type': 'error', 'output': f"Could not understand: '{command}'. Type 'help' for available commands."}
 
-            # Handle special commands
-            if command.strip() == 'clear':
-                return {'type': 'clear', 'output': ''}
-            elif command.strip() == 'history':
-                return {'type': 'output', 'output': '\n'.join([f"{i+1}: {cmd}" for i, cmd in enumerate(self.command_history)])}
-            elif command.startswith('cd '):
-                return self.handle_cd(command)
-            elif command.strip() == 'pwd':
-                return {'type': 'output', 'output': self.current_dir}
-            elif command.startswith('ls'):
-                return self.handle_ls(command)
-            elif command.startswith('mkdir '):
-                return self.handle_mkdir(command)
-            elif command.startswith('rm '):
-                return self.handle_rm(command)
-            elif command.startswith('cat '):
-                return self.handle_cat(command)
-            elif command.strip() == 'ps':
-                return self.handle_ps()
-            elif command.strip() == 'top':
-                return self.handle_top()
-            elif command.strip() == 'df':
-                return self.handle_df()
-            elif command.strip() == 'free':
-                return self.handle_free()
-            elif command.strip() == 'ai-help':
-                return self.handle_ai_help()
-            elif command.strip() == 'help':
-                return self.handle_help()
-
+            return self.run_external(command)
+        except Exception as e:
+            return {'type': 'error', 'output': f'Error: {str(e)}'}
+    
+    def _check_forbidden(self, command):
+        """Error result for dangerous commands, None if the command may run"""
+        forbidden = ['rm -rf /', 'shutdown', 'reboot', 'poweroff', ':(){:|:&};:', 'format', 'fdisk', 'mkfs']
+        for bad in forbidden:
+            if bad in command.lower():
+                return {'type': 'error', 'output': 'Dangerous command blocked for security.'}
+        return None
+    
+    def run_external(self, command):
+        """Run a non-builtin command in the foreground"""
+        try:
             # Basic command validation: block dangerous commands
-            forbidden = ['rm -rf /', 'shutdown', 'reboot', 'poweroff', ':(){:|:&};:', 'format', 'fdisk', 'mkfs']
-            for bad in forbidden:
-                if bad in command.lower():
-                    return {'type': 'error', 'output': 'Dangerous command blocked for security.'}
-
-            # Use Popen for real-time output streaming
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                cwd=self.current_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True
-            )
-            output_lines = []
+            blocked = self._check_forbidden(command)
+            if blocked:
+                return blocked
+
+            if SHELL_MODE == 'pty':
+                return self.run_in_shell(command)
+
+            exhausted = self.budget.exhausted()
+            if exhausted:
+                metrics.LIMITS_EXCEEDED.inc('session')
+                return {'type': 'error', 'output': exhausted}
+            limits = self.budget.limits_for(COMMAND_LIMITS)
+            busy = self._take_slot()
+            if busy:
+                return busy
+            
+            metrics.SUBPROCESS_SPAWNS.inc()
+            spool = None
             try:
-                # Read output line by line
-                for line in iter(process.stdout.readline, ''):
-                    if not line:
-                        break
-                    output_lines.append(line.rstrip())
-                process.stdout.close()
-                process.wait(timeout=15)
-            except subprocess.TimeoutExpired:
-                process.kill()
-                return {'type': 'error', 'output': 'Command timed out (15s limit)'}
+                # Spool lines as they arrive so large outputs never sit in memory whole
+                spool = self.scrollback.open()
+                run = run_limited(command, self.current_dir, limits, lambda line: spool.write(line.rstrip()),
+                                  timeout=COMMAND_TIMEOUT, cgroup=self.cgroup)
             except Exception as e:
-                process.kill()
+                if spool is not None:
+                    self.scrollback.discard(spool)
                 return {'type': 'error', 'output': f'Error: {str(e)}'}
-
-            output = '\n'.join(output_lines)
-            return {'type': 'output', 'output': output, 'return_code': process.returncode}
+            finally:
+                self._release_slot()
+            self.budget.charge(run.usage, run.output_bytes)
+            metrics.SUBPROCESS_LATENCY.observe(value=run.usage.wall_time)
+            
+            if run.stopped == 'timeout':
+                self.scrollback.discard(spool)
+                metrics.SUBPROCESS_TIMEOUTS.inc()
+                return {'type': 'error', 'output': f'Command timed out ({COMMAND_TIMEOUT:g}s limit)',
+                        'usage': run.usage.to_dict()}
+            
+            result = self.scrollback.finish(spool, {
+                'type': 'output',
+                'return_code': run.return_code,
+                'usage': run.usage.to_dict()
+            })
+            violation = run.violation(limits)
+            if violation:
+                metrics.LIMITS_EXCEEDED.inc('output' if run.stopped == 'output' else 'cpu')
+                result['type'] = 'error'
+                result['output'] = (result['output'] + '\n' if result['output'] else '') + violation
+            return result
         except Exception as e:
             return {'type': 'error', 'output': f'Error: {str(e)}'}
     
+    def start_job(self, command):
+        """Run a command in the background under the session's job supervisor"""
+        if not command:
+            return {'type': 'error', 'output': "syntax error near unexpected token `&'"}
+        blocked = self._check_forbidden(command)
+        if blocked:
+            return blocked
+        exhausted = self.budget.exhausted()
+        if exhausted:
+            metrics.LIMITS_EXCEEDED.inc('session')
+            return {'type': 'error', 'output': exhausted}
+        limits = self.budget.limits_for(JOB_LIMITS)
+        # Jobs only hold a slot while being spawned; MAX_JOBS caps how many run
+        busy = self._take_slot()
+        if busy:
+            return busy
+        try:
+            job = self.jobs.start(command, self.current_dir, preexec_fn=limits.preexec(self.cgroup),
+                                  max_output_bytes=limits.output_bytes)
+        except JobError as e:
+            return {'type': 'error', 'output': f'Could not start job: {str(e)}'}
+        finally:
+            self._release_slot()
+        metrics.SUBPROCESS_SPAWNS.inc()
+        metrics.BACKGROUND_JOBS.inc()
+        return {'type': 'output', 'output': f'[{job.id}] {job.pid}', 'job': {'id': job.id, 'pid': job.pid}}
+    
+    def _job_changed(self, job):
+        if job.done:
+            metrics.BACKGROUND_JOBS.dec()
+            job.usage = Usage.from_rusage(job.rusage, job.ended - job.started)
+            self.budget.charge(job.usage, job.output_bytes)
+            if job.stopped == 'output':
+                metrics.LIMITS_EXCEEDED.inc('output')
+        # The foreground job is reported by fg itself
+        if self.notify is not None and job is not self.foreground_job:
+            self.notify(job)
+            # As in bash, a job announced as finished is not listed again
+            job.reported = job.done
+    
+    def _take_slot(self):
+        """Take a session and a worker subprocess slot; a busy result if either is full"""
+        if not self.slots.acquire():
+            metrics.LOAD_SHED.inc('command', 'session_concurrency')
+            return {'type': 'busy', 'output': self.slots.busy_message()}
+        if not SUBPROCESS_SLOTS.acquire():
+            self.slots.release()
+            metrics.LOAD_SHED.inc('command', 'subprocess_concurrency')
+            return {'type': 'busy', 'output': SUBPROCESS_SLOTS.busy_message()}
+        return None
+    
+    def _release_slot(self):
+        SUBPROCESS_SLOTS.release()
+        self.slots.release()
+    
+    def run_in_shell(self, command):
+        """Run a command in this session's persistent PTY shell"""
+        busy = self._take_slot()
+        if busy:
+            return busy
+        
+        streamed = {'chars': 0, 'complete': True, 'bytes': 0, 'interrupted': False}
+        
+        def on_output(text):
+            streamed['bytes'] += len(text.encode('utf-8', 'replace'))
+            if JOB_LIMITS.output_bytes and streamed['bytes'] > JOB_LIMITS.output_bytes:
+                # Over the output limit: interrupt once and drop the rest
+                if not streamed['interrupted']:
+                    streamed['interrupted'] = True
+                    self.shell.send_input('\x03')
+                return
+            spool.feed(text)
+            # Stream the start live; anything beyond the budget is only spooled
+            if self.stream and streamed['chars'] < INLINE_MAX_CHARS:
+                streamed['chars'] += len(text)
+                self.stream(text)
+            else:
+                streamed['complete'] = False
+        
+        started = time.perf_counter()
+        spool = None
+        try:
+            # Created only once a slot is held, and started by its first run()
+            if self.shell is None:
+                self.shell = pty_shell.PtyShell(self.current_dir, preexec_fn=JOB_LIMITS.preexec(self.cgroup))
+            spool = self.scrollback.open()
+            # A shell restarted after exit or hang-up resumes in the session's directory
+            _, status, timed_out = self.shell.run(command, on_output, timeout=PTY_COMMAND_TIMEOUT,
+                                                  cwd=self.current_dir)
+        except (pty_shell.ShellError, OSError) as e:
+            if spool is not None:
+                self.scrollback.discard(spool)
+            return {'type': 'error', 'output': f'Shell error: {str(e)}'}
+        finally:
+            self._release_slot()
+            elapsed = time.perf_counter() - started
+            metrics.SUBPROCESS_LATENCY.observe(value=elapsed)
+        
+        if self.shell.pid is not None:
+            self.current_dir = self.shell.cwd_now()
+        if timed_out:
+            self.scrollback.discard(spool)
+            metrics.SUBPROCESS_TIMEOUTS.inc()
+            return {'type': 'error', 'output': f'Command interrupted ({PTY_COMMAND_TIMEOUT:g}s limit)'}
+        
+        # The shell's children are not ours to wait4(), so only wall time is known
+        result = {'type': 'output', 'return_code': status, 'streamed': bool(self.stream),
+                  'usage': Usage(elapsed).to_dict()}
+        if streamed['interrupted']:
+            metrics.LIMITS_EXCEEDED.inc('output')
+            self.budget.charge(None, streamed['bytes'])
+            spool.feed(('\n' if spool.partial else '') +
+                       f"Output limit exceeded ({JOB_LIMITS.output_bytes} bytes); command interrupted\n")
+            result['type'] = 'error'
+            streamed['complete'] = False
+        if self.stream and streamed['complete']:
+            self.scrollback.discard(spool)
+            result['output'] = ''
+            return result
+        return self.scrollback.finish(spool, result)
+    
+    def _sync_shell_cwd(self):
+        """Keep the PTY shell's directory in step with the cd builtin"""
+        if self.shell is not None and self.shell.alive and not self.shell.busy:
+            try:
+                self.shell.run(f'cd {shlex.quote(self.current_dir)}', timeout=5)
+            except (pty_shell.ShellError, OSError):
+                pass
+    
+    def _run_builtin(self, name, handler, *args):
+        """Run a builtin handler, recording its count and latency"""
+        metrics.BUILTINS.inc(name)
+        with metrics.BUILTIN_LATENCY.time(name):
+            return handler(*args)
+    
     def _is_natural_language(self, command):
         """Check if the command appears to be natural language"""
-        known_commands = ['ls', 'cd', 'pwd', 'mkdir', 'rm', 'cat', 'ps', 'top', 'df', 'free', 'clear', 'help', 'history', 'ai-help']
-        if command.strip().split()[0] in known_commands:
+        if command.strip().split()[0] in command_registry.commands:
             return False
         
         natural_indicators = [
@@ -241,7 +516,138 @@ class TerminalBackend:
         command_lower = command.lower()
         return any(indicator in command_lower for indicator in natural_indicators)
     
-    def handle_help(self):
+    @command_registry.command('clear', max_args=0, help='Clear screen')
+    def handle_clear(self, args):
+        """Handle clear command"""
+        return {'type': 'clear', 'output': ''}
+    
+    @command_registry.command('history', max_args=0, help='Command history')
+    def handle_history(self, args):
+        """Handle history command"""
+        return {'type': 'output', 'output': '\n'.join([f"{i+1}: {cmd}" for i, cmd in enumerate(self.command_history)])}
+    
+    @command_registry.command('pwd', max_args=0, help='Show current directory')
+    def handle_pwd(self, args):
+        """Handle pwd command"""
+        return {'type': 'output', 'output': self.current_dir}
+    
+    @command_registry.command('jobs', max_args=1, flags=('-l',), usage='jobs [-l]', help='List background jobs')
+    def handle_jobs(self, args):
+        """Handle jobs command"""
+        return {'type': 'output', 'output': '\n'.join(self.jobs.listing(show_pid='-l' in args))}
+    
+    @command_registry.command('fg', max_args=1, usage='fg [%job]', help='Bring a job to the foreground')
+    def handle_fg(self, args):
+        """Handle fg command: attach to a job until it exits or is stopped"""
+        spec = args[0] if args else None
+        job = self.jobs.get(spec)
+        if job is None:
+            return {'type': 'error', 'output': f"fg: {spec or 'current'}: no such job"}
+        if job.done:
+            self.jobs.remove(job)
+            return {'type': 'output', 'output': job.output.text(job.shown), 'return_code': job.return_code,
+                    'usage': job.usage.to_dict() if job.usage else None}
+        
+        self.jobs.resume(job)
+        self.foreground_job = job
+        if self.stream:
+            # Show what the job printed while in the background, then follow it
+            backlog = job.output.text(job.shown)
+            self.stream(job.command + '\n' + (backlog + '\n' if backlog else ''))
+            job.listener = self.stream
+        try:
+            self.jobs.wait(job)
+        finally:
+            job.listener = None
+            self.foreground_job = None
+        
+        if job.state == STOPPED:
+            job.shown = job.output.total
+            return {'type': 'output', 'output': '\n' + job.describe(current=True)}
+        self.jobs.remove(job)
+        usage = job.usage.to_dict() if job.usage else None
+        if self.stream:
+            return {'type': 'output', 'output': '', 'streamed': True, 'return_code': job.return_code, 'usage': usage}
+        return {'type': 'output', 'output': job.output.text(job.shown), 'return_code': job.return_code, 'usage': usage}
+    
+    @command_registry.command('time', min_args=1, raw=True, usage='time <command>',
+                              help='Run a command and report its resource usage')
+    def handle_time(self, args):
+        """Handle time command"""
+        started = time.perf_counter()
+        before = resource.getrusage(resource.RUSAGE_SELF)
+        result = self.execute_command(args[0])
+        if result.get('usage'):
+            usage = Usage.from_dict(result['usage'])
+        else:
+            # Builtins run inside the server, so measure the server process
+            after = resource.getrusage(resource.RUSAGE_SELF)
+            usage = Usage(time.perf_counter() - started,
+                          after.ru_utime - before.ru_utime, after.ru_stime - before.ru_stime)
+            result['usage'] = usage.to_dict()
+        output = result.get('output') or ''
+        result['output'] = (output + '\n\n' if output else '') + usage.format()
+        return result
+    
+    @command_registry.command('bg', max_args=1, usage='bg [%job]', help='Resume a stopped job in the background')
+    def handle_bg(self, args):
+        """Handle bg command"""
+        spec = args[0] if args else None
+        job = self.jobs.get(spec)
+        if job is None:
+            return {'type': 'error', 'output': f"bg: {spec or 'current'}: no such job"}
+        if job.done:
+            return {'type': 'error', 'output': f'bg: job {job.id} has terminated'}
+        if job.state == RUNNING:
+            return {'type': 'error', 'output': f'bg: job {job.id} already in background'}
+        self.jobs.resume(job)
+        return {'type': 'output', 'output': job.describe(current=True)}
+    
+    @command_registry.command('kill', min_args=1, usage='kill [-SIGNAL] %job|pid', help='Signal a job or process')
+    def handle_kill(self, args):
+        """Handle kill command for %job specs; plain PIDs go to the system kill"""
+        if not any(arg.startswith('%') for arg in args):
+            return self.run_external(shlex.join(['kill'] + args))
+        
+        signum = signal.SIGTERM
+        targets = []
+        try:
+            index = 0
+            while index < len(args):
+                arg = args[index]
+                if arg == '-s' and index + 1 < len(args):
+                    signum = parse_signal(args[index + 1])
+                    index += 1
+                elif arg.startswith('-') and len(arg) > 1:
+                    signum = parse_signal(arg[1:])
+                else:
+                    targets.append(arg)
+                index += 1
+        except JobError as e:
+            return {'type': 'error', 'output': f'kill: {str(e)}'}
+        
+        errors = []
+        for target in targets:
+            if target.startswith('%'):
+                job = self.jobs.get(target)
+                if job is None or job.done:
+                    errors.append(f'kill: {target}: no such job')
+                    continue
+                job.signal(signum)
+                if job.state == STOPPED and signum not in (signal.SIGSTOP, signal.SIGTSTP, signal.SIGCONT):
+                    # A stopped job only acts on the signal once continued
+                    job.signal(signal.SIGCONT)
+            else:
+                try:
+                    os.kill(int(target), signum)
+                except (ValueError, OSError) as e:
+                    errors.append(f'kill: {target}: {e.strerror if isinstance(e, OSError) else "arguments must be process or job IDs"}')
+        if errors:
+            return {'type': 'error', 'output': '\n'.join(errors)}
+        return {'type': 'output', 'output': ''}
+    
+    @command_registry.command('help', max_args=0, help='Show this help')
+    def handle_help(self, args):
         """Handle help command"""
         help_text = """Available Commands:
 • ls [path] - List directory contents
@@ -251,12 +657,18 @@ class TerminalBackend:
 • rm <file> - Remove file
 • rm -r <dir> - Remove directory
 • cat <file> - Display file contents
+• download <file> / upload [name] - Transfer files
 • ps - Show running processes
 • top - System resource usage
 • df - Disk usage
 • free - Memory usage
 • clear - Clear screen
 • history - Command history
+• <command> & - Run a command in the background
+• jobs - List background jobs
+• fg [%n] / bg [%n] - Foreground / resume a job
+• kill [-SIGNAL] %n - Signal a job
+• time <command> - Run a command and report its resource usage
 • ai-help - AI features help
 • help - Show this help
 
@@ -265,12 +677,18 @@ Try natural language commands like:
 • "create a folder called test"
 • "show me system status"
         """
+        if command_registry.plugin_commands:
+            help_text += "\nPlugin Commands:\n" + '\n'.join(
+                f"• {command_registry.get(name).usage} - {command_registry.get(name).help}"
+                for name in command_registry.plugin_commands if command_registry.get(name)
+            ) + '\n'
         return {'type': 'output', 'output': help_text}
     
-    def handle_cd(self, command):
+    @command_registry.command('cd', usage='cd <path>', help='Change directory')
+    def handle_cd(self, args):
         """Handle cd command"""
         try:
-            path = command[3:].strip()
+            path = ' '.join(args)
             if not path:
                 path = os.path.expanduser('~')
             
@@ -283,16 +701,18 @@ Try natural language commands like:
             
             if os.path.exists(new_path) and os.path.isdir(new_path):
                 self.current_dir = os.path.abspath(new_path)
+                self._sync_shell_cwd()
                 return {'type': 'output', 'output': f'Changed to: {self.current_dir}'}
             else:
                 return {'type': 'error', 'output': f'cd: {path}: No such file or directory'}
         except Exception as e:
             return {'type': 'error', 'output': f'cd error: {str(e)}'}
     
-    def handle_ls(self, command):
+    @command_registry.command('ls', max_args=2, flags=('-l', '-a', '-la', '-al'),
+                              usage='ls [-l] [path]', help='List directory contents')
+    def handle_ls(self, args):
         """Handle ls command"""
         try:
-            args = command.split()[1:] if len(command.split()) > 1 else []
             path = self.current_dir
             
             for arg in args:
@@ -303,8 +723,11 @@ Try natural language commands like:
             if not os.path.exists(path):
                 return {'type': 'error', 'output': f'ls: {path}: No such file or directory'}
             
+            table = Table([('name', 'str'), ('type', 'str'), ('size', 'bytes'), ('mode', 'int'), ('modified', 'timestamp')])
             if not os.path.isdir(path):
-                return {'type': 'output', 'output': os.path.basename(path)}
+                stat = os.stat(path)
+                table.add(os.path.basename(path), 'file', stat.st_size, stat.st_mode & 0o7777, int(stat.st_mtime))
+                return {'type': 'output', 'output': os.path.basename(path), 'table': table.to_dict()}
             
             try:
                 files = os.listdir(path)
@@ -312,32 +735,34 @@ Try natural language commands like:
                 return {'type': 'error', 'output': f'ls: {path}: Permission denied'}
             
             files.sort()
+            long_format = any(arg.startswith('-') and 'l' in arg for arg in args)
             
-            if '-l' in args:
-                output_lines = []
-                for file in files:
-                    file_path = os.path.join(path, file)
-                    try:
-                        stat = os.stat(file_path)
-                        size = stat.st_size
-                        mtime = datetime.fromtimestamp(stat.st_mtime).strftime('%b %d %H:%M')
-                        file_type = 'd' if os.path.isdir(file_path) else '-'
-                        perms = 'rwxrwxrwx' if os.access(file_path, os.R_OK | os.W_OK | os.X_OK) else 'r--r--r--'
-                        output_lines.append(f"{file_type}{perms} {size:>8} {mtime} {file}")
-                    except (OSError, PermissionError):
-                        output_lines.append(f"?????????? {0:>8} ??? ?? ??:?? {file}")
-                return {'type': 'output', 'output': '\n'.join(output_lines)}
-            else:
-                if not files:
-                    return {'type': 'output', 'output': ''}
-                return {'type': 'output', 'output': '  '.join(files)}
+            output_lines = []
+            for file in files:
+                file_path = os.path.join(path, file)
+                try:
+                    stat = os.stat(file_path)
+                except (OSError, PermissionError):
+                    table.add(file, None, None, None, None)
+                    output_lines.append(f"?????????? {0:>8} ??? ?? ??:?? {file}")
+                    continue
+                is_dir = os.path.isdir(file_path)
+                table.add(file, 'dir' if is_dir else 'file', stat.st_size, stat.st_mode & 0o7777, int(stat.st_mtime))
+                if long_format:
+                    mtime = datetime.fromtimestamp(stat.st_mtime).strftime('%b %d %H:%M')
+                    file_type = 'd' if is_dir else '-'
+                    perms = 'rwxrwxrwx' if os.access(file_path, os.R_OK | os.W_OK | os.X_OK) else 'r--r--r--'
+                    output_lines.append(f"{file_type}{perms} {stat.st_size:>8} {mtime} {file}")
+            output = '\n'.join(output_lines) if long_format else '  '.join(files)
+            return {'type': 'output', 'output': output, 'table': table.to_dict()}
         except Exception as e:
             return {'type': 'error', 'output': f'ls error: {str(e)}'}
     
-    def handle_mkdir(self, command):
+    @command_registry.command('mkdir', min_args=1, flags=(), usage='mkdir <name>', help='Create directory')
+    def handle_mkdir(self, args):
         """Handle mkdir command"""
         try:
-            dir_name = command[6:].strip()
+            dir_name = ' '.join(args)
             if not dir_name:
                 return {'type': 'error', 'output': 'mkdir: missing operand'}
             
@@ -347,10 +772,10 @@ Try natural language commands like:
         except Exception as e:
             return {'type': 'error', 'output': f'mkdir error: {str(e)}'}
     
-    def handle_rm(self, command):
+    @command_registry.command('rm', min_args=1, usage='rm [-r] <path>', help='Remove file or directory')
+    def handle_rm(self, args):
         """Handle rm command"""
         try:
-            args = command.split()[1:]
             if not args:
                 return {'type': 'error', 'output': 'rm: missing operand'}
             
@@ -375,10 +800,11 @@ Try natural language commands like:
         except Exception as e:
             return {'type': 'error', 'output': f'rm error: {str(e)}'}
     
-    def handle_cat(self, command):
+    @command_registry.command('cat', min_args=1, flags=(), usage='cat <file>', help='Display file contents')
+    def handle_cat(self, args):
         """Handle cat command"""
         try:
-            file_name = command[4:].strip()
+            file_name = ' '.join(args)
             if not file_name:
                 return {'type': 'error', 'output': 'cat: missing operand'}
             
@@ -401,7 +827,30 @@ Try natural language commands like:
         except Exception as e:
             return {'type': 'error', 'output': f'cat error: {str(e)}'}
     
-    def handle_ps(self):
+    @command_registry.command('download', min_args=1, max_args=1, flags=(), usage='download <file>',
+                              help='Download a file to your computer')
+    def handle_download(self, args):
+        """Handle download command: the browser fetches the file over HTTP"""
+        if self.session_id is None:
+            return {'type': 'error', 'output': 'download: not available outside a browser session'}
+        file_path = os.path.join(self.current_dir, args[0])
+        if not os.path.isfile(file_path):
+            return {'type': 'error', 'output': f'download: {args[0]}: No such file'}
+        return {'type': 'download', 'output': f'Downloading {args[0]} ({os.path.getsize(file_path)} bytes)',
+                'url': file_url('download', file_path), 'name': os.path.basename(file_path)}
+    
+    @command_registry.command('upload', max_args=1, flags=(), usage='upload [name]',
+                              help='Upload a file from your computer')
+    def handle_upload(self, args):
+        """Handle upload command: the browser picks a file and streams it over HTTP"""
+        if self.session_id is None:
+            return {'type': 'error', 'output': 'upload: not available outside a browser session'}
+        target = os.path.join(self.current_dir, args[0]) if args else None
+        return {'type': 'upload', 'output': 'Choose a file to upload',
+                'url': file_url('upload', target)}
+    
+    @command_registry.command('ps', max_args=0, help='Show running processes')
+    def handle_ps(self, args):
         """Handle ps command"""
         try:
             processes = []
@@ -412,27 +861,32 @@ Try natural language commands like:
                     pass
             
             processes.sort(key=lambda x: x['cpu_percent'] or 0, reverse=True)
+            # The text and the table both hold only the busiest 20
+            processes = processes[:20]
+            table = Table([('pid', 'int'), ('name', 'str'), ('cpu', 'percent'), ('memory', 'percent')],
+                          [[p['pid'], p['name'], p['cpu_percent'], p['memory_percent']] for p in processes])
             
             output = f"{'PID':<8} {'NAME':<25} {'CPU%':<8} {'MEM%':<8}\n"
             output += "-" * 55 + "\n"
             
-            for proc in processes[:20]:
+            for proc in processes:
                 pid = proc['pid']
                 name = (proc['name'][:22] + '...') if len(proc['name']) > 25 else proc['name']
                 cpu = proc['cpu_percent'] or 0
                 mem = proc['memory_percent'] or 0
                 output += f"{pid:<8} {name:<25} {cpu:<7.1f}% {mem:<7.1f}%\n"
             
-            return {'type': 'output', 'output': output}
+            return {'type': 'output', 'output': output, 'table': table.to_dict()}
         except Exception as e:
             return {'type': 'error', 'output': f'ps error: {str(e)}'}
     
-    def handle_top(self):
+    @command_registry.command('top', max_args=0, help='System resource usage')
+    def handle_top(self, args):
         """Handle top command"""
         try:
             cpu_percent = psutil.cpu_percent(interval=0.1)
             memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
+            disk = disk_probe.usage('/')
             boot_time = datetime.fromtimestamp(psutil.boot_time())
             
             output = "System Overview:\n"
@@ -440,40 +894,57 @@ Try natural language commands like:
             output += f"Uptime: {datetime.now() - boot_time}\n"
             output += f"CPU Usage: {cpu_percent:.1f}%\n"
             output += f"Memory: {memory.percent:.1f}% used ({memory.used // (1024**3):.1f}GB / {memory.total // (1024**3):.1f}GB)\n"
-            output += f"Disk: {disk.percent:.1f}% used ({disk.used // (1024**3):.1f}GB / {disk.total // (1024**3):.1f}GB)\n"
+            if disk.available:
+                output += f"Disk: {disk.percent:.1f}% used ({disk.used // (1024**3):.1f}GB / {disk.total // (1024**3):.1f}GB)\n"
+            else:
+                output += f"Disk: unavailable ({disk.error})\n"
             output += f"Available Memory: {memory.available // (1024**3):.1f}GB\n"
             
-            return {'type': 'output', 'output': output}
+            table = Table([('uptime', 'float'), ('cpu', 'percent'), ('memory', 'percent'), ('memory_used', 'bytes'),
+                           ('memory_total', 'bytes'), ('memory_available', 'bytes'), ('disk', 'percent'),
+                           ('disk_used', 'bytes'), ('disk_total', 'bytes')])
+            table.add(round((datetime.now() - boot_time).total_seconds(), 1), cpu_percent, memory.percent,
+                      memory.used, memory.total, memory.available,
+                      disk.percent if disk.available else None,
+                      disk.used if disk.available else None, disk.total if disk.available else None)
+            return {'type': 'output', 'output': output, 'table': table.to_dict()}
         except Exception as e:
             return {'type': 'error', 'output': f'top error: {str(e)}'}
     
-    def handle_df(self):
+    @command_registry.command('df', max_args=0, help='Disk usage')
+    def handle_df(self, args):
         """Handle df command"""
         try:
-            partitions = psutil.disk_partitions()
             output = f"{'Filesystem':<20} {'Size':<8} {'Used':<8} {'Avail':<8} {'Use%':<6} {'Mounted on'}\n"
             output += "-" * 70 + "\n"
+            table = Table([('filesystem', 'str'), ('mountpoint', 'str'), ('type', 'str'), ('size', 'bytes'),
+                           ('used', 'bytes'), ('available', 'bytes'), ('use', 'percent'), ('error', 'str')])
             
-            for partition in partitions:
-                try:
-                    usage = psutil.disk_usage(partition.mountpoint)
-                    total = usage.total // (1024**3)
-                    used = usage.used // (1024**3)
-                    free = usage.free // (1024**3)
-                    percent = (usage.used / usage.total) * 100 if usage.total > 0 else 0
-                    
-                    device = partition.device[:17] + '...' if len(partition.device) > 20 else partition.device
-                    mountpoint = partition.mountpoint[:15] + '...' if len(partition.mountpoint) > 18 else partition.mountpoint
-                    
-                    output += f"{device:<20} {total:<7}G {used:<7}G {free:<7}G {percent:<5.1f}% {mountpoint}\n"
-                except (PermissionError, OSError):
+            # Probed concurrently; mounts that do not answer in time are flagged
+            for usage in disk_probe.partitions():
+                if not usage.available and not usage.hung:
+                    # Unreadable (e.g. permission denied), as before
                     continue
+                device = usage.device[:17] + '...' if len(usage.device) > 20 else usage.device
+                mountpoint = usage.mountpoint[:15] + '...' if len(usage.mountpoint) > 18 else usage.mountpoint
+                
+                if not usage.available:
+                    table.add(usage.device, usage.mountpoint, usage.fstype, None, None, None, None, usage.error)
+                    output += f"{device:<20} {'-':<8} {'-':<8} {'-':<8} {'-':<6} {mountpoint} (unavailable: {usage.error})\n"
+                    continue
+                total = usage.total // (1024**3)
+                used = usage.used // (1024**3)
+                free = usage.free // (1024**3)
+                output += f"{device:<20} {total:<7}G {used:<7}G {free:<7}G {usage.percent:<5.1f}% {mountpoint}\n"
+                table.add(usage.device, usage.mountpoint, usage.fstype, usage.total, usage.used, usage.free,
+                          round(usage.percent, 1), None)
             
-            return {'type': 'output', 'output': output}
+            return {'type': 'output', 'output': output, 'table': table.to_dict()}
         except Exception as e:
             return {'type': 'error', 'output': f'df error: {str(e)}'}
     
-    def handle_free(self):
+    @command_registry.command('free', max_args=0, help='Memory usage')
+    def handle_free(self, args):
         """Handle free command"""
         try:
             memory = psutil.virtual_memory()
@@ -494,11 +965,15 @@ Try natural language commands like:
             output += f"{'Mem:':>12} {mem_total:>9}M {mem_used:>9}M {mem_free:>9}M {mem_available:>9}M\n"
             output += f"{'Swap:':>12} {swap_total:>9}M {swap_used:>9}M {swap_free:>9}M {0:>9}M\n"
             
-            return {'type': 'output', 'output': output}
+            table = Table([('kind', 'str'), ('total', 'bytes'), ('used', 'bytes'), ('free', 'bytes'), ('available', 'bytes')])
+            table.add('mem', memory.total, memory.used, memory.free, memory.available)
+            table.add('swap', swap.total, swap.used, swap.free, None)
+            return {'type': 'output', 'output': output, 'table': table.to_dict()}
         except Exception as e:
             return {'type': 'error', 'output': f'free error: {str(e)}'}
     
-    def handle_ai_help(self):
+    @command_registry.command('ai-help', max_args=0, help='AI features help')
+    def handle_ai_help(self, args):
         """Handle ai-help command"""
         help_text = """AI Terminal Features:
 ====================
@@ -528,26 +1003,296 @@ and convert it to appropriate terminal commands.
         """
         return {'type': 'output', 'output': help_text}
 
-# Initialize terminal backend
-terminal = TerminalBackend()
+# Extra builtins from plugin modules, e.g. TERMINAL_PLUGINS=my_commands,team.tools
+command_registry.load_plugins(os.environ.get('TERMINAL_PLUGINS', ''))
+
+# One terminal backend per connected client, keyed by Socket.IO session id
+sessions = {}
+
+def get_terminal():
+    """Return the terminal backend for the current Socket.IO session"""
+    terminal = sessions.get(request.sid)
+    if terminal is None:
+        terminal = sessions[request.sid] = TerminalBackend()
+        terminal.stream = lambda text, sid=request.sid: stream_output(sid, text)
+        terminal.notify = lambda job, sid=request.sid: notify_job(sid, job)
+    return terminal
+
+def is_background(command):
+    """Whether a command line ends with a single, unescaped &"""
+    command = command.rstrip()
+    return (command.endswith('&') and not command.endswith('&&')
+            and not command.endswith('\\&') and not command.endswith('>&'))
+
+def notify_job(sid, job):
+    """Tell a client that one of its background jobs stopped, resumed or ended"""
+    socketio.emit('job_status', {
+        'id': job.id,
+        'state': job.state,
+        'return_code': job.return_code,
+        'command': job.command,
+        'usage': job.usage.to_dict() if job.usage else None,
+        'output': job.describe(current=True)
+    }, to=sid)
+
+def save_session(terminal):
+    """Persist the terminal's state so any worker can resume it"""
+    if terminal.session_id is None:
+        return
+    try:
+        session_store.save(terminal.session_id, terminal.export_state())
+    except Exception as e:
+        print(f"Warning: could not save session {terminal.session_id}: {e}")
+
+def worker_metrics():
+    """Load snapshot of this worker for the metrics room"""
+    return {
+        'worker': WORKER_ID,
+        'pid': os.getpid(),
+        'active_sessions': len(sessions),
+        'subprocesses': SUBPROCESS_SLOTS.in_use,
+        'rss_mb': round(psutil.Process().memory_info().rss / (1024**2), 1),
+        'timestamp': time.time()
+    }
+
+_metrics_publisher = None
+
+def publish_worker_metrics():
+    """Broadcast this worker's metrics to the 'metrics' room on every worker"""
+    while True:
+        socketio.emit('worker_metrics', worker_metrics(), to='metrics')
+        socketio.sleep(METRICS_BROADCAST_INTERVAL)
+
+def stream_output(sid, text):
+    """Push a chunk of live command output to one client"""
+    metrics.OUTPUT_BYTES.inc('terminal_stream', amount=len(text.encode('utf-8', 'replace')))
+    socketio.emit('terminal_stream', {'output': text}, to=sid)
+
+def encode_result(result, fmt, event):
+    """A result in the client's output format, counting the bytes sent"""
+    result = shape_result(result, fmt)
+    try:
+        payload = encode(result, fmt)
+    except FormatError as e:
+        payload = result = {'type': 'error', 'output': str(e)}
+    if isinstance(payload, bytes):
+        size = len(payload)
+    else:
+        size = len((result.get('output') or '').encode('utf-8', 'replace'))
+        if 'table' in result:
+            size += len(json.dumps(result['table']))
+    if size:
+        metrics.OUTPUT_BYTES.inc(event, amount=size)
+    return payload
+
+def emit_output(result, fmt=TEXT):
+    """Send a command result to the client"""
+    emit('terminal_output', encode_result(result, fmt, 'terminal_output'))
+
+def rate_limited(event):
+    """Decorator answering 'busy' instead of running a handler the session sends too often"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            retry_after = rate_limiter.check(request.sid, event)
+            if retry_after is None:
+                return func(*args, **kwargs)
+            metrics.LOAD_SHED.inc(event, 'rate_limited')
+            busy = {'type': 'busy', 'event': event, 'reason': 'rate_limited', 'retry_after': round(retry_after, 3),
+                    'output': f'Too many {event} requests; retry in {retry_after:.1f}s'}
+            emit('busy', busy)
+            # Also the acknowledgement, for clients that asked for one
+            return busy
+        return wrapper
+    return decorator
+
+_first_request_seen = False
+
+@app.before_request
+def record_first_request():
+    """Track time-to-first-request against the startup budget"""
+    global _first_request_seen
+    if not _first_request_seen:
+        _first_request_seen = True
+        metrics.STARTUP_SECONDS.set(value=round(time.perf_counter() - _IMPORT_STARTED, 4))
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+def is_admin_request():
+    """Check the admin token from the X-Admin-Token header"""
+    # Never from the query string, which ends up in access logs and history
+    supplied = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+@app.route('/admin/profile')
+def profile_endpoint():
+    """Sample all threads and greenlets for ?seconds=N and return the profile"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Profiling is disabled (set ADMIN_TOKEN to enable)'}), 404
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        seconds = float(request.args.get('seconds', 5))
+        top_n = int(request.args.get('top', 20))
+        interval = float(request.args.get('interval', 0.005))
+    except ValueError:
+        return jsonify({'error': 'seconds, top and interval must be numbers'}), 400
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        return jsonify({'error': f'seconds must be between 0 and {MAX_PROFILE_SECONDS}'}), 400
+    if not 0.001 <= interval <= 1:
+        return jsonify({'error': 'interval must be between 0.001 and 1'}), 400
+    
+    # 'cpu' samples only what is running on each thread; 'wall' also
+    # includes every suspended greenlet
+    mode = request.args.get('mode', 'wall')
+    if mode not in ('wall', 'cpu'):
+        return jsonify({'error': "mode must be 'wall' or 'cpu'"}), 400
+    
+    try:
+        result = profiler.capture(seconds, sleep=socketio.sleep, interval=interval,
+                                  include_greenlets=(mode == 'wall'))
+    except profiler.ProfilerBusyError as e:
+        return jsonify({'error': str(e)}), 409
+    
+    if request.args.get('format') == 'collapsed':
+        return Response(result.collapsed(), content_type='text/plain; charset=utf-8')
+    return jsonify({
+        'seconds': round(result.elapsed, 3),
+        'samples': result.samples,
+        'mode': mode,
+        'top': result.top(top_n),
+        'collapsed': result.collapsed()
+    })
+
+def session_path():
+    """Absolute path of ?path= in the current directory of the session named by X-Session-Id"""
+    # Only a header: in the query string the id would end up in access logs and browser history
+    session_id = request.headers.get('X-Session-Id', '')
+    if not valid_session_id(session_id):
+        raise TransferError(400, 'A valid session id is required')
+    current_dir = None
+    for terminal in list(sessions.values()):
+        if terminal.session_id == session_id:
+            current_dir = terminal.current_dir
+            break
+    else:
+        # Connected to another worker, or not connected right now
+        try:
+            state = session_store.load(session_id)
+        except Exception as e:
+            print(f"Warning: could not load session {session_id}: {e}")
+            state = None
+        current_dir = state.get('current_dir') if state else None
+    if not current_dir:
+        raise TransferError(404, 'Unknown session')
+    path = request.args.get('path', '')
+    if not path:
+        raise TransferError(400, 'path is required')
+    return os.path.normpath(os.path.join(current_dir, path))
+
+def file_url(endpoint, path=None):
+    """URL of a /files endpoint; without a path the client appends one. The session goes in X-Session-Id"""
+    url = f"/files/{endpoint}"
+    if path is not None:
+        url += "?" + urllib.parse.urlencode({'path': path})
+    return url
+
+@app.route('/files/download')
+def download_endpoint():
+    """Send a file from the session's directory; supports Range and conditional requests"""
+    try:
+        path = session_path()
+    except TransferError as e:
+        return jsonify(e.to_dict()), e.status
+    if not os.path.isfile(path):
+        return jsonify({'error': f'{path}: No such file'}), 404
+    if not os.access(path, os.R_OK):
+        return jsonify({'error': f'{path}: Permission denied'}), 403
+    response = send_file(path, as_attachment=True, conditional=True, max_age=0)
+    if request.method == 'GET' and response.content_length:
+        metrics.FILE_TRANSFER_BYTES.inc('download', amount=response.content_length)
+    return response
+
+@app.route('/files/upload', methods=['GET', 'PUT', 'POST'])
+def upload_endpoint():
+    """Stream a request body to a file in the session's directory; GET reports progress for resuming"""
+    try:
+        path = session_path()
+        if request.method == 'GET':
+            return jsonify(upload_status(path))
+        # Read the WSGI input directly: it also decodes chunked bodies,
+        # which Werkzeug's request.stream leaves empty
+        status = receive_upload(request.environ['wsgi.input'], path,
+                                content_length=request.content_length,
+                                content_range=request.headers.get('Content-Range'),
+                                max_bytes=UPLOAD_MAX_BYTES)
+    except TransferError as e:
+        return jsonify(e.to_dict()), e.status
+    except OSError as e:
+        return jsonify({'error': f'{e.filename or path}: {e.strerror}'}), 500
+    metrics.FILE_TRANSFER_BYTES.inc('upload', amount=status['received'])
+    return jsonify(status), 201 if status['complete'] else 200
+
 @socketio.on('connect')
-def handle_connect():
-    emit('terminal_output', {
+@metrics.instrument_handler('connect')
+def handle_connect(auth=None):
+    metrics.ACTIVE_SESSIONS.inc()
+    terminal = get_terminal()
+    
+    # Resume the browser's session if it presents one we know
+    session_id = auth.get('session_id') if isinstance(auth, dict) else None
+    if not valid_session_id(session_id):
+        session_id = uuid.uuid4().hex
+    terminal.session_id = session_id
+    try:
+        state = session_store.load(session_id)
+    except Exception as e:
+        print(f"Warning: could not load session {session_id}: {e}")
+        state = None
+    if state:
+        terminal.restore_state(state)
+    emit('session', {'session_id': session_id, 'worker': WORKER_ID})
+    
+    emit_output({
         'type': 'welcome',
         'output': f'Welcome to AI-Enhanced Terminal!\nCurrent directory: {terminal.current_dir}\nType "help" for commands or "ai-help" for AI features.\n'
     })
 
+@socketio.on('disconnect')
+@metrics.instrument_handler('disconnect')
+def handle_disconnect(reason=None):
+    metrics.ACTIVE_SESSIONS.dec()
+    rate_limiter.forget(request.sid)
+    terminal = sessions.pop(request.sid, None)
+    if terminal is not None:
+        terminal.close()
+
 @socketio.on('command')
+@metrics.instrument_handler('command')
+@rate_limited('command')
 def handle_command(data):
     command = data.get('command', '').strip()
     os_mode = data.get('os_mode', None)
+    # 'json' or 'msgpack' replace the text of builtins with typed table rows
+    fmt = data.get('format', TEXT)
     if not command:
         return
+    if fmt not in FORMATS:
+        emit_output({'type': 'error', 'output': f"Unknown output format {fmt!r} (expected one of: {', '.join(FORMATS)})"})
+        return
+    
+    terminal = get_terminal()
+    if terminal.busy:
+        # A foreground job or PTY program is running: the line is its input
+        terminal.send_input(data.get('command', '') + '\n')
+        return
     
     terminal.command_history.append(command)
     terminal.history_index = len(terminal.command_history) - 1
@@ -556,46 +1301,158 @@ def handle_command(data):
         ai_service.set_mode(os_mode)
     
     result = terminal.execute_command(command)
-    emit('terminal_output', result)
+    save_session(terminal)
+    emit_output(terminal.scrollback.spool_result(result), fmt)
+    # Acknowledged with the result type, so clients can tell a shed command
+    return {'type': result['type']}
+
+@socketio.on('batch')
+@metrics.instrument_handler('batch')
+@rate_limited('batch')
+def handle_batch(data):
+    """Run a script or list of commands, streaming each step's result tagged by index"""
+    batch_id = data.get('id') or uuid.uuid4().hex[:8]
+    fmt = data.get('format', TEXT)
+    try:
+        if fmt not in FORMATS:
+            raise BatchError(f"Unknown output format {fmt!r} (expected one of: {', '.join(FORMATS)})")
+        steps = parse_request(data)
+    except BatchError as e:
+        emit('batch_done', {'id': batch_id, 'ok': False, 'error': str(e)})
+        return
+    
+    terminal = get_terminal()
+    if terminal.busy:
+        emit('batch_done', {'id': batch_id, 'ok': False, 'error': 'A foreground program is running'})
+        return
+    sid = request.sid
+    
+    def on_step(index, command, result):
+        result = dict(terminal.scrollback.spool_result(result), id=batch_id, index=index, command=command)
+        socketio.emit('batch_step', encode_result(result, fmt, 'batch_step'), to=sid)
+    
+    # Steps report whole results instead of streaming untagged chunks, and
+    # the single PTY shell cannot run a parallel group at once
+    stream, terminal.stream = terminal.stream, None
+    runner = BatchRunner(lambda index, command: terminal.execute_command(command), on_step,
+                         spawn=socketio.start_background_task,
+                         max_parallel=1 if SHELL_MODE == 'pty' else BATCH_MAX_PARALLEL)
+    try:
+        results = runner.run(steps)
+    finally:
+        terminal.stream = stream
+    save_session(terminal)
+    emit('batch_done', {
+        'id': batch_id,
+        'ok': all(succeeded(result) for result in results),
+        'failed': [i for i, result in enumerate(results) if result['type'] != 'skipped' and not succeeded(result)],
+        'skipped': [i for i, result in enumerate(results) if result['type'] == 'skipped']
+    })
+
+@socketio.on('terminal_input')
+@metrics.instrument_handler('terminal_input')
+@rate_limited('terminal_input')
+def handle_terminal_input(data):
+    """Raw keystrokes (e.g. ^C, ^Z) for the foreground job or PTY program"""
+    terminal = get_terminal()
+    if terminal.busy:
+        terminal.send_input(data.get('data', ''))
 
 @socketio.on('get_history')
+@metrics.instrument_handler('get_history')
+@rate_limited('get_history')
 def handle_get_history():
-    emit('command_history', {'history': terminal.command_history})
+    emit('command_history', {'history': get_terminal().command_history})
+
+@socketio.on('get_output_page')
+@metrics.instrument_handler('get_output_page')
+@rate_limited('get_output_page')
+def handle_get_output_page(data):
+    """Send a page of a spooled output: {id, offset, limit}"""
+    try:
+        output_id = int(data.get('id'))
+        offset = int(data.get('offset', 0))
+        limit = int(data.get('limit', 500))
+    except (TypeError, ValueError):
+        emit('output_page', {'error': 'id, offset and limit must be integers'})
+        return
+    
+    output = get_terminal().scrollback.get(output_id)
+    if output is None:
+        emit('output_page', {'id': output_id, 'offset': offset, 'error': 'Output no longer available'})
+        return
+    
+    lines, evicted = output.read(offset, limit)
+    text = '\n'.join(lines)
+    metrics.OUTPUT_BYTES.inc('output_page', amount=len(text.encode('utf-8', 'replace')))
+    emit('output_page', {
+        'id': output_id,
+        'offset': offset,
+        'lines': lines,
+        'total_lines': output.total_lines,
+        'evicted': evicted
+    })
 
 @socketio.on('get_system_info')
+@metrics.instrument_handler('get_system_info')
+@rate_limited('get_system_info')
 def handle_get_system_info():
     try:
         cpu_percent = psutil.cpu_percent(interval=0.1)
         memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        disk = disk_probe.usage('/')
         
         system_info = {
             'cpu_percent': round(cpu_percent, 1),
             'memory_percent': round(memory.percent, 1),
             'memory_used': round(memory.used / (1024**3), 1),
             'memory_total': round(memory.total / (1024**3), 1),
-            'disk_percent': round(disk.percent, 1),
+            'disk_percent': round(disk.percent, 1) if disk.available else None,
             'disk_used': round(disk.used / (1024**3), 1),
-            'disk_total': round(disk.total / (1024**3), 1)
+            'disk_total': round(disk.total / (1024**3), 1),
+            'disk_error': disk.error
         }
         
         emit('system_info', system_info)
     except Exception as e:
         emit('system_info', {'error': str(e)})
 
+@socketio.on('subscribe_metrics')
+@metrics.instrument_handler('subscribe_metrics')
+@rate_limited('subscribe_metrics')
+def handle_subscribe_metrics():
+    """Join the room receiving periodic worker_metrics from all workers"""
+    global _metrics_publisher
+    join_room('metrics')
+    if _metrics_publisher is None:
+        _metrics_publisher = socketio.start_background_task(publish_worker_metrics)
+    emit('worker_metrics', worker_metrics())
+
+@socketio.on('unsubscribe_metrics')
+@metrics.instrument_handler('unsubscribe_metrics')
+@rate_limited('unsubscribe_metrics')
+def handle_unsubscribe_metrics():
+    leave_room('metrics')
+
 @socketio.on('get_ai_suggestions')
+@metrics.instrument_handler('get_ai_suggestions')
+@rate_limited('get_ai_suggestions')
 def handle_get_ai_suggestions(data):
     partial_command = data.get('command', '')
     suggestions = ai_service.get_suggestions(partial_command)
     emit('ai_suggestions', {'suggestions': suggestions})
 
 @socketio.on('interpret_natural_language')
+@metrics.instrument_handler('interpret_natural_language')
+@rate_limited('interpret_natural_language')
 def handle_interpret_natural_language(data):
     natural_language = data.get('command', '')
     result = ai_service.interpret_command(natural_language)
     emit('ai_interpretation', result)
 
 @socketio.on('explain_command')
+@metrics.instrument_handler('explain_command')
+@rate_limited('explain_command')
 def handle_explain_command(data):
     command = data.get('command', '')
     explanation = ai_service.explain_command(command)
@@ -606,6 +1463,7 @@ if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     
     if os.environ.get('FLASK_ENV') == 'production':
+        import eventlet.wsgi
         print(f"Starting production server on port {port}")
         eventlet.wsgi.server(eventlet.listen(('0.0.0.0', port)), app)
     else:
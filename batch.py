@@ -0,0 +1,198 @@
+"""
+Run a script or list of commands in one request.
+
+A script is split at unquoted newlines and `;` (run the next step
+regardless), `&&` (run the next step only if this one succeeded) and `&`
+(run this step in parallel with the next). Steps joined by `&` form a
+group that runs concurrently and succeeds only if all of its members do;
+the connector after the group decides whether the batch goes on. As in
+a shell, a failure skips every `&&` step up to the next `;` or newline.
+`|`, `||` and redirections such as `2>&1` stay part of their step.
+"""
+
+import os
+import threading
+
+try:
+    # Cooperative select so waiting on a group does not block the eventlet hub
+    from eventlet.green import select
+except ImportError:
+    import select
+
+BATCH_MAX_STEPS = int(os.environ.get('BATCH_MAX_STEPS', 500))
+BATCH_MAX_PARALLEL = int(os.environ.get('BATCH_MAX_PARALLEL', 8))
+# Seconds between checks whether a parallel group has finished
+POLL_INTERVAL = 0.02
+
+SEQUENTIAL = ';'
+AND = '&&'
+PARALLEL = '&'
+
+
+class BatchError(Exception):
+    """A batch request could not be parsed"""
+
+
+class Step:
+    """One command of a batch and the connector that follows it"""
+
+    def __init__(self, command, connector=SEQUENTIAL):
+        self.command = command
+        self.connector = connector
+
+    def __repr__(self):
+        return f"Step({self.command!r}, {self.connector!r})"
+
+
+def parse_script(script):
+    """Split a script into Steps at unquoted newlines, `;`, `&&` and `&`"""
+    steps = []
+    current = []
+    quote = None
+
+    def end(connector):
+        command = ''.join(current).strip()
+        current.clear()
+        if command:
+            steps.append(Step(command, connector))
+        elif connector != SEQUENTIAL:
+            raise BatchError(f"syntax error near unexpected token '{connector}'")
+
+    i = 0
+    while i < len(script):
+        c = script[i]
+        if quote:
+            current.append(c)
+            if c == '\\' and quote == '"' and i + 1 < len(script):
+                current.append(script[i + 1])
+                i += 1
+            elif c == quote:
+                quote = None
+        elif c == '\\' and i + 1 < len(script):
+            current.append(script[i:i + 2])
+            i += 1
+        elif c in '\'"':
+            quote = c
+            current.append(c)
+        elif c == '#' and (not current or current[-1][-1].isspace()):
+            # Comment to the end of the line
+            while i + 1 < len(script) and script[i + 1] != '\n':
+                i += 1
+        elif c in '\n;':
+            # A newline after `&&` continues the list, as in a shell
+            if not (c == '\n' and not ''.join(current).strip() and steps and steps[-1].connector == AND):
+                end(SEQUENTIAL)
+        elif c == '&':
+            if script.startswith('&&', i):
+                end(AND)
+                i += 1
+            elif (current and current[-1][-1] in '<>') or script.startswith('&>', i):
+                # Redirection such as 2>&1 or &>file
+                current.append(c)
+            else:
+                end(PARALLEL)
+        else:
+            current.append(c)
+        i += 1
+    if quote:
+        raise BatchError(f'unterminated {quote} quote')
+    end(SEQUENTIAL)
+    return steps
+
+
+def parse_request(data):
+    """Steps from a batch event: {'script': str} or {'commands': [str], 'stop_on_error': bool}"""
+    if isinstance(data.get('script'), str):
+        steps = parse_script(data['script'])
+    elif isinstance(data.get('commands'), list):
+        connector = AND if data.get('stop_on_error', True) else SEQUENTIAL
+        steps = [Step(command.strip(), connector) for command in data['commands']
+                 if isinstance(command, str) and command.strip()]
+    else:
+        raise BatchError("batch needs a 'script' string or a 'commands' list")
+    if not steps:
+        raise BatchError('batch is empty')
+    if len(steps) > BATCH_MAX_STEPS:
+        raise BatchError(f'batch has {len(steps)} steps (limit {BATCH_MAX_STEPS})')
+    return steps
+
+
+def group_steps(steps):
+    """[(members, connector)]: members are (index, command) pairs run together"""
+    groups = []
+    members = []
+    for index, step in enumerate(steps):
+        members.append((index, step.command))
+        if step.connector != PARALLEL:
+            groups.append((members, step.connector))
+            members = []
+    if members:
+        groups.append((members, SEQUENTIAL))
+    return groups
+
+
+def succeeded(result):
+    return result.get('type') not in ('error', 'skipped', 'busy') and result.get('return_code') in (None, 0)
+
+
+class BatchRunner:
+    """Runs Steps with `execute(index, command)` and reports each via `on_step`"""
+
+    def __init__(self, execute, on_step, spawn=None, max_parallel=BATCH_MAX_PARALLEL):
+        self.execute = execute
+        self.on_step = on_step
+        self.spawn = spawn or self._spawn_thread
+        self.max_parallel = max_parallel
+
+    @staticmethod
+    def _spawn_thread(target):
+        thread = threading.Thread(target=target, name='batch-step', daemon=True)
+        thread.start()
+        return thread
+
+    def run(self, steps):
+        """Run all steps and return their results in step order"""
+        results = [None] * len(steps)
+        failed = False
+        connector = SEQUENTIAL
+        for members, next_connector in group_steps(steps):
+            if connector == AND and failed:
+                # Skipped steps leave the failure in place for the next `&&`
+                for index, command in members:
+                    self._report(index, command, {'type': 'skipped', 'output': ''}, results)
+            else:
+                self._run_group(members, results)
+                failed = not all(succeeded(results[index]) for index, _ in members)
+            connector = next_connector
+        return results
+
+    def _run_group(self, members, results):
+        if len(members) == 1 or self.max_parallel <= 1:
+            for index, command in members:
+                self._run_step(index, command, results)
+            return
+        queue = list(members)
+
+        def worker():
+            while queue:
+                index, command = queue.pop(0)
+                self._run_step(index, command, results)
+
+        for _ in range(min(self.max_parallel, len(members))):
+            self.spawn(worker)
+        while any(results[index] is None for index, _ in members):
+            select.select([], [], [], POLL_INTERVAL)
+
+    def _run_step(self, index, command, results):
+        try:
+            result = self.execute(index, command)
+        except Exception as e:
+            result = {'type': 'error', 'output': f'Error: {str(e)}'}
+        self._report(index, command, result, results)
+
+    def _report(self, index, command, result, results):
+        try:
+            self.on_step(index, command, result)
+        finally:
+            # Set last so the batch is only done once every step was reported
+            results[index] = result
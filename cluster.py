@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Run several app.py worker processes, for development behind a sticky TCP proxy.
+
+Each worker is a normal single-process server on its own port. Clients are
+pinned to a worker by a hash of their IP address (like nginx ip_hash), which
+Socket.IO needs because the long-polling transport spreads one connection
+over many HTTP requests. Workers share broadcasts through the Socket.IO
+message queue and session state through SESSION_STORE, so a client whose
+worker goes away is moved to another one and resumes where it was.
+
+The built-in proxy is a development convenience: every byte passes through
+this one Python process, which again runs on one core, and the workers see
+127.0.0.1 as every client's address. In production, run with --no-proxy
+and put nginx or haproxy in front of the workers; --no-proxy prints a
+matching nginx configuration.
+
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 python cluster.py --workers 4
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 python cluster.py --workers 4 --no-proxy
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import zlib
+
+import eventlet
+
+from session_store import default_store_dir
+
+BUFFER_SIZE = 65536
+# Seconds between checks for workers that exited
+SUPERVISE_INTERVAL = 1.0
+
+
+class Worker:
+    """One app.py process listening on its own port"""
+
+    def __init__(self, worker_id, port, env):
+        self.worker_id = worker_id
+        self.port = port
+        self.env = dict(env, PORT=str(port), WORKER_ID=str(worker_id))
+        self.process = None
+
+    def start(self):
+        app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+        self.process = subprocess.Popen([sys.executable, app_path], env=self.env)
+        print(f"Worker {self.worker_id} started on port {self.port} (pid {self.process.pid})")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def pick_workers(client_ip, workers):
+    """Workers in the order a client tries them: its sticky one first"""
+    start = zlib.crc32(client_ip.encode()) % len(workers)
+    return workers[start:] + workers[:start]
+
+
+def nginx_config(workers, port):
+    """nginx server block proxying to the workers with sticky ip_hash"""
+    servers = ''.join(f'    server 127.0.0.1:{worker.port};\n' for worker in workers)
+    return (
+        "upstream terminal_workers {\n"
+        "    ip_hash;\n"
+        f"{servers}"
+        "}\n"
+        "\n"
+        "server {\n"
+        f"    listen {port};\n"
+        "    location / {\n"
+        "        proxy_pass http://terminal_workers;\n"
+        "        proxy_http_version 1.1;\n"
+        "        proxy_set_header Upgrade $http_upgrade;\n"
+        "        proxy_set_header Connection \"upgrade\";\n"
+        "        proxy_set_header Host $host;\n"
+        "        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;\n"
+        "        proxy_read_timeout 3600s;\n"
+        "        # Stream uploads instead of buffering them to disk first\n"
+        "        proxy_request_buffering off;\n"
+        "        client_max_body_size 0;\n"
+        "    }\n"
+        "}\n"
+    )
+
+
+def pipe(source, dest):
+    """Copy one direction of a connection, passing on a half-close"""
+    try:
+        while True:
+            data = source.recv(BUFFER_SIZE)
+            if not data:
+                # The other direction may still have data to send
+                dest.shutdown(socket.SHUT_WR)
+                return
+            dest.sendall(data)
+    except OSError:
+        # Reset: wake the other direction so both end
+        for sock in (source, dest):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def handle_client(client, address, workers, backend_host):
+    for worker in pick_workers(address[0], workers):
+        try:
+            backend = eventlet.connect((backend_host, worker.port))
+            break
+        except OSError:
+            # Worker down or restarting; its sessions resume on the next one
+            continue
+    else:
+        client.close()
+        return
+    upstream = eventlet.spawn(pipe, client, backend)
+    try:
+        pipe(backend, client)
+        upstream.wait()
+    finally:
+        client.close()
+        backend.close()
+
+
+def supervise(workers):
+    """Restart workers that exit"""
+    while True:
+        eventlet.sleep(SUPERVISE_INTERVAL)
+        for worker in workers:
+            code = worker.process.poll()
+            if code is not None:
+                print(f"Worker {worker.worker_id} exited with code {code}, restarting")
+                worker.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the terminal server on several worker processes')
+    parser.add_argument('--no-proxy', action='store_true',
+                        help='only run the workers and print an nginx config to put in front of them')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--base-port', type=int, default=None,
+                        help='first worker port (default: --port + 1)')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('FLASK_ENV', 'production')
+    if args.workers > 1 and not env.get('SOCKETIO_MESSAGE_QUEUE'):
+        parser.error('SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0) is required for more than one worker')
+    if not env.get('SESSION_STORE'):
+        # Workers on one host can share session state through files
+        env['SESSION_STORE'] = 'file://' + default_store_dir()
+
+    base_port = args.base_port or args.port + 1
+    workers = [Worker(i, base_port + i, env) for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+
+    def shutdown(signum, frame):
+        for worker in workers:
+            worker.stop()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    if args.no_proxy:
+        print(f"Workers on ports {base_port}-{base_port + args.workers - 1} "
+              f"(session store {env['SESSION_STORE']}). nginx configuration:\n")
+        print(nginx_config(workers, args.port))
+        supervise(workers)
+        return
+
+    eventlet.spawn_n(supervise, workers)
+    listener = eventlet.listen((args.host, args.port))
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    print(f"Development proxy on port {args.port} -> {args.workers} workers "
+          f"(session store {env['SESSION_STORE']})")
+    while True:
+        client, address = listener.accept()
+        eventlet.spawn_n(handle_client, client, address, workers, '127.0.0.1')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Registry of builtin terminal commands.
+
+A command line is tokenised once and its first word looked up in a dict,
+so dispatch cost does not grow with the number of builtins. Each builtin
+declares an argument schema; lines that do not fit it (e.g. `ps aux` when
+`ps` takes no arguments) are left for the system shell, as are lines with
+pipes, redirections or command lists (`ls | grep x`, `cat a > b`).
+
+Plugins are modules exposing `register(registry)`, loaded by name:
+
+    # my_plugin.py
+    def register(registry):
+        @registry.command('hello', max_args=1, usage='hello [name]', help='Say hello')
+        def hello(terminal, args):
+            return {'type': 'output', 'output': f"Hello, {args[0] if args else 'world'}!"}
+"""
+
+import importlib
+import shlex
+
+# Characters shlex splits off as operator tokens: | & ; < > ( )
+SHELL_OPERATOR_CHARS = frozenset('();<>|&')
+
+
+def tokenize(command):
+    """Split a command line like a POSIX shell, with unquoted operators as their own tokens"""
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ''
+    try:
+        return list(lexer)
+    except ValueError:
+        # Unbalanced quotes; let the handler or the shell report it
+        return command.split()
+
+
+def is_operator(token):
+    """Whether a token is a shell operator such as |, >, ; or &&"""
+    return bool(token) and all(c in SHELL_OPERATOR_CHARS for c in token)
+
+
+class CommandSpec:
+    """A builtin command: its handler and declared arguments"""
+
+    def __init__(self, name, handler, min_args=0, max_args=None, flags=None, usage='', help='', raw=False):
+        self.name = name
+        self.handler = handler
+        self.min_args = min_args
+        self.max_args = max_args
+        # None accepts any flag; otherwise unknown flags go to the shell
+        self.flags = frozenset(flags) if flags is not None else None
+        self.usage = usage or name
+        self.help = help
+        # Raw builtins get the rest of the line untokenised as their only argument
+        self.raw = raw
+
+    def accepts(self, args):
+        """Whether the builtin handles these arguments (else the shell does)"""
+        if any(is_operator(arg) for arg in args):
+            # Pipes, redirections and lists need the shell
+            return False
+        if self.max_args is not None and len(args) > self.max_args:
+            return False
+        if self.flags is not None:
+            return all(arg in self.flags for arg in args if arg.startswith('-') and arg != '-')
+        return True
+
+
+class CommandRegistry:
+    """Maps command names to builtin handlers"""
+
+    def __init__(self):
+        self.commands = {}
+        self.plugins = []
+        self.plugin_commands = []
+
+    def register(self, name, handler, **schema):
+        self.commands[name] = CommandSpec(name, handler, **schema)
+        return handler
+
+    def command(self, name, **schema):
+        """Decorator form of register()"""
+        def decorator(handler):
+            return self.register(name, handler, **schema)
+        return decorator
+
+    def unregister(self, name):
+        self.commands.pop(name, None)
+
+    def get(self, name):
+        return self.commands.get(name)
+
+    def names(self):
+        return list(self.commands)
+
+    def resolve(self, command):
+        """
+        Return (spec, args) for a builtin invocation, or (None, tokens).
+
+        (spec, None) means the builtin was named but is missing arguments.
+        """
+        tokens = tokenize(command)
+        if not tokens:
+            return None, tokens
+        spec = self.commands.get(tokens[0])
+        if spec is None:
+            return None, tokens
+        if spec.raw:
+            rest = command.strip()[len(tokens[0]):].strip()
+            return spec, ([rest] if rest else None if spec.min_args else [])
+        args = tokens[1:]
+        if len(args) < spec.min_args:
+            return spec, None
+        if not spec.accepts(args):
+            return None, tokens
+        return spec, args
+
+    def load_plugins(self, module_names):
+        """Import plugin modules (comma-separated names) and let them register"""
+        loaded = []
+        for module_name in filter(None, (name.strip() for name in module_names.split(','))):
+            before = set(self.commands)
+            try:
+                module = importlib.import_module(module_name)
+                module.register(self)
+            except Exception as e:
+                print(f"Warning: could not load command plugin {module_name!r}: {e}")
+                continue
+            self.plugins.append(module_name)
+            self.plugin_commands.extend(name for name in self.commands if name not in before)
+            loaded.append(module_name)
+        return loaded
@@ -0,0 +1,148 @@
+"""
+Timeout-bounded, cached disk usage of mounted partitions.
+
+statvfs() on a stale network or FUSE mount can block in the kernel for
+minutes, and nothing can interrupt it. Probes therefore run on real OS
+threads, all partitions at once, while the caller waits cooperatively for
+at most the probe timeout. A mount whose probe has not returned by then is
+reported as unavailable; its probe is left to finish in the background and
+is not started again while it is still stuck, so a hung mount costs one
+thread rather than one per request. Results are cached for a short TTL so
+`df`, `top` and the sidebar share one probe per mount.
+"""
+
+import os
+import time
+
+from lazy import lazy_import
+
+try:
+    # OS threads even when eventlet has monkey-patched threading, and a
+    # cooperative select() to wait on them without blocking the hub
+    import eventlet.patcher
+    from eventlet.green import select
+    threading = eventlet.patcher.original('threading')
+except ImportError:
+    import select
+    import threading
+
+psutil = lazy_import('psutil')
+
+DISK_CACHE_TTL = float(os.environ.get('DISK_CACHE_TTL', 10))
+DISK_PROBE_TIMEOUT = float(os.environ.get('DISK_PROBE_TIMEOUT', 2))
+# How often a waiting caller checks whether the probes have finished
+WAIT_INTERVAL = 0.01
+
+
+class PartitionUsage:
+    """Usage of one mounted partition, or why it is unavailable"""
+
+    def __init__(self, device, mountpoint, fstype='', total=0, used=0, free=0, error=None, hung=False):
+        self.device = device
+        self.mountpoint = mountpoint
+        self.fstype = fstype
+        self.total = total
+        self.used = used
+        self.free = free
+        self.error = error
+        # The probe did not return within the timeout
+        self.hung = hung
+
+    @property
+    def available(self):
+        return self.error is None
+
+    @property
+    def percent(self):
+        return (self.used / self.total) * 100 if self.total > 0 else 0
+
+
+class _Probe:
+    """disk_usage() of one mountpoint running on its own thread"""
+
+    def __init__(self, mountpoint, usage_fn):
+        self.started = time.monotonic()
+        self.result = None
+        self.error = None
+        self.done = False
+        thread = threading.Thread(target=self._run, args=(mountpoint, usage_fn),
+                                  name=f'disk-probe {mountpoint}', daemon=True)
+        thread.start()
+
+    def _run(self, mountpoint, usage_fn):
+        try:
+            self.result = usage_fn(mountpoint)
+        except OSError as e:
+            self.error = e.strerror or str(e)
+        finally:
+            self.done = True
+
+
+class DiskProbe:
+    """Probes partitions concurrently and caches their usage for `ttl` seconds"""
+
+    def __init__(self, ttl=DISK_CACHE_TTL, timeout=DISK_PROBE_TIMEOUT, usage_fn=None, partitions_fn=None,
+                 on_timeout=None):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.usage_fn = usage_fn or (lambda mountpoint: psutil.disk_usage(mountpoint))
+        self.partitions_fn = partitions_fn or (lambda: psutil.disk_partitions())
+        # mountpoint -> (expires, (total, used, free) or error message); the
+        # device and fstype come from each caller, not from whoever filled it
+        self.cache = {}
+        # mountpoint -> _Probe still running
+        self.pending = {}
+        # Called with the mountpoint whenever a probe is reported as hung
+        self.on_timeout = on_timeout
+
+    def usage(self, mountpoint='/'):
+        """PartitionUsage of the filesystem holding `mountpoint`"""
+        return self.probe([(mountpoint, mountpoint, '')])[0]
+
+    def partitions(self):
+        """PartitionUsage of every mounted partition, in mount order"""
+        return self.probe([(p.device, p.mountpoint, p.fstype) for p in self.partitions_fn()])
+
+    def probe(self, partitions):
+        """Usage of (device, mountpoint, fstype) entries, waiting at most `timeout`"""
+        now = time.monotonic()
+        results = {}
+        waiting = []
+        for device, mountpoint, fstype in partitions:
+            cached = self.cache.get(mountpoint)
+            if cached is not None and cached[0] > now:
+                results[mountpoint] = self._usage(device, mountpoint, fstype, cached[1])
+                continue
+            probe = self.pending.get(mountpoint)
+            if probe is None:
+                probe = self.pending[mountpoint] = _Probe(mountpoint, self.usage_fn)
+            waiting.append((device, mountpoint, fstype, probe))
+
+        # A probe left over from an earlier call only gets what remains of
+        # its own timeout, so a hung mount does not delay every call
+        deadline = max((probe.started + self.timeout for *_, probe in waiting), default=now)
+        while any(not probe.done for *_, probe in waiting) and time.monotonic() < deadline:
+            select.select([], [], [], WAIT_INTERVAL)
+
+        now = time.monotonic()
+        for device, mountpoint, fstype, probe in waiting:
+            if not probe.done:
+                if self.on_timeout is not None:
+                    self.on_timeout(mountpoint)
+                results[mountpoint] = PartitionUsage(device, mountpoint, fstype,
+                                                     error=f'not responding after {self.timeout:g}s', hung=True)
+                continue
+            self.pending.pop(mountpoint, None)
+            if probe.error is not None:
+                entry = probe.error
+            else:
+                entry = (probe.result.total, probe.result.used, probe.result.free)
+            self.cache[mountpoint] = (now + self.ttl, entry)
+            results[mountpoint] = self._usage(device, mountpoint, fstype, entry)
+        return [results[mountpoint] for _, mountpoint, _ in partitions]
+
+    @staticmethod
+    def _usage(device, mountpoint, fstype, entry):
+        if isinstance(entry, str):
+            return PartitionUsage(device, mountpoint, fstype, error=entry)
+        return PartitionUsage(device, mountpoint, fstype, *entry)
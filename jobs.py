@@ -0,0 +1,374 @@
+"""
+Shell-style job control for a terminal session.
+
+Commands ending in `&` run as background jobs under a per-session
+supervisor. Each job runs in its own process group, so it can be stopped,
+continued and signalled as a whole. Its output goes into a bounded ring
+buffer that can be shown later or streamed when the job is brought to the
+foreground. A single supervisor loop multiplexes the output pipes of all
+jobs with select() and reaps exited children with wait4(), so idle jobs
+cost no threads and no polling beyond one timeout per loop iteration.
+"""
+
+import codecs
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque
+
+try:
+    # Cooperative select so the supervisor loop does not block the eventlet hub,
+    # and the plain one for zero-timeout polls of pipes the loop may be waiting on
+    import eventlet.patcher
+    from eventlet.green import select
+    _select = eventlet.patcher.original('select')
+except ImportError:
+    import select
+    _select = select
+
+JOB_OUTPUT_LINES = int(os.environ.get('JOB_OUTPUT_LINES', 2000))
+MAX_JOBS = int(os.environ.get('MAX_JOBS', 20))
+READ_SIZE = 65536
+# Longer lines are cut so that one job's buffer stays bounded
+MAX_LINE_CHARS = 8192
+# Seconds the supervisor waits for output before checking for exited jobs
+POLL_INTERVAL = 0.5
+
+RUNNING = 'Running'
+STOPPED = 'Stopped'
+DONE = 'Done'
+
+
+class JobError(Exception):
+    """A job could not be started or does not exist"""
+
+
+class OutputRing:
+    """The last `max_lines` lines of a job's output"""
+
+    def __init__(self, max_lines=JOB_OUTPUT_LINES):
+        self.lines = deque(maxlen=max_lines)
+        self.partial = ''
+        # Complete lines ever written, including those dropped from the ring
+        self.total = 0
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+    def feed(self, data):
+        """Append raw bytes and return them decoded"""
+        text = self.decoder.decode(data)
+        lines = (self.partial + text).split('\n')
+        self.partial = lines.pop()[:MAX_LINE_CHARS]
+        for line in lines:
+            self.lines.append(line[:MAX_LINE_CHARS])
+        self.total += len(lines)
+        return text
+
+    def text(self, since=0):
+        """Buffered output after the first `since` lines ever written"""
+        lines = list(self.lines)
+        first = self.total - len(lines)
+        lines = lines[max(0, since - first):]
+        if self.partial:
+            lines.append(self.partial)
+        if first > since:
+            lines.insert(0, f"... {first - since} earlier lines dropped ...")
+        return '\n'.join(lines)
+
+
+def parse_signal(name):
+    """Signal from '9', 'KILL' or 'SIGKILL'"""
+    name = name.upper()
+    try:
+        if name.isdigit():
+            return signal.Signals(int(name))
+        return signal.Signals[name if name.startswith('SIG') else 'SIG' + name]
+    except (KeyError, ValueError):
+        raise JobError(f'{name}: invalid signal specification') from None
+
+
+class Job:
+    """One background command line running in its own process group"""
+
+    def __init__(self, job_id, command, process, max_lines=JOB_OUTPUT_LINES):
+        self.id = job_id
+        self.command = command
+        self.process = process
+        self.pid = process.pid
+        self.fd = process.stdout.fileno()
+        self.state = RUNNING
+        self.return_code = None
+        self.rusage = None
+        self.started = time.monotonic()
+        self.ended = None
+        self.output = OutputRing(max_lines)
+        # Called with decoded text while the job is in the foreground
+        self.listener = None
+        # Output lines already shown to the user
+        self.shown = 0
+        self.output_bytes = 0
+        self.max_output_bytes = None
+        # Set to 'output' if the job was killed for exceeding its output limit
+        self.stopped = None
+        # limits.Usage once the job has been reaped
+        self.usage = None
+        # Set once the user was told the job finished, so `jobs` doesn't repeat it
+        self.reported = False
+
+    @property
+    def done(self):
+        return self.state == DONE
+
+    def status_text(self):
+        if self.state != DONE:
+            return self.state
+        if self.return_code is not None and self.return_code < 0:
+            return signal.strsignal(-self.return_code) or f'Signal {-self.return_code}'
+        return 'Done' if self.return_code == 0 else f'Exit {self.return_code}'
+
+    def describe(self, current=False, show_pid=False):
+        marker = '+' if current else ' '
+        pid = f' {self.pid}' if show_pid else ''
+        suffix = ' &' if self.state == RUNNING else ''
+        return f"[{self.id}]{marker}{pid}  {self.status_text():<12}{self.command}{suffix}"
+
+    def signal(self, signum):
+        if self.done:
+            return
+        try:
+            os.killpg(self.pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def send_input(self, text):
+        if self.process.stdin is not None and not self.done:
+            try:
+                os.write(self.process.stdin.fileno(), text.encode('utf-8'))
+            except OSError:
+                pass
+
+
+class JobSupervisor:
+    """Starts, tracks, signals and reaps the background jobs of one session"""
+
+    def __init__(self, spawn=None, on_change=None, max_jobs=MAX_JOBS, output_lines=JOB_OUTPUT_LINES):
+        self.spawn = spawn or self._spawn_thread
+        self.on_change = on_change
+        self.max_jobs = max_jobs
+        self.output_lines = output_lines
+        self.jobs = OrderedDict()
+        # Most recently started, stopped or resumed job last ('%+')
+        self.recent = []
+        self._loop_running = False
+
+    @staticmethod
+    def _spawn_thread(target):
+        thread = threading.Thread(target=target, name='job-supervisor', daemon=True)
+        thread.start()
+        return thread
+
+    def start(self, command, cwd, env=None, preexec_fn=None, max_output_bytes=None):
+        """Run `command` with /bin/sh in the background and return its Job"""
+        live = [job for job in self.jobs.values() if not job.done]
+        if len(live) >= self.max_jobs:
+            raise JobError(f'Too many jobs (limit {self.max_jobs})')
+        # Finished jobs stay until listed; don't let unlisted ones pile up
+        finished = [job for job in self.jobs.values() if job.done]
+        for job in finished[:max(0, len(finished) - self.max_jobs)]:
+            self.remove(job)
+        job_id = max(self.jobs, default=0) + 1
+        try:
+            process = subprocess.Popen(
+                command,
+                shell=True,
+                cwd=cwd,
+                env=env,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+                preexec_fn=preexec_fn
+            )
+        except OSError as e:
+            raise JobError(str(e)) from e
+        job = Job(job_id, command, process, self.output_lines)
+        job.max_output_bytes = max_output_bytes
+        self.jobs[job_id] = job
+        self._touch(job)
+        if not self._loop_running:
+            self._loop_running = True
+            self.spawn(self._run)
+        return job
+
+    def get(self, spec=None):
+        """Find a job by '%n', 'n', '%+'/'%%' (current) or '%-' (previous)"""
+        if spec in (None, '%', '%+', '%%'):
+            return self.jobs.get(self.recent[-1]) if self.recent else None
+        if spec == '%-':
+            return self.jobs.get(self.recent[-2]) if len(self.recent) > 1 else None
+        try:
+            return self.jobs.get(int(spec.lstrip('%')))
+        except ValueError:
+            # %string: the job whose command starts with it
+            prefix = spec.lstrip('%')
+            for job in reversed(list(self.jobs.values())):
+                if job.command.startswith(prefix):
+                    return job
+            return None
+
+    def current(self):
+        return self.get()
+
+    def listing(self, show_pid=False):
+        """Lines for `jobs`; finished jobs are reported once and forgotten"""
+        self.reap()
+        current = self.current()
+        lines = [job.describe(job is current, show_pid) for job in self.jobs.values()
+                 if not (job.done and job.reported)]
+        for job in [job for job in self.jobs.values() if job.done]:
+            self.remove(job)
+        return lines
+
+    def resume(self, job):
+        """Continue a stopped job"""
+        if job.state == STOPPED:
+            job.signal(signal.SIGCONT)
+            job.state = RUNNING
+        self._touch(job)
+
+    def stop(self, job):
+        # Jobs run in their own session without a controlling terminal, where
+        # the kernel ignores SIGTSTP, so stop them the uncatchable way
+        job.signal(signal.SIGSTOP)
+
+    def remove(self, job):
+        self.jobs.pop(job.id, None)
+        if job.id in self.recent:
+            self.recent.remove(job.id)
+
+    def wait(self, job, timeout=None):
+        """Wait cooperatively until the job finishes or stops; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while job.state == RUNNING:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            if not self._loop_running:
+                self.reap()
+            # select() with no fds doubles as a cooperative sleep
+            select.select([], [], [], 0.05)
+        return True
+
+    def _touch(self, job):
+        if job.id in self.recent:
+            self.recent.remove(job.id)
+        self.recent.append(job.id)
+
+    def _run(self):
+        try:
+            while True:
+                readers = {job.fd: job for job in self.jobs.values() if job.fd is not None}
+                if not readers and all(job.done for job in self.jobs.values()):
+                    return
+                if readers:
+                    readable, _, _ = select.select(list(readers), [], [], POLL_INTERVAL)
+                else:
+                    readable = []
+                    select.select([], [], [], POLL_INTERVAL)
+                for fd in readable:
+                    self._read(readers[fd])
+                self.reap()
+        finally:
+            self._loop_running = False
+
+    def _read(self, job):
+        try:
+            data = os.read(job.fd, READ_SIZE)
+        except OSError:
+            data = b''
+        if not data:
+            self._close_output(job)
+            return
+        job.output_bytes += len(data)
+        if job.max_output_bytes and job.output_bytes > job.max_output_bytes and job.stopped is None:
+            job.stopped = 'output'
+            job.signal(signal.SIGKILL)
+        text = job.output.feed(data)
+        if job.listener is not None:
+            job.listener(text)
+
+    def _close_output(self, job):
+        if job.fd is not None:
+            job.process.stdout.close()
+            if job.process.stdin is not None:
+                job.process.stdin.close()
+            job.fd = None
+
+    def reap(self):
+        """Collect status changes of all jobs without blocking"""
+        for job in list(self.jobs.values()):
+            if job.done:
+                continue
+            try:
+                pid, status, rusage = os.wait4(job.pid, os.WNOHANG | os.WUNTRACED | os.WCONTINUED)
+            except ChildProcessError:
+                # Reaped elsewhere; the exit status is lost
+                self._finish(job, None, None)
+            else:
+                if pid == 0:
+                    continue
+                if os.WIFSTOPPED(status):
+                    job.state = STOPPED
+                    self._touch(job)
+                elif os.WIFCONTINUED(status):
+                    job.state = RUNNING
+                else:
+                    self._finish(job, os.waitstatus_to_exitcode(status), rusage)
+            if self.on_change:
+                self.on_change(job)
+
+    def _finish(self, job, return_code, rusage):
+        # Pick up output written just before exit, then stop watching the
+        # pipe even if a daemonised grandchild still holds it open
+        while job.fd is not None:
+            # A green select here would clash with the loop's own wait on this fd
+            readable, _, _ = _select.select([job.fd], [], [], 0)
+            if not readable:
+                break
+            self._read(job)
+        self._close_output(job)
+        job.state = DONE
+        job.return_code = return_code
+        job.process.returncode = return_code
+        job.rusage = rusage
+        job.ended = time.monotonic()
+
+    def close(self):
+        """Hang up all jobs, as a shell does when its terminal goes away"""
+        for job in self.jobs.values():
+            if not job.done:
+                job.signal(signal.SIGHUP)
+                job.signal(signal.SIGCONT)
+        deadline = time.monotonic() + 1.0
+        while any(not job.done for job in self.jobs.values()) and time.monotonic() < deadline:
+            self.reap()
+            select.select([], [], [], 0.05)
+        for job in self.jobs.values():
+            if not job.done:
+                job.signal(signal.SIGKILL)
+                try:
+                    _, status, rusage = os.wait4(job.pid, 0)
+                    self._finish(job, os.waitstatus_to_exitcode(status), rusage)
+                except ChildProcessError:
+                    self._finish(job, None, None)
+                if self.on_change:
+                    self.on_change(job)
+            self._close_output(job)
+            # Stragglers left in the group after its leader exited; the group
+            # id cannot be reused while any of them is alive
+            try:
+                os.killpg(job.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        self.jobs.clear()
+        self.recent.clear()
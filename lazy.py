@@ -0,0 +1,56 @@
+"""
+Deferred imports and service objects to keep cold starts fast.
+
+`lazy_import` returns a module whose code only runs on first attribute
+access, and `LazyObject` builds a service the first time it is used, so
+importing the app does not pay for dependencies a request may never need.
+"""
+
+import importlib.util
+import sys
+import threading
+
+
+def lazy_import(name):
+    """Return module `name`, executing it on first attribute access"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+class LazyObject:
+    """Proxy that calls `factory()` on first attribute access and delegates to the result"""
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def _get(self):
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    instance = self._factory()
+                    object.__setattr__(self, '_instance', instance)
+        return instance
+
+    @property
+    def loaded(self):
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get(), name, value)
@@ -0,0 +1,317 @@
+"""
+Resource limits and usage accounting for spawned commands.
+
+Every command is started with an rlimit on CPU time, and its output is
+capped by the reader. An address-space rlimit is available but off by
+default: node, the JVM and Go reserve far more virtual memory than they
+use and fail to start under one, so memory is capped by the session
+cgroup's memory.max instead. Each session also has a budget of
+total CPU time and output bytes across all its commands. Where a
+delegated cgroup v2 directory is configured, every session gets its own
+child cgroup whose memory and process limits (pids.max) cover all of the
+session's processes together. There is no per-command process rlimit:
+RLIMIT_NPROC counts every process and thread of the server's user, so a
+low value would let one session starve the others and the server itself.
+
+Usage (wall time, CPU time, peak RSS) comes from wait4(), which reports
+the rusage of the command and all the descendants it waited for. Linux
+carries the resident size of the forking server into the child's peak RSS
+until exec, so for small commands maxrss is bounded below by the server's.
+"""
+
+import codecs
+import os
+import resource
+import signal
+import subprocess
+import time
+
+try:
+    # Cooperative select so waiting on output does not block the eventlet hub
+    from eventlet.green import select
+except ImportError:
+    import select
+
+READ_SIZE = 65536
+MB = 1024 * 1024
+
+
+def _env_number(name, default, cast=float):
+    """Numeric setting from the environment; 0 or '' disables the limit"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return cast(value) if value.strip() else None
+
+
+class ResourceLimits:
+    """rlimits applied to one spawned command (None = unlimited)"""
+
+    def __init__(self, cpu_seconds=None, memory_bytes=None, output_bytes=None):
+        self.cpu_seconds = cpu_seconds or None
+        self.memory_bytes = memory_bytes or None
+        self.output_bytes = output_bytes or None
+
+    @classmethod
+    def from_env(cls, prefix, cpu_default):
+        # RLIMIT_AS counts reserved address space, not memory in use
+        memory_mb = _env_number(f'{prefix}_MAX_MEMORY_MB', None)
+        return cls(
+            cpu_seconds=_env_number(f'{prefix}_CPU_SECONDS', cpu_default),
+            memory_bytes=int(memory_mb * MB) if memory_mb else None,
+            output_bytes=_env_number(f'{prefix}_MAX_OUTPUT_BYTES', 64 * MB, int),
+        )
+
+    def capped(self, cpu_seconds=None):
+        """Copy with the CPU limit lowered to what the session has left"""
+        if cpu_seconds is None or (self.cpu_seconds is not None and self.cpu_seconds <= cpu_seconds):
+            return self
+        return ResourceLimits(cpu_seconds, self.memory_bytes, self.output_bytes)
+
+    def preexec(self, cgroup=None):
+        """Function for Popen(preexec_fn=...) that applies the limits in the child"""
+        def apply():
+            if cgroup is not None:
+                cgroup.attach_self()
+            if self.cpu_seconds:
+                soft = max(1, int(self.cpu_seconds + 0.999))
+                # SIGXCPU at the soft limit, SIGKILL one second later
+                resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 1))
+            if self.memory_bytes:
+                resource.setrlimit(resource.RLIMIT_AS, (self.memory_bytes, self.memory_bytes))
+        return apply
+
+
+class Usage:
+    """Resources used by one finished command"""
+
+    def __init__(self, wall_time, user_time=0.0, system_time=0.0, max_rss_kb=0):
+        self.wall_time = wall_time
+        self.user_time = user_time
+        self.system_time = system_time
+        self.max_rss_kb = max_rss_kb
+
+    @classmethod
+    def from_rusage(cls, rusage, wall_time):
+        if rusage is None:
+            return cls(wall_time)
+        # ru_maxrss is in kilobytes on Linux
+        return cls(wall_time, rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['wall_time'], data.get('user_time', 0.0), data.get('system_time', 0.0), data.get('max_rss_kb', 0))
+
+    @property
+    def cpu_time(self):
+        return self.user_time + self.system_time
+
+    def to_dict(self):
+        return {
+            'wall_time': round(self.wall_time, 3),
+            'cpu_time': round(self.cpu_time, 3),
+            'user_time': round(self.user_time, 3),
+            'system_time': round(self.system_time, 3),
+            'max_rss_kb': self.max_rss_kb,
+        }
+
+    def format(self):
+        """Report in the style of the shell's `time`"""
+        report = (f"real\t{self.wall_time:.3f}s\n"
+                  f"user\t{self.user_time:.3f}s\n"
+                  f"sys\t{self.system_time:.3f}s")
+        if self.max_rss_kb:
+            report += f"\nmaxrss\t{self.max_rss_kb / 1024:.1f} MB"
+        return report
+
+
+class SessionBudget:
+    """CPU time and output bytes a session may use across all its commands"""
+
+    def __init__(self, cpu_seconds=None, output_bytes=None):
+        self.cpu_seconds = cpu_seconds or None
+        self.output_bytes = output_bytes or None
+        self.cpu_used = 0.0
+        self.output_used = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            cpu_seconds=_env_number('SESSION_CPU_SECONDS', 3600),
+            output_bytes=_env_number('SESSION_MAX_OUTPUT_BYTES', 1024 * MB, int),
+        )
+
+    def remaining_cpu(self):
+        if self.cpu_seconds is None:
+            return None
+        return max(0.0, self.cpu_seconds - self.cpu_used)
+
+    def exhausted(self):
+        """Why the session may not start more commands, or None"""
+        if self.cpu_seconds is not None and self.cpu_used >= self.cpu_seconds:
+            return f'Session CPU time limit reached ({self.cpu_seconds:g}s)'
+        if self.output_bytes is not None and self.output_used >= self.output_bytes:
+            return f'Session output limit reached ({self.output_bytes} bytes)'
+        return None
+
+    def limits_for(self, limits):
+        """Command limits further capped by what the session has left"""
+        return limits.capped(self.remaining_cpu())
+
+    def charge(self, usage, output_bytes=0):
+        if usage is not None:
+            self.cpu_used += usage.cpu_time
+        self.output_used += output_bytes
+
+
+class SessionCgroup:
+    """cgroup v2 child group holding all processes of one session"""
+
+    def __init__(self, root, name, memory_bytes=None, processes=None):
+        self.path = os.path.join(root, name)
+        os.makedirs(self.path, exist_ok=True)
+        if memory_bytes:
+            self._write('memory.max', str(memory_bytes))
+        if processes:
+            self._write('pids.max', str(processes))
+
+    @classmethod
+    def for_session(cls, name):
+        """The session's cgroup if TERMINAL_CGROUP_ROOT is set and usable, else None"""
+        root = os.environ.get('TERMINAL_CGROUP_ROOT')
+        if not root:
+            return None
+        memory_mb = _env_number('SESSION_MAX_MEMORY_MB', 8192)
+        try:
+            return cls(root, name,
+                       memory_bytes=int(memory_mb * MB) if memory_mb else None,
+                       processes=_env_number('SESSION_MAX_PROCESSES', 256, int))
+        except OSError as e:
+            print(f"Warning: cgroup limits unavailable under {root}: {e}")
+            return None
+
+    def _write(self, filename, value):
+        with open(os.path.join(self.path, filename), 'w') as f:
+            f.write(value)
+
+    def attach_self(self):
+        # Runs in the forked child before exec; '0' means the writing process
+        self._write('cgroup.procs', '0')
+
+    def remove(self):
+        try:
+            os.rmdir(self.path)
+        except OSError:
+            pass
+
+
+class CommandRun:
+    """Outcome of run_limited()"""
+
+    def __init__(self, return_code, usage, output_bytes, stopped=None):
+        self.return_code = return_code
+        self.usage = usage
+        self.output_bytes = output_bytes
+        # 'timeout' or 'output' if the command was killed by us
+        self.stopped = stopped
+
+    def violation(self, limits):
+        """Message for a limit the command ran into, or None"""
+        if self.stopped == 'output':
+            return f'Output limit exceeded ({limits.output_bytes} bytes); command killed'
+        # The kernel sends SIGXCPU at the soft limit and SIGKILL at the hard
+        # one; /bin/sh reports a killed child as 128 + signal
+        killed = {-signal.SIGXCPU, -signal.SIGKILL, 128 + signal.SIGXCPU, 128 + signal.SIGKILL}
+        # CPU time is accounted in ticks, so allow for rounding below the limit
+        if (limits.cpu_seconds and self.return_code in killed
+                and self.usage.cpu_time >= 0.9 * int(limits.cpu_seconds + 0.999)):
+            return f'CPU time limit exceeded ({limits.cpu_seconds:g}s); command killed'
+        return None
+
+
+def run_limited(command, cwd, limits, on_line, timeout, env=None, cgroup=None):
+    """
+    Run `command` with /bin/sh under `limits`, passing each output line
+    (without its newline) to `on_line`, and return a CommandRun.
+
+    The command gets its own process group, which is killed as a whole on
+    timeout or when the output limit is exceeded.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    process = subprocess.Popen(
+        command,
+        shell=True,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+        preexec_fn=limits.preexec(cgroup)
+    )
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    fd = process.stdout.fileno()
+    partial = ''
+    output_bytes = 0
+    stopped = None
+    try:
+        while True:
+            wait = deadline - time.monotonic()
+            if wait <= 0:
+                stopped = 'timeout'
+                break
+            readable, _, _ = select.select([fd], [], [], wait)
+            if not readable:
+                continue
+            data = os.read(fd, READ_SIZE)
+            if not data:
+                break
+            if limits.output_bytes and output_bytes + len(data) > limits.output_bytes:
+                data = data[:limits.output_bytes - output_bytes]
+                stopped = 'output'
+            output_bytes += len(data)
+            lines = (partial + decoder.decode(data)).split('\n')
+            partial = lines.pop()
+            for line in lines:
+                on_line(line)
+            if stopped:
+                break
+        if partial:
+            on_line(partial)
+    finally:
+        process.stdout.close()
+
+    status, rusage = _reap(process, None if stopped else deadline)
+    if status is None:
+        # Still running at the deadline (e.g. output closed early)
+        stopped = 'timeout'
+        status, rusage = _reap(process, None)
+    return_code = os.waitstatus_to_exitcode(status) if status is not None else None
+    process.returncode = return_code
+    usage = Usage.from_rusage(rusage, time.monotonic() - started)
+    return CommandRun(return_code, usage, output_bytes, stopped)
+
+
+def _reap(process, deadline):
+    """wait4() the command; kill its group first if deadline is None or passes"""
+    while deadline is not None:
+        try:
+            pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        except ChildProcessError:
+            return None, None
+        if pid:
+            return status, rusage
+        if time.monotonic() >= deadline:
+            return None, None
+        # select() with no fds doubles as a cooperative sleep
+        select.select([], [], [], 0.02)
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+        return status, rusage
+    except ChildProcessError:
+        return None, None
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Load generator for the terminal server.
+
+Starts app.py locally (or targets an already running server), connects N
+Socket.IO clients and drives a weighted mix of commands, keystroke-style
+suggestion requests and system info polling. Reports p50/p95/p99 round-trip
+latency per event type, throughput and the server's RSS over time.
+
+Every request asks for a Socket.IO acknowledgement. The server sends it once
+its handler has emitted the reply, so each latency sample belongs to exactly
+one request even when replies arrive out of order.
+
+The server's per-session rate limits (see admission.py) refuse events over
+the limit with `busy`; those are counted as shed, not as replies. At the
+default limits a fast mix mostly measures shedding, so pass --no-limits to
+measure latency of the locally started server without them.
+
+Requires the Socket.IO client extras:
+    pip install "python-socketio[client]"
+
+Example:
+    python load_test.py --clients 200 --duration 30 --mix command=1,suggest=6,sysinfo=2
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import psutil
+
+from ports import find_free_port, wait_for_port
+
+try:
+    import socketio
+except ImportError:  # pragma: no cover - reported at runtime
+    socketio = None
+
+# Request event -> reply event emitted by app.py
+EVENT_REPLIES = {
+    'command': 'terminal_output',
+    'suggest': 'ai_suggestions',
+    'sysinfo': 'system_info',
+}
+# Request event -> Socket.IO event name
+EVENT_NAMES = {
+    'command': 'command',
+    'suggest': 'get_ai_suggestions',
+    'sysinfo': 'get_system_info',
+}
+
+DEFAULT_COMMANDS = ['pwd', 'ls', 'ls -l', 'echo load-test', 'free', 'history']
+DEFAULT_PARTIALS = ['lis', 'list f', 'cre', 'show sys', 'delete', 'go to', 'memo']
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def parse_mix(spec):
+    """Parse 'command=1,suggest=6,sysinfo=2' into a weight dict"""
+    weights = {}
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in EVENT_REPLIES:
+            raise ValueError(f"Unknown event type in mix: {name!r} (expected one of {', '.join(EVENT_REPLIES)})")
+        weights[name] = float(weight or 1)
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError('Event mix must contain at least one positive weight')
+    return weights
+
+
+class LatencyRecorder:
+    """Thread-safe collection of round-trip samples per event type"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.sent = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.shed = defaultdict(int)
+
+    def record_sent(self, event):
+        with self.lock:
+            self.sent[event] += 1
+
+    def record(self, event, seconds):
+        with self.lock:
+            self.samples[event].append(seconds)
+
+    def record_error(self, event):
+        with self.lock:
+            self.errors[event] += 1
+
+    def record_shed(self, event):
+        with self.lock:
+            self.shed[event] += 1
+
+    def summary(self, elapsed):
+        with self.lock:
+            events = sorted(set(self.sent) | set(self.samples))
+            rows = {}
+            for event in events:
+                values = sorted(self.samples[event])
+                rows[event] = {
+                    'sent': self.sent[event],
+                    'received': len(values),
+                    'errors': self.errors[event],
+                    'shed': self.shed[event],
+                    'throughput': len(values) / elapsed if elapsed > 0 else 0.0,
+                    'p50_ms': percentile(values, 50) * 1000,
+                    'p95_ms': percentile(values, 95) * 1000,
+                    'p99_ms': percentile(values, 99) * 1000,
+                    'max_ms': (values[-1] * 1000) if values else 0.0,
+                }
+            return rows
+
+
+class LoadClient:
+    """One simulated browser tab"""
+
+    def __init__(self, url, weights, recorder, rate, commands, partials, transport):
+        self.url = url
+        self.recorder = recorder
+        self.rate = rate
+        self.commands = commands
+        self.partials = partials
+        self.transports = [transport] if transport else None
+        self.events = list(weights)
+        self.weights = [weights[e] for e in self.events]
+        # Request id -> (event, send time), until the server acknowledges it
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.request_ids = itertools.count(1)
+        self.sio = socketio.Client(reconnection=False)
+        self._register_handlers()
+
+    def _register_handlers(self):
+        # Replies are only checked for errors; timing comes from the acks
+        for event, reply in EVENT_REPLIES.items():
+            self.sio.on(reply, self._make_reply_handler(event))
+
+    def _make_reply_handler(self, event):
+        def handler(data=None):
+            if isinstance(data, dict) and (data.get('error') or data.get('type') == 'error'):
+                self.recorder.record_error(event)
+        return handler
+
+    def _handle_ack(self, request_id, *ack):
+        with self.pending_lock:
+            entry = self.pending.pop(request_id, None)
+        if entry is None:
+            return
+        event, started = entry
+        reply = ack[0] if ack else None
+        if isinstance(reply, dict) and reply.get('type') == 'busy':
+            # Refused by a rate limit or for lack of a free subprocess slot
+            self.recorder.record_shed(event)
+            return
+        self.recorder.record(event, time.perf_counter() - started)
+
+    def _send(self, event):
+        request_id = next(self.request_ids)
+        with self.pending_lock:
+            self.pending[request_id] = (event, time.perf_counter())
+        self.recorder.record_sent(event)
+        callback = lambda *ack: self._handle_ack(request_id, *ack)
+        if event == 'command':
+            self.sio.emit(EVENT_NAMES[event], {'command': random.choice(self.commands)}, callback=callback)
+        elif event == 'suggest':
+            self.sio.emit(EVENT_NAMES[event], {'command': random.choice(self.partials)}, callback=callback)
+        else:
+            self.sio.emit(EVENT_NAMES[event], callback=callback)
+
+    def run(self, duration, start_barrier):
+        try:
+            self.sio.connect(self.url, transports=self.transports, wait_timeout=10)
+        except Exception as e:
+            self.recorder.record_error('connect')
+            print(f"connect failed: {e}", file=sys.stderr)
+            start_barrier.wait()
+            return
+        start_barrier.wait()
+        stop_at = time.perf_counter() + duration
+        interval = 1.0 / self.rate if self.rate > 0 else 0
+        try:
+            while time.perf_counter() < stop_at and self.sio.connected:
+                self._send(random.choices(self.events, weights=self.weights)[0])
+                if interval:
+                    # Poisson arrivals keep clients from marching in lockstep
+                    time.sleep(random.expovariate(1.0 / interval))
+        except Exception as e:
+            self.recorder.record_error('client')
+            print(f"client error: {e}", file=sys.stderr)
+        finally:
+            # Give in-flight replies a moment before hanging up
+            time.sleep(0.5)
+            with self.pending_lock:
+                for event, _ in self.pending.values():
+                    self.recorder.record_error(event)
+                self.pending.clear()
+            self.sio.disconnect()
+
+
+class RssSampler(threading.Thread):
+    """Samples the server process RSS (including children) at a fixed interval"""
+
+    def __init__(self, pid, interval):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stop_event = threading.Event()
+
+    def run(self):
+        try:
+            proc = psutil.Process(self.pid)
+        except psutil.NoSuchProcess:
+            return
+        started = time.perf_counter()
+        while not self.stop_event.is_set():
+            try:
+                rss = proc.memory_info().rss
+                for child in proc.children(recursive=True):
+                    try:
+                        rss += child.memory_info().rss
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        pass
+            except psutil.NoSuchProcess:
+                break
+            self.samples.append((time.perf_counter() - started, rss))
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join(timeout=2)
+
+
+def start_server(port, production, no_limits=False):
+    """Launch app.py in a child process and wait until it accepts connections"""
+    env = dict(os.environ, PORT=str(port))
+    if production:
+        env['FLASK_ENV'] = 'production'
+    if no_limits:
+        # A rate of 0 and a cap of 0 turn admission control off
+        env['RATE_LIMITS'] = ','.join(f'{name}=0' for name in EVENT_NAMES.values())
+        env['RATE_LIMIT_DEFAULT'] = '0'
+        env['MAX_CONCURRENT_SUBPROCESSES'] = '0'
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    process = subprocess.Popen(
+        [sys.executable, app_path],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    if not wait_for_port(port, timeout=20):
+        process.kill()
+        raise RuntimeError(f'Server did not start listening on port {port}')
+    return process
+
+
+def format_report(summary, elapsed, rss_samples, clients):
+    lines = []
+    lines.append(f"Load test: {clients} clients, {elapsed:.1f}s")
+    lines.append("=" * 85)
+    lines.append(f"{'EVENT':<10} {'SENT':>8} {'RECV':>8} {'SHED':>6} {'ERR':>6} {'REQ/S':>9} {'P50 ms':>9} {'P95 ms':>9} {'P99 ms':>9}")
+    lines.append("-" * 85)
+    total = 0
+    for event, row in summary.items():
+        total += row['received']
+        lines.append(
+            f"{event:<10} {row['sent']:>8} {row['received']:>8} {row['shed']:>6} {row['errors']:>6} "
+            f"{row['throughput']:>9.1f} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}"
+        )
+    lines.append("-" * 85)
+    lines.append(f"Total throughput: {total / elapsed if elapsed > 0 else 0:.1f} replies/s")
+
+    if rss_samples:
+        lines.append("")
+        lines.append("Server RSS over time:")
+        # Print at most ~20 evenly spaced samples
+        step = max(1, len(rss_samples) // 20)
+        for offset, rss in rss_samples[::step]:
+            lines.append(f"  t={offset:>6.1f}s  {rss / (1024**2):>8.1f} MB")
+        peak = max(rss for _, rss in rss_samples)
+        lines.append(f"  peak          {peak / (1024**2):>8.1f} MB")
+    return '\n'.join(lines)
+
+
+def run_load_test(args):
+    weights = parse_mix(args.mix)
+    commands = args.commands or DEFAULT_COMMANDS
+    server = None
+    url = args.url
+    server_pid = args.server_pid
+
+    if not url:
+        port = args.port or find_free_port()
+        server = start_server(port, args.production, args.no_limits)
+        url = f'http://127.0.0.1:{port}'
+        server_pid = server.pid
+    elif args.no_limits:
+        print('--no-limits only applies to a server started by the load test; '
+              'set RATE_LIMITS on the target server instead', file=sys.stderr)
+
+    recorder = LatencyRecorder()
+    sampler = RssSampler(server_pid, args.rss_interval) if server_pid else None
+    try:
+        clients = [
+            LoadClient(url, weights, recorder, args.rate, commands, DEFAULT_PARTIALS, args.transport)
+            for _ in range(args.clients)
+        ]
+        barrier = threading.Barrier(args.clients + 1)
+        # The clock starts once every client has connected
+        threads = [
+            threading.Thread(target=client.run, args=(args.duration, barrier), daemon=True)
+            for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        if sampler:
+            sampler.start()
+        barrier.wait(timeout=args.ramp_timeout)
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join(timeout=args.duration + 30)
+        elapsed = time.perf_counter() - started
+    finally:
+        if sampler:
+            sampler.stop()
+        if server:
+            server.terminate()
+            try:
+                server.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    summary = recorder.summary(elapsed)
+    rss_samples = sampler.samples if sampler else []
+    if args.json:
+        print(json.dumps({
+            'clients': args.clients,
+            'duration': elapsed,
+            'events': summary,
+            'rss': [{'t': t, 'bytes': rss} for t, rss in rss_samples],
+        }, indent=2))
+    else:
+        print(format_report(summary, elapsed, rss_samples, args.clients))
+    return summary
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Socket.IO load generator for the terminal server')
+    parser.add_argument('--clients', type=int, default=50, help='number of concurrent simulated tabs')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds to generate load')
+    parser.add_argument('--rate', type=float, default=2.0, help='mean events per second per client (0 = as fast as possible)')
+    parser.add_argument('--mix', default='command=1,suggest=6,sysinfo=2',
+                        help='weighted event mix, e.g. command=1,suggest=6,sysinfo=2')
+    parser.add_argument('--commands', nargs='*', help='commands to pick from for command events')
+    parser.add_argument('--url', help='target an already running server instead of starting app.py')
+    parser.add_argument('--server-pid', type=int, help='PID to sample RSS from when using --url')
+    parser.add_argument('--port', type=int, help='port for the locally started server (default: random free port)')
+    parser.add_argument('--production', action='store_true', help='start app.py with FLASK_ENV=production')
+    parser.add_argument('--no-limits', action='store_true',
+                        help='start app.py without rate limits or concurrency caps, to measure latency instead of shedding')
+    parser.add_argument('--transport', choices=['websocket', 'polling'], help='force a single Socket.IO transport')
+    parser.add_argument('--rss-interval', type=float, default=1.0, help='seconds between RSS samples')
+    parser.add_argument('--ramp-timeout', type=float, default=30.0, help='seconds to wait for all clients to connect')
+    parser.add_argument('--json', action='store_true', help='emit a machine-readable JSON report')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if socketio is None:
+        print('python-socketio client support is required: pip install "python-socketio[client]"', file=sys.stderr)
+        return 2
+    try:
+        run_load_test(args)
+    except (ValueError, RuntimeError, threading.BrokenBarrierError) as e:
+        print(f"load test failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
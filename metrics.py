@@ -0,0 +1,238 @@
+"""
+Minimal Prometheus-compatible metrics registry.
+
+Counters, gauges and histograms with labels, rendered in the Prometheus text
+exposition format. Recording a sample is a dict lookup plus a bisect under a
+per-metric lock, so instrumenting hot paths stays cheap.
+"""
+
+import bisect
+import threading
+import time
+from functools import wraps
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {labels}')
+        return tuple(str(label) for label in labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        lines.extend(self._render_samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, *labels):
+        return self.values.get(self._key(labels), 0)
+
+    def _render_samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    type_name = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed distribution of observed values"""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self.series = {}
+
+    def observe(self, *labels, value):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels):
+        """Context manager that observes the elapsed wall time of its body"""
+        return _Timer(self, labels)
+
+    def _render_samples(self):
+        with self.lock:
+            items = [(key, list(series[0]), series[1], series[2]) for key, series in self.series.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(*self.labels, value=time.perf_counter() - self.started)
+        return False
+
+
+class Registry:
+    """Collection of metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = Registry()
+
+# Socket.IO handlers
+EVENTS = registry.counter('terminal_events_total', 'Socket.IO events handled', ['handler'])
+EVENT_ERRORS = registry.counter('terminal_event_errors_total', 'Socket.IO handlers that raised', ['handler'])
+EVENT_LATENCY = registry.histogram('terminal_event_duration_seconds', 'Socket.IO handler latency', ['handler'])
+
+# Builtin commands
+BUILTINS = registry.counter('terminal_builtin_commands_total', 'Builtin commands executed', ['builtin'])
+BUILTIN_LATENCY = registry.histogram('terminal_builtin_duration_seconds', 'Builtin command latency', ['builtin'])
+
+# Spawned processes
+SUBPROCESS_SPAWNS = registry.counter('terminal_subprocess_spawns_total', 'Shell commands spawned')
+SUBPROCESS_LATENCY = registry.histogram('terminal_subprocess_duration_seconds', 'Spawned command wall time')
+BACKGROUND_JOBS = registry.gauge('terminal_background_jobs', 'Background jobs not yet reaped')
+SUBPROCESS_TIMEOUTS = registry.counter('terminal_subprocess_timeouts_total', 'Spawned commands killed by the timeout')
+LIMITS_EXCEEDED = registry.counter('terminal_limits_exceeded_total', 'Commands refused or killed by a resource limit', ['limit'])
+
+# File transfers
+FILE_TRANSFER_BYTES = registry.counter('terminal_file_transfer_bytes_total', 'Bytes sent by /files/download or received by /files/upload', ['direction'])
+
+# Disk probes
+DISK_PROBE_TIMEOUTS = registry.counter('terminal_disk_probe_timeouts_total', 'Partition usage probes reported as hung')
+
+# Admission control
+LOAD_SHED = registry.counter('terminal_load_shed_total', 'Events and work refused with a busy reply', ['event', 'reason'])
+
+# LLM calls
+LLM_CALLS = registry.counter('terminal_llm_calls_total', 'LLM API calls', ['operation'])
+LLM_ERRORS = registry.counter('terminal_llm_errors_total', 'LLM API calls that failed', ['operation'])
+LLM_LATENCY = registry.histogram('terminal_llm_duration_seconds', 'LLM API call latency', ['operation'])
+
+# Startup
+STARTUP_SECONDS = registry.gauge('terminal_startup_seconds', 'Seconds from app import to the first HTTP request')
+
+# Sessions and output
+ACTIVE_SESSIONS = registry.gauge('terminal_active_sessions', 'Connected Socket.IO clients')
+OUTPUT_BYTES = registry.counter('terminal_output_bytes_total', 'Bytes of command output sent to clients', ['event'])
+
+
+def instrument_handler(name):
+    """Decorator recording count, errors and latency of a Socket.IO handler"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            EVENTS.inc(name)
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                EVENT_ERRORS.inc(name)
+                raise
+            finally:
+                EVENT_LATENCY.observe(name, value=time.perf_counter() - started)
+        return wrapper
+    return decorator
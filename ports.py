@@ -0,0 +1,28 @@
+"""
+Local TCP port helpers for the benchmark and load test scripts.
+
+Kept free of third-party imports so that a script timing a cold start does
+not pull in the load generator's dependencies.
+"""
+
+import socket
+import time
+
+
+def find_free_port():
+    """A port on 127.0.0.1 that nothing is listening on right now"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout):
+    """True once 127.0.0.1:port accepts connections, False after `timeout` seconds"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
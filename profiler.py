@@ -0,0 +1,184 @@
+"""
+Low-overhead sampling profiler for the running server.
+
+A native OS thread periodically snapshots the stack of every thread
+(sys._current_frames) and, in wall-clock mode, of every suspended greenlet.
+Greenlets are found by one heap walk when sampling starts and then through a
+greenlet trace hook, which sees every greenlet the server switches to.
+Samples are aggregated into collapsed stacks, the input format of
+flamegraph.pl / speedscope, plus a top-N table of hot functions.
+"""
+
+import gc
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+try:
+    # The sampler must be a real OS thread even if eventlet monkey patching is on
+    from eventlet.patcher import original
+    _threading = original('threading')
+    _time = original('time')
+except ImportError:
+    import threading as _threading
+    _time = time
+
+try:
+    import greenlet
+except ImportError:
+    greenlet = None
+
+MAX_STACK_DEPTH = 128
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a capture is requested while another one is running"""
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _walk(frame):
+    """Return the stack rooted at the outermost frame as a tuple of labels"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+def _thread_names():
+    """ident -> name of all threads known to the stock or the unpatched threading module"""
+    # Under eventlet each module has its own registry: real OS threads
+    # started through the unpatched one (e.g. disk probes) are only in its
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    if _threading is not threading:
+        names.update((thread.ident, thread.name) for thread in _threading.enumerate())
+    return names
+
+
+class SamplingProfiler:
+    """Collects stack samples from a background thread until stopped"""
+
+    def __init__(self, interval=0.005, include_greenlets=True):
+        self.interval = interval
+        self.include_greenlets = include_greenlets and greenlet is not None
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = _threading.Event()
+        self._thread = None
+        self._greenlets = set()
+        self._previous_trace = None
+
+    def start(self):
+        """Start sampling; stop() must be called from the same thread"""
+        self.started = _time.perf_counter()
+        if self.include_greenlets:
+            # The only heap walk: greenlets created later are picked up by
+            # _trace, which greenlet calls on every switch in this thread
+            self._greenlets = {obj for obj in gc.get_objects() if isinstance(obj, greenlet.greenlet)}
+            self._previous_trace = greenlet.settrace(self._trace)
+        self._thread = _threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.include_greenlets:
+            greenlet.settrace(self._previous_trace)
+            self._greenlets = set()
+        self.elapsed = _time.perf_counter() - self.started
+
+    def _trace(self, event, args):
+        if event in ('switch', 'throw'):
+            # args is (origin, target); set.add is atomic under the GIL
+            self._greenlets.add(args[1])
+        if self._previous_trace is not None:
+            self._previous_trace(event, args)
+
+    def _run(self):
+        own_ident = _threading.get_ident()
+        thread_names = {}
+        while not self._stop.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                name = thread_names.get(ident)
+                if name is None:
+                    known = _thread_names()
+                    name = thread_names[ident] = f"thread:{known.get(ident, ident)}"
+                self.stacks[(name,) + _walk(frame)] += 1
+
+            if self.include_greenlets:
+                # list() of a set copies it without releasing the GIL
+                for glet in list(self._greenlets):
+                    if glet.dead:
+                        self._greenlets.discard(glet)
+                        continue
+                    # gr_frame is None for the running greenlet (already
+                    # captured above) and for dead or unstarted ones
+                    frame = getattr(glet, 'gr_frame', None)
+                    if frame is not None:
+                        self.stacks[('greenlet',) + _walk(frame)] += 1
+
+            self.samples += 1
+            self._stop.wait(self.interval)
+
+    def collapsed(self):
+        """Render samples as 'frame;frame;frame count' lines"""
+        lines = [f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()]
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+    def top(self, limit=20):
+        """Hottest functions by self samples, with inclusive counts"""
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack[1:]
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for label in set(frames):
+                total_counts[label] += count
+        total = sum(self.stacks.values()) or 1
+        return [
+            {
+                'function': label,
+                'self': count,
+                'total': total_counts[label],
+                'self_percent': round(100.0 * count / total, 2),
+                'total_percent': round(100.0 * total_counts[label] / total, 2),
+            }
+            for label, count in self_counts.most_common(limit)
+        ]
+
+
+_capture_lock = _threading.Lock()
+
+
+def capture(seconds, sleep=time.sleep, interval=0.005, include_greenlets=True):
+    """
+    Profile the whole process for `seconds` and return the stopped profiler.
+
+    `sleep` is how the caller waits; pass a cooperative sleep (e.g.
+    socketio.sleep) when calling from a greenlet so the server keeps running.
+    """
+    if not _capture_lock.acquire(blocking=False):
+        raise ProfilerBusyError('A profile capture is already running')
+    try:
+        profiler = SamplingProfiler(interval=interval, include_greenlets=include_greenlets)
+        profiler.start()
+        try:
+            sleep(seconds)
+        finally:
+            profiler.stop()
+        return profiler
+    finally:
+        _capture_lock.release()
@@ -0,0 +1,220 @@
+"""
+Persistent PTY-backed bash shell for a terminal session.
+
+Commands are written to one long-lived interactive bash attached to a
+pseudo-terminal, so environment variables, aliases, functions and the
+working directory survive between commands and programs see a real TTY.
+Command boundaries are detected with a PROMPT_COMMAND that prints a
+per-shell marker and the exit status before every prompt.
+"""
+
+import codecs
+import os
+import pty
+import re
+import shutil
+import signal
+import termios
+import time
+import uuid
+
+import psutil
+
+try:
+    # Cooperative select so waiting on the PTY does not block the eventlet hub
+    from eventlet.green import select
+except ImportError:
+    import select
+
+READ_SIZE = 65536
+# Seconds to wait for the prompt after interrupting a timed-out command
+INTERRUPT_GRACE = 2.0
+
+
+class ShellError(Exception):
+    """The shell could not be started or stopped responding"""
+
+
+class PtyShell:
+    """Long-lived interactive bash running on a pseudo-terminal"""
+
+    def __init__(self, cwd, shell=None, term=None, preexec_fn=None):
+        self.cwd = cwd
+        # Run in the child before bash starts, e.g. to apply rlimits
+        self.preexec_fn = preexec_fn
+        self.shell = shell or shutil.which('bash')
+        self.term = term or os.environ.get('PTY_TERM', 'dumb')
+        self.pid = None
+        self.fd = None
+        self.busy = False
+        # Set when the PTY reported end of file: the shell is gone or going
+        self.hung_up = False
+        self.marker = f"__TERMINAL_DONE_{uuid.uuid4().hex}__"
+        self.marker_re = re.compile(r'\n?' + re.escape(self.marker) + r':(\d+)\n')
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+    @property
+    def alive(self):
+        if self.pid is None:
+            return False
+        try:
+            pid, _ = os.waitpid(self.pid, os.WNOHANG)
+        except ChildProcessError:
+            return False
+        return pid == 0
+
+    def start(self, cwd=None):
+        """Start bash in `cwd`, or where the previous shell started"""
+        if cwd is not None:
+            self.cwd = cwd
+        if not self.shell:
+            raise ShellError('bash is required for PTY shell mode')
+        env = dict(os.environ,
+                   TERM=self.term,
+                   PS1='', PS2='',
+                   PROMPT_COMMAND=f'printf "\\n{self.marker}:%s\\n" "$?"')
+        pid, fd = pty.fork()
+        if pid == 0:  # pragma: no cover - child process
+            try:
+                if self.preexec_fn is not None:
+                    self.preexec_fn()
+                os.chdir(self.cwd)
+                os.execve(self.shell, [self.shell, '--noprofile', '--norc', '--noediting', '-i'], env)
+            finally:
+                os._exit(127)
+
+        self.pid, self.fd = pid, fd
+        # No echo of our own input and no \n -> \r\n translation
+        attrs = termios.tcgetattr(fd)
+        attrs[1] &= ~termios.ONLCR
+        attrs[3] &= ~termios.ECHO
+        termios.tcsetattr(fd, termios.TCSANOW, attrs)
+
+        # Discard bash's startup noise up to the first prompt
+        _, status = self._read_until_marker(None, time.monotonic() + 10)
+        if status is None:
+            self.close()
+            raise ShellError('Shell did not start')
+
+    def cwd_now(self):
+        """Current working directory of the shell process"""
+        try:
+            return psutil.Process(self.pid).cwd()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return self.cwd
+
+    def send_input(self, data):
+        """Write raw input (keystrokes, lines, ^C) to whatever is running"""
+        os.write(self.fd, data.encode('utf-8'))
+
+    def run(self, command, on_output=None, timeout=15, cwd=None):
+        """
+        Run one command line and return (output, exit_status, timed_out).
+
+        With `on_output`, output is handed over as it arrives instead of
+        being collected and returned. On timeout the foreground job is
+        interrupted with ^C; exit_status is None if the shell exited or did
+        not return to its prompt. If the shell has to be (re)started, it
+        starts in `cwd`.
+        """
+        if self.busy:
+            raise ShellError('Shell is busy')
+        if not self.alive:
+            self.start(cwd)
+
+        self.busy = True
+        try:
+            self.send_input(command.rstrip('\n') + '\n')
+            deadline = time.monotonic() + timeout if timeout else None
+            output, status = self._read_until_marker(on_output, deadline)
+            if status is not None:
+                return output, status, False
+            if self.hung_up or not self.alive:
+                # The command exited the shell; the next one starts a new one
+                self.close()
+                return output, None, False
+
+            self.send_input('\x03')
+            rest, status = self._read_until_marker(on_output, time.monotonic() + INTERRUPT_GRACE)
+            if status is None:
+                # Unresponsive; the next command gets a fresh shell
+                self.close()
+            return output + rest, status, True
+        finally:
+            self.busy = False
+
+    def _read_until_marker(self, on_output, deadline):
+        chunks = []
+        pending = ''
+        # Hold back enough text to never emit half of a marker
+        keep = len(self.marker) + 16
+        while True:
+            wait = None if deadline is None else deadline - time.monotonic()
+            if wait is not None and wait <= 0:
+                break
+            readable, _, _ = select.select([self.fd], [], [], wait)
+            if not readable:
+                continue
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except OSError:
+                data = b''
+            if not data:
+                # The shell exited, though it may not have been reaped yet
+                self.hung_up = True
+                break
+
+            pending += self.decoder.decode(data)
+            match = self.marker_re.search(pending)
+            if match:
+                self._deliver(pending[:match.start()], chunks, on_output)
+                return ''.join(chunks), int(match.group(1))
+
+            if len(pending) > keep:
+                text, pending = pending[:-keep], pending[-keep:]
+                self._deliver(text, chunks, on_output)
+
+        self._deliver(pending, chunks, on_output)
+        return ''.join(chunks), None
+
+    @staticmethod
+    def _deliver(text, chunks, on_output):
+        if not text:
+            return
+        if on_output:
+            on_output(text)
+        else:
+            chunks.append(text)
+
+    def close(self):
+        if self.pid is not None:
+            try:
+                os.killpg(self.pid, signal.SIGHUP)
+            except (ProcessLookupError, PermissionError):
+                pass
+            self._reap()
+        if self.fd is not None:
+            try:
+                os.close(self.fd)
+            except OSError:
+                pass
+        self.pid = None
+        self.fd = None
+        self.hung_up = False
+        self.decoder.reset()
+
+    def _reap(self):
+        for _ in range(20):
+            try:
+                pid, _ = os.waitpid(self.pid, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid:
+                return
+            # select() with no fds doubles as a cooperative sleep
+            select.select([], [], [], 0.05)
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+            os.waitpid(self.pid, 0)
+        except (ProcessLookupError, PermissionError, ChildProcessError):
+            pass
@@ -0,0 +1,250 @@
+"""
+Per-session scrollback spool for large command outputs.
+
+Output lines are grouped into fixed-size pages and each full page is zlib
+compressed, so a spooled output never holds more than one uncompressed page
+in memory. Clients receive a head/tail preview and fetch the hidden middle
+page by page. Each session's store is capped by compressed size; the oldest
+pages are evicted first.
+"""
+
+import itertools
+import os
+import zlib
+from collections import OrderedDict, deque
+
+DEFAULT_MAX_BYTES = int(os.environ.get('SCROLLBACK_MAX_BYTES', 16 * 1024 * 1024))
+PAGE_LINES = 500
+HEAD_LINES = 100
+TAIL_LINES = 200
+# Outputs above this many characters are spooled even if they have few lines
+INLINE_MAX_CHARS = 64 * 1024
+# Character budget for each of the head and tail previews
+PREVIEW_MAX_CHARS = 16 * 1024
+# Longer lines are split so that a single page stays bounded
+MAX_LINE_CHARS = 8192
+MAX_FETCH_LINES = 2000
+
+_ids = itertools.count(1)
+
+
+class SpooledOutput:
+    """Paged, compressed record of one command's output"""
+
+    def __init__(self, store, output_id):
+        self.store = store
+        self.id = output_id
+        self.pages = []          # compressed pages, None once evicted
+        self.current = []        # uncompressed lines of the page being filled
+        self.head = []
+        self.tail = deque(maxlen=store.tail_lines)
+        self.total_lines = 0
+        self.total_chars = 0
+        self.closed = False
+        self.partial = ''
+        self._cached_page = (None, None)
+
+    def write(self, line):
+        """Append one line (without the trailing newline)"""
+        if len(line) > MAX_LINE_CHARS:
+            for start in range(0, len(line), MAX_LINE_CHARS):
+                self._append(line[start:start + MAX_LINE_CHARS])
+        else:
+            self._append(line)
+
+    def write_text(self, text):
+        for line in text.split('\n'):
+            self.write(line)
+
+    def feed(self, text):
+        """Append a chunk of a stream that may end mid-line"""
+        lines = (self.partial + text).split('\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self.write(line)
+
+    def _append(self, line):
+        if len(self.head) < self.store.head_lines:
+            self.head.append(line)
+        self.tail.append(line)
+        self.current.append(line)
+        self.total_lines += 1
+        self.total_chars += len(line) + 1
+        if len(self.current) >= self.store.page_lines:
+            self._flush_page()
+
+    def _flush_page(self):
+        if not self.current:
+            return
+        data = zlib.compress('\n'.join(self.current).encode('utf-8', 'surrogateescape'), 6)
+        self.pages.append(data)
+        self.current = []
+        self.store._account(len(data))
+
+    def close(self):
+        if self.partial:
+            self.write(self.partial)
+            self.partial = ''
+        self._flush_page()
+        self.closed = True
+
+    @property
+    def compressed_bytes(self):
+        return sum(len(page) for page in self.pages if page is not None)
+
+    @property
+    def is_large(self):
+        return (self.total_lines > self.store.head_lines + self.store.tail_lines
+                or self.total_chars > INLINE_MAX_CHARS)
+
+    def full_text(self):
+        """All lines, only valid for outputs that fit in head + tail"""
+        remaining = self.total_lines - len(self.head)
+        lines = self.head + (list(self.tail)[-remaining:] if remaining > 0 else [])
+        return '\n'.join(lines)
+
+    def _page_lines(self, index):
+        if self._cached_page[0] == index:
+            return self._cached_page[1]
+        if index == len(self.pages):
+            return self.current
+        data = self.pages[index]
+        if data is None:
+            return None
+        lines = zlib.decompress(data).decode('utf-8', 'surrogateescape').split('\n')
+        self._cached_page = (index, lines)
+        return lines
+
+    def read(self, offset, limit):
+        """Return (lines, evicted) for the line range [offset, offset + limit)"""
+        offset = max(0, offset)
+        end = min(self.total_lines, offset + max(0, min(limit, MAX_FETCH_LINES)))
+        lines = []
+        evicted = False
+        page_size = self.store.page_lines
+        position = offset
+        while position < end:
+            index, start = divmod(position, page_size)
+            page = self._page_lines(index)
+            take = min(end - position, page_size - start)
+            if page is None:
+                evicted = True
+                lines.extend([''] * take)
+            else:
+                lines.extend(page[start:start + take])
+            position += take
+        return lines, evicted
+
+    def preview(self):
+        """Split into (head, tail) line lists within the preview budget"""
+        head = _fit(self.head, PREVIEW_MAX_CHARS)
+        remaining = self.total_lines - len(head)
+        tail = list(self.tail)[-remaining:] if remaining > 0 else []
+        tail = _fit(tail[::-1], PREVIEW_MAX_CHARS)[::-1]
+        # Small outputs with very long lines may overlap head and tail
+        if len(head) + len(tail) > self.total_lines:
+            tail = tail[len(head) + len(tail) - self.total_lines:]
+        return head, tail
+
+    def describe(self, head, tail):
+        return {
+            'id': self.id,
+            'total_lines': self.total_lines,
+            'head_lines': len(head),
+            'tail_lines': len(tail),
+            'compressed_bytes': self.compressed_bytes,
+        }
+
+
+def _fit(lines, budget):
+    """Longest prefix of `lines` whose text fits in `budget` characters"""
+    used = 0
+    for count, line in enumerate(lines):
+        used += len(line) + 1
+        if used > budget:
+            return lines[:count]
+    return list(lines)
+
+
+class ScrollbackStore:
+    """Size-capped collection of spooled outputs for one session"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, page_lines=PAGE_LINES,
+                 head_lines=HEAD_LINES, tail_lines=TAIL_LINES):
+        self.max_bytes = max_bytes
+        self.page_lines = page_lines
+        self.head_lines = head_lines
+        self.tail_lines = tail_lines
+        self.outputs = OrderedDict()
+        self.total_bytes = 0
+
+    def open(self):
+        """Start spooling a new output"""
+        output = SpooledOutput(self, next(_ids))
+        self.outputs[output.id] = output
+        return output
+
+    def spool_text(self, text):
+        output = self.open()
+        output.write_text(text)
+        output.close()
+        return output
+
+    def get(self, output_id):
+        return self.outputs.get(output_id)
+
+    def discard(self, output):
+        if self.outputs.pop(output.id, None) is not None:
+            self.total_bytes -= output.compressed_bytes
+
+    def clear(self):
+        self.outputs.clear()
+        self.total_bytes = 0
+
+    def _account(self, nbytes):
+        self.total_bytes += nbytes
+        while self.total_bytes > self.max_bytes and self._evict_oldest_page():
+            pass
+
+    def _evict_oldest_page(self):
+        """Drop the oldest compressed page, removing outputs with nothing left"""
+        for output_id, output in list(self.outputs.items()):
+            for index, page in enumerate(output.pages):
+                if page is not None:
+                    output.pages[index] = None
+                    self.total_bytes -= len(page)
+                    if output._cached_page[0] == index:
+                        output._cached_page = (None, None)
+                    return True
+            if output.closed:
+                del self.outputs[output_id]
+        return False
+
+    def finish(self, output, result):
+        """Fill `result` with the full output, or a preview plus spool metadata"""
+        output.close()
+        if not output.is_large:
+            result['output'] = output.full_text()
+            self.discard(output)
+            return result
+        head, tail = output.preview()
+        hidden = output.total_lines - len(head) - len(tail)
+        marker = f"... {hidden} more lines (output #{output.id}) ..."
+        result['output'] = '\n'.join(head + [marker] + tail)
+        result['spool'] = output.describe(head, tail)
+        # Up to head_lines + tail_lines lines of MAX_LINE_CHARS each, outside
+        # the byte cap; the pages hold every line from here on
+        output.head = []
+        output.tail.clear()
+        return result
+
+    def spool_result(self, result):
+        """Spool an already-built result if its output is too large to send inline"""
+        text = result.get('output')
+        if not text or result.get('type') != 'output' or 'spool' in result:
+            return result
+        if len(text) <= INLINE_MAX_CHARS and text.count('\n') < self.head_lines + self.tail_lines:
+            return result
+        output = self.open()
+        output.write_text(text)
+        return self.finish(output, result)
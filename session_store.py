@@ -0,0 +1,138 @@
+"""
+Externalised terminal session state.
+
+Each browser tab keeps a session id and presents it when it connects, so
+the worker that receives the connection can restore the working directory
+and history even if another worker served the tab before. State is kept in
+memory (single process), in a directory of JSON files (several workers on
+one host) or in Redis (workers on several hosts).
+"""
+
+import json
+import os
+import re
+import tempfile
+from collections import OrderedDict
+
+# Only the most recent commands are persisted with the session
+MAX_HISTORY = 1000
+# Redis keys expire after a day without commands
+REDIS_TTL = 24 * 60 * 60
+
+_SESSION_ID_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+def valid_session_id(session_id):
+    return isinstance(session_id, str) and bool(_SESSION_ID_RE.match(session_id))
+
+
+def _trim(state):
+    state = dict(state)
+    state['command_history'] = list(state.get('command_history', []))[-MAX_HISTORY:]
+    return state
+
+
+class MemorySessionStore:
+    """Session state for a single worker process, least recently used dropped first"""
+
+    def __init__(self, max_sessions=10000):
+        self.max_sessions = max_sessions
+        self.states = OrderedDict()
+
+    def load(self, session_id):
+        return self.states.get(session_id)
+
+    def save(self, session_id, state):
+        self.states[session_id] = _trim(state)
+        self.states.move_to_end(session_id)
+        while len(self.states) > self.max_sessions:
+            self.states.popitem(last=False)
+
+    def delete(self, session_id):
+        self.states.pop(session_id, None)
+
+
+def default_store_dir():
+    """Per-user directory for FileSessionStore: $XDG_RUNTIME_DIR or the temp dir"""
+    base = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(base, f'terminal-sessions-{os.getuid()}')
+
+
+class FileSessionStore:
+    """Session state as JSON files shared by the workers on one host"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        # Session ids are the credential for /files, so no one else may list
+        # them or read the state; mkstemp() in save() creates files as 0o600
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.stat(directory)
+        if info.st_uid != os.getuid():
+            raise PermissionError(f'{directory} is owned by another user')
+        if info.st_mode & 0o077:
+            os.chmod(directory, 0o700)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f'{session_id}.json')
+
+    def load(self, session_id):
+        try:
+            with open(self._path(session_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, session_id, state):
+        # Write then rename, so a concurrent reader never sees half a file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(_trim(state), f)
+            os.replace(tmp_path, self._path(session_id))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def delete(self, session_id):
+        try:
+            os.unlink(self._path(session_id))
+        except OSError:
+            pass
+
+
+class RedisSessionStore:
+    """Session state in Redis, shared by workers on any host"""
+
+    def __init__(self, url, prefix='terminal:session:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def load(self, session_id):
+        data = self.client.get(self.prefix + session_id)
+        return json.loads(data) if data else None
+
+    def save(self, session_id, state):
+        self.client.set(self.prefix + session_id, json.dumps(_trim(state)), ex=REDIS_TTL)
+
+    def delete(self, session_id):
+        self.client.delete(self.prefix + session_id)
+
+
+def create_store(url):
+    """
+    Build a store from a SESSION_STORE setting.
+
+    '' keeps state in memory, 'redis://...' uses Redis and 'file:///path'
+    (or a plain path) uses a directory of JSON files.
+    """
+    if not url:
+        return MemorySessionStore()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisSessionStore(url)
+    if url.startswith('file://'):
+        url = url[len('file://'):]
+    return FileSessionStore(url)
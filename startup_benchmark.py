@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the terminal server.
+
+Measures, in fresh interpreters:
+  * the import-time breakdown of app.py (python -X importtime), per direct
+    dependency and for the slowest individual modules
+  * time-to-first-request: from launching app.py to the first HTTP 200
+
+and compares the median time-to-first-request with a budget, exiting
+non-zero when it is exceeded so CI can track regressions.
+
+Example:
+    python startup_benchmark.py --runs 5 --budget 1.0
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from ports import find_free_port
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BUDGET = float(os.environ.get('STARTUP_BUDGET_SECONDS', 1.0))
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into (depth, name, self_us, cumulative_us) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        # import time:  self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        rows.append((depth, name.strip(), self_us, cumulative_us))
+    return rows
+
+
+def import_breakdown(module='app', runs=3):
+    """Median import times (ms) of `module`, its direct imports and its slowest modules"""
+    totals = []
+    direct = {}
+    self_times = {}
+    for _ in range(runs):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            raise RuntimeError(f'import {module} failed:\n{process.stderr[-2000:]}')
+        # Rows are printed after their children, so the target's direct
+        # imports are the depth-1 rows since the previous top-level row
+        children = []
+        total = None
+        for depth, name, self_us, cumulative_us in parse_importtime(process.stderr):
+            self_times.setdefault(name, []).append(self_us / 1000)
+            if depth == 1:
+                children.append((name, cumulative_us))
+            elif depth == 0:
+                if name == module:
+                    total = cumulative_us
+                    for child, child_us in children:
+                        direct.setdefault(child, []).append(child_us / 1000)
+                children = []
+        if total is None:
+            raise RuntimeError(f'no import time reported for {module}')
+        totals.append(total / 1000)
+    return {
+        'module': module,
+        'total_ms': round(statistics.median(totals), 1),
+        'direct_imports': _ranked(direct),
+        'slowest_modules': _ranked(self_times)
+    }
+
+
+def _ranked(samples, limit=15):
+    medians = {name: statistics.median(values) for name, values in samples.items()}
+    ranked = sorted(medians.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [{'module': name, 'ms': round(ms, 1)} for name, ms in ranked]
+
+
+def time_to_first_request(production=False, timeout=30):
+    """Seconds from launching app.py until GET / returns 200"""
+    port = find_free_port()
+    env = dict(os.environ, PORT=str(port))
+    if production:
+        env['FLASK_ENV'] = 'production'
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'app.py')],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f'Server exited with code {process.returncode}')
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError(f'No response within {timeout}s')
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run_benchmark(args):
+    breakdown = import_breakdown(args.module, args.runs)
+    samples = [time_to_first_request(args.production) for _ in range(args.runs)]
+    ttfr = statistics.median(samples)
+    return {
+        'imports': breakdown,
+        'time_to_first_request_s': round(ttfr, 3),
+        'time_to_first_request_samples_s': [round(s, 3) for s in samples],
+        'budget_s': args.budget,
+        'within_budget': ttfr <= args.budget
+    }
+
+
+def format_report(result):
+    imports = result['imports']
+    lines = [f"Import of {imports['module']}: {imports['total_ms']:.1f} ms (median)", '']
+    lines.append(f"{'DIRECT IMPORT':<40} {'CUMULATIVE ms':>14}")
+    lines.extend(f"{row['module']:<40} {row['ms']:>14.1f}" for row in imports['direct_imports'])
+    lines.append('')
+    lines.append(f"{'SLOWEST MODULE':<40} {'SELF ms':>14}")
+    lines.extend(f"{row['module']:<40} {row['ms']:>14.1f}" for row in imports['slowest_modules'])
+    lines.append('')
+    status = 'OK' if result['within_budget'] else 'OVER BUDGET'
+    lines.append(f"Time to first request: {result['time_to_first_request_s']:.3f}s "
+                 f"(budget {result['budget_s']:.3f}s) {status}")
+    return '\n'.join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Measure cold-start import time and time-to-first-request')
+    parser.add_argument('--runs', type=int, default=3, help='fresh processes per measurement (median is reported)')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help='time-to-first-request budget in seconds (default: $STARTUP_BUDGET_SECONDS or 1.0)')
+    parser.add_argument('--module', default='app', help='module whose import is broken down')
+    parser.add_argument('--production', action='store_true', help='start the server with FLASK_ENV=production')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        result = run_benchmark(args)
+    except RuntimeError as e:
+        print(f"startup benchmark failed: {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(result, indent=2) if args.json else format_report(result))
+    return 0 if result['within_budget'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,32 @@
 // Terminal JavaScript functionality
 class Terminal {
     constructor() {
-        this.socket = io();
+        // The session id lets whichever worker serves a reconnect resume
+        // this tab's working directory and history
+        this.socket = io({
+            auth: (cb) => cb({ session_id: sessionStorage.getItem('terminalSessionId') })
+        });
         this.commandHistory = [];
         this.historyIndex = -1;
         this.currentCommand = '';
         this.isHistoryMode = false;
+        this.spoolMarkers = {};
+        this.spoolPageSize = 500;
+        this.streamRow = null;
+        
+        // Virtualised output: every line lives in this.rows, but only the
+        // rows inside the viewport get DOM nodes. New rows are queued and
+        // flushed once per animation frame.
+        this.rows = [];
+        this.pendingRows = [];
+        this.rowNodes = [];
+        this.rowHeight = 20;
+        this.overscan = 20;
+        this.renderScheduled = false;
+        this.stickToBottom = true;
         
         this.initializeElements();
+        this.initializeViewport();
         this.setupEventListeners();
         this.setupSocketListeners();
         this.startSystemInfoUpdates();
@@ -25,6 +44,50 @@ class Terminal {
         this.cpuInfo = document.getElementById('cpu-info');
         this.memoryInfo = document.getElementById('memory-info');
         this.diskInfo = document.getElementById('disk-info');
+        
+        this.scrollbackLimit = parseInt(this.terminalOutput.dataset.scrollbackLimit, 10) || 10000;
+    }
+    
+    initializeViewport() {
+        // Keep any lines rendered by the template as the first rows
+        this.terminalOutput.querySelectorAll('.output-line').forEach(line => {
+            this.rows.push({ prompt: line.textContent.trim(), text: '', className: '' });
+        });
+        this.terminalOutput.innerHTML = '';
+        
+        this.virtualSpacer = document.createElement('div');
+        this.virtualSpacer.className = 'virtual-spacer';
+        this.virtualRows = document.createElement('div');
+        this.virtualRows.className = 'virtual-rows';
+        this.virtualSpacer.appendChild(this.virtualRows);
+        
+        // Interactive widgets (AI prompts, suggestions) sit below the rows
+        this.extras = document.createElement('div');
+        this.extras.className = 'terminal-extras';
+        
+        this.terminalOutput.appendChild(this.virtualSpacer);
+        this.terminalOutput.appendChild(this.extras);
+        
+        const probe = this.createRowNode();
+        probe.textContent = 'M';
+        this.virtualRows.appendChild(probe);
+        this.rowHeight = probe.offsetHeight || this.rowHeight;
+        probe.remove();
+        
+        this.terminalOutput.addEventListener('scroll', () => {
+            const output = this.terminalOutput;
+            this.stickToBottom = output.scrollTop + output.clientHeight >= output.scrollHeight - this.rowHeight * 2;
+            this.scheduleRender();
+        });
+        
+        this.virtualRows.addEventListener('click', (e) => {
+            const node = e.target.closest('[data-spool-id]');
+            if (node) {
+                this.requestSpoolPage(parseInt(node.dataset.spoolId, 10));
+            }
+        });
+        
+        this.scheduleRender();
     }
     
     setupEventListeners() {
@@ -63,10 +126,19 @@ class Terminal {
             this.addOutput('Disconnected from terminal server', 'error');
         });
         
+        this.socket.on('session', (data) => {
+            sessionStorage.setItem('terminalSessionId', data.session_id);
+        });
+        
         this.socket.on('terminal_output', (data) => {
+            this.endStream();
             this.handleTerminalOutput(data);
         });
         
+        this.socket.on('terminal_stream', (data) => {
+            this.appendStream(data.output);
+        });
+        
         this.socket.on('command_history', (data) => {
             this.commandHistory = data.history || [];
             this.updateHistoryPanel();
@@ -87,6 +159,23 @@ class Terminal {
         this.socket.on('command_explanation', (data) => {
             this.showCommandExplanation(data);
         });
+        
+        this.socket.on('output_page', (data) => {
+            this.insertSpoolPage(data);
+        });
+        
+        this.socket.on('busy', (data) => {
+            // Shed by the server's rate limit; background polls just skip a beat
+            if (data.event === 'command' || data.event === 'batch' || data.event === 'terminal_input') {
+                this.addOutput(data.output, 'error');
+                if (data.event === 'command') this.addPromptLine();
+            }
+        });
+        
+        this.socket.on('job_status', (data) => {
+            const failed = data.return_code !== null && data.return_code !== 0;
+            this.addOutput(data.output, failed ? 'error' : 'info');
+        });
     }
     
     handleKeyDown(e) {
@@ -131,6 +220,19 @@ class Terminal {
     handleGlobalShortcuts(e) {
         if (e.ctrlKey) {
             switch(e.key) {
+                case 'c':
+                    // Interrupt the running program unless text is being copied
+                    if (!window.getSelection().toString()) {
+                        e.preventDefault();
+                        this.socket.emit('terminal_input', { data: '\x03' });
+                    }
+                    break;
+                case 'z':
+                    // Stop the foreground job (fg brings it back); no-op otherwise
+                    if (document.activeElement !== this.terminalInput || !this.terminalInput.value) {
+                        this.socket.emit('terminal_input', { data: '\x1a' });
+                    }
+                    break;
                 case 'l':
                     e.preventDefault();
                     this.clearTerminal();
@@ -167,18 +269,12 @@ class Terminal {
     }
     
     addCommandLine(command) {
-        const line = document.createElement('div');
-        line.className = 'output-line command-highlight';
-        line.innerHTML = `<span class="prompt">user@terminal:~$</span> ${this.escapeHtml(command)}`;
-        this.terminalOutput.appendChild(line);
+        this.appendRows([{ prompt: 'user@terminal:~$', text: command, className: 'command-highlight' }]);
         this.scrollToBottom();
     }
     
     addPromptLine() {
-        const line = document.createElement('div');
-        line.className = 'output-line';
-        line.innerHTML = '<span class="prompt">user@terminal:~$</span>';
-        this.terminalOutput.appendChild(line);
+        this.appendRows([{ prompt: 'user@terminal:~$', text: '', className: '' }]);
         this.scrollToBottom();
     }
     
@@ -188,6 +284,18 @@ class Terminal {
             return;
         }
         
+        if (data.type === 'download') {
+            this.addOutput(data.output, 'info');
+            this.download(data.url, data.name);
+            return;
+        }
+        
+        if (data.type === 'upload') {
+            this.addOutput(data.output, 'info');
+            this.chooseUpload(data.url);
+            return;
+        }
+        
         if (data.type === 'welcome') {
             this.addOutput(data.output, 'info');
             return;
@@ -205,21 +313,79 @@ class Terminal {
                 <button class="ai-execute-btn" onclick="terminal.executeInterpretedCommand('${data.interpreted_command}')">Execute</button>
                 <button class="ai-cancel-btn" onclick="terminal.cancelAIExecution()">Cancel</button>
             `;
-            this.terminalOutput.appendChild(buttonDiv);
+            this.extras.appendChild(buttonDiv);
             this.scrollToBottom();
             return;
         }
         
         if (data.output) {
-            const outputClass = data.type === 'error' ? 'error' : 
+            const outputClass = data.type === 'error' || data.type === 'busy' ? 'error' : 
                               data.type === 'success' ? 'success' : 'output';
-            this.addOutput(data.output, outputClass);
+            if (data.spool) {
+                this.addSpooledOutput(data, outputClass);
+            } else {
+                this.addOutput(data.output, outputClass);
+            }
         }
         
         // Add new prompt line
         this.addPromptLine();
     }
     
+    fileRequest(url, options = {}) {
+        // The session id goes in a header, never in the URL, so it stays out of logs and history
+        const headers = Object.assign({ 'X-Session-Id': sessionStorage.getItem('terminalSessionId') }, options.headers);
+        return fetch(url, Object.assign({}, options, { headers: headers }));
+    }
+    
+    download(url, name) {
+        // The file comes over HTTP, not through the socket
+        this.fileRequest(url)
+            .then(response => {
+                if (!response.ok) {
+                    return response.json().then(data => { throw new Error(data.error || response.statusText); });
+                }
+                return response.blob();
+            })
+            .then(blob => {
+                const link = document.createElement('a');
+                link.href = URL.createObjectURL(blob);
+                link.download = name;
+                document.body.appendChild(link);
+                link.click();
+                link.remove();
+                setTimeout(() => URL.revokeObjectURL(link.href), 0);
+                this.addOutput(`Downloaded ${name}`, 'success');
+            })
+            .catch(error => this.addOutput(`Download failed: ${error.message}`, 'error'))
+            .finally(() => this.addPromptLine());
+    }
+    
+    chooseUpload(url) {
+        const input = document.createElement('input');
+        input.type = 'file';
+        input.onchange = () => {
+            const file = input.files[0];
+            if (!file) return;
+            // Without a name from the command, keep the file's own name
+            const target = url.includes('?path=') ? url : `${url}?path=${encodeURIComponent(file.name)}`;
+            this.addOutput(`Uploading ${file.name} (${file.size} bytes)...`, 'info');
+            // A File body is streamed from disk by the browser
+            this.fileRequest(target, { method: 'PUT', body: file })
+                .then(response => response.json().then(data => ({ ok: response.ok, data: data })))
+                .then(({ ok, data }) => {
+                    if (ok && data.complete) {
+                        this.addOutput(`Uploaded ${data.path} (${data.received} bytes)`, 'success');
+                    } else {
+                        this.addOutput(`Upload failed: ${data.error || 'incomplete'}`, 'error');
+                    }
+                })
+                .catch(error => this.addOutput(`Upload failed: ${error}`, 'error'))
+                .finally(() => this.addPromptLine());
+        };
+        input.click();
+    }
+    
     executeInterpretedCommand(command) {
         // Remove the AI execution prompt
         const promptDiv = document.querySelector('.ai-execution-prompt');
@@ -243,16 +409,224 @@ class Terminal {
     }
     
     addOutput(text, className = '') {
+        this.appendRows(text.split('\n').map(line => ({ text: line, className: className })));
+        this.scrollToBottom();
+    }
+    
+    appendStream(text) {
+        // Chunks can end mid-line: the last row stays open for the next chunk
         const lines = text.split('\n');
-        lines.forEach(line => {
-            const outputLine = document.createElement('div');
-            outputLine.className = `output-line ${className}`;
-            outputLine.textContent = line;
-            this.terminalOutput.appendChild(outputLine);
-        });
+        if (this.streamRow) {
+            this.streamRow.text += lines.shift();
+            this.refreshRows();
+        }
+        if (lines.length === 0) return;
+        
+        const rows = lines.map(line => ({ text: line, className: 'output' }));
+        this.streamRow = rows[rows.length - 1];
+        this.appendRows(rows);
         this.scrollToBottom();
     }
     
+    endStream() {
+        // Drop the empty row left open by output ending in a newline
+        if (this.streamRow && this.streamRow.text === '') {
+            [this.pendingRows, this.rows].forEach(rows => {
+                const index = rows.lastIndexOf(this.streamRow);
+                if (index !== -1) rows.splice(index, 1);
+            });
+            this.refreshRows();
+        }
+        this.streamRow = null;
+    }
+    
+    appendRows(rows) {
+        // Concatenate in chunks: spreading 100k+ arguments overflows the stack
+        for (let i = 0; i < rows.length; i += 10000) {
+            Array.prototype.push.apply(this.pendingRows, rows.slice(i, i + 10000));
+        }
+        this.scheduleRender();
+    }
+    
+    scheduleRender() {
+        if (this.renderScheduled) return;
+        this.renderScheduled = true;
+        requestAnimationFrame(() => {
+            this.renderScheduled = false;
+            this.flushRows();
+            this.renderViewport();
+        });
+    }
+    
+    flushRows() {
+        if (this.pendingRows.length > 0) {
+            this.rows = this.rows.concat(this.pendingRows);
+            this.pendingRows = [];
+        }
+        
+        // Drop the oldest rows beyond the scrollback limit
+        const excess = this.rows.length - this.scrollbackLimit;
+        if (excess > 0) {
+            this.rows.splice(0, excess);
+        }
+        
+        this.virtualSpacer.style.height = `${this.rows.length * this.rowHeight}px`;
+        if (this.stickToBottom) {
+            this.terminalOutput.scrollTop = this.terminalOutput.scrollHeight;
+        }
+    }
+    
+    renderViewport() {
+        const output = this.terminalOutput;
+        const first = Math.max(0, Math.floor(output.scrollTop / this.rowHeight) - this.overscan);
+        const visible = Math.ceil(output.clientHeight / this.rowHeight) + this.overscan * 2;
+        const last = Math.min(this.rows.length, first + visible);
+        
+        this.virtualRows.style.transform = `translateY(${first * this.rowHeight}px)`;
+        
+        // Reuse the existing nodes; only the pool size changes
+        while (this.rowNodes.length < last - first) {
+            const node = this.createRowNode();
+            this.rowNodes.push(node);
+            this.virtualRows.appendChild(node);
+        }
+        while (this.rowNodes.length > last - first) {
+            this.rowNodes.pop().remove();
+        }
+        
+        for (let i = first; i < last; i++) {
+            this.renderRow(this.rowNodes[i - first], this.rows[i]);
+        }
+    }
+    
+    createRowNode() {
+        const node = document.createElement('div');
+        node.className = 'output-line';
+        return node;
+    }
+    
+    renderRow(node, row) {
+        if (node.row === row) return;
+        node.row = row;
+        node.className = `output-line ${row.className || ''}`;
+        
+        if (row.spoolId !== undefined) {
+            node.dataset.spoolId = row.spoolId;
+        } else {
+            delete node.dataset.spoolId;
+        }
+        
+        if (row.prompt) {
+            node.textContent = '';
+            const prompt = document.createElement('span');
+            prompt.className = 'prompt';
+            prompt.textContent = row.prompt;
+            node.appendChild(prompt);
+            if (row.text) {
+                node.appendChild(document.createTextNode(` ${row.text}`));
+            }
+        } else {
+            node.textContent = row.text;
+        }
+    }
+    
+    refreshRows() {
+        // Force re-rendering of rows whose content changed in place
+        this.rowNodes.forEach(node => { node.row = null; });
+        this.scheduleRender();
+    }
+    
+    addSpooledOutput(data, className) {
+        // Large outputs arrive as head + marker + tail; the middle stays on the server
+        const spool = data.spool;
+        const lines = data.output.split('\n');
+        this.addOutput(lines.slice(0, spool.head_lines).join('\n'), className);
+        
+        const marker = { text: '', className: 'spool-marker', spoolId: spool.id };
+        this.appendRows([marker]);
+        
+        this.spoolMarkers[spool.id] = {
+            row: marker,
+            className: className,
+            next: spool.head_lines,
+            end: spool.total_lines - spool.tail_lines,
+            loading: false
+        };
+        this.updateSpoolMarker(spool.id);
+        
+        if (spool.tail_lines > 0) {
+            this.addOutput(lines.slice(spool.head_lines + 1).join('\n'), className);
+        }
+    }
+    
+    requestSpoolPage(id) {
+        const state = this.spoolMarkers[id];
+        if (!state || state.loading) return;
+        
+        state.loading = true;
+        state.row.text = 'Loading...';
+        this.refreshRows();
+        this.socket.emit('get_output_page', {
+            id: id,
+            offset: state.next,
+            limit: Math.min(this.spoolPageSize, state.end - state.next)
+        });
+    }
+    
+    insertSpoolPage(data) {
+        const state = this.spoolMarkers[data.id];
+        if (!state) return;
+        state.loading = false;
+        
+        // Pending rows are flushed first so the marker's index is current
+        this.flushRows();
+        const index = this.rows.indexOf(state.row);
+        if (index === -1) {
+            // The marker scrolled out of the scrollback limit
+            delete this.spoolMarkers[data.id];
+            return;
+        }
+        
+        if (data.error) {
+            state.row.text = `⋯ ${data.error}`;
+            delete this.spoolMarkers[data.id];
+            this.refreshRows();
+            return;
+        }
+        
+        const rows = data.lines.map(line => ({ text: line, className: state.className }));
+        if (data.evicted) {
+            rows.push({ text: '(some lines were evicted from the scrollback spool)', className: 'info' });
+        }
+        // Keep the viewport anchored on the content the user is reading
+        const shift = index < Math.floor(this.terminalOutput.scrollTop / this.rowHeight) ? rows.length : 0;
+        for (let i = 0; i < rows.length; i += 10000) {
+            this.rows.splice(index + i, 0, ...rows.slice(i, i + 10000));
+        }
+        state.next += data.lines.length;
+        
+        this.updateSpoolMarker(data.id);
+        this.flushRows();
+        this.terminalOutput.scrollTop += shift * this.rowHeight;
+        this.refreshRows();
+    }
+    
+    updateSpoolMarker(id) {
+        const state = this.spoolMarkers[id];
+        const hidden = state.end - state.next;
+        if (hidden <= 0) {
+            const index = this.rows.indexOf(state.row);
+            if (index !== -1) {
+                this.rows.splice(index, 1);
+            }
+            delete this.spoolMarkers[id];
+            this.refreshRows();
+            return;
+        }
+        state.row.text = `⋯ ${hidden} more lines hidden — click to load ${Math.min(this.spoolPageSize, hidden)}`;
+        this.refreshRows();
+    }
+    
     navigateHistory(direction) {
         if (this.commandHistory.length === 0) return;
         
@@ -295,12 +669,23 @@ class Terminal {
     }
     
     clearTerminal() {
-        this.terminalOutput.innerHTML = '';
+        this.rows = [];
+        this.pendingRows = [];
+        this.extras.innerHTML = '';
+        this.spoolMarkers = {};
+        this.streamRow = null;
         this.addPromptLine();
     }
     
     scrollToBottom() {
+        this.stickToBottom = true;
         this.terminalOutput.scrollTop = this.terminalOutput.scrollHeight;
+        this.scheduleRender();
+    }
+    
+    setScrollbackLimit(limit) {
+        this.scrollbackLimit = Math.max(100, limit);
+        this.scheduleRender();
     }
     
     showCursor() {
@@ -371,7 +756,9 @@ class Terminal {
         
         this.cpuInfo.textContent = `CPU: ${data.cpu_percent.toFixed(1)}%`;
         this.memoryInfo.textContent = `RAM: ${data.memory_percent.toFixed(1)}%`;
-        this.diskInfo.textContent = `Disk: ${data.disk_percent.toFixed(1)}%`;
+        this.diskInfo.textContent = data.disk_percent === null
+            ? 'Disk: unavailable'
+            : `Disk: ${data.disk_percent.toFixed(1)}%`;
     }
     
     showAISuggestions(suggestions) {
@@ -393,7 +780,7 @@ class Terminal {
                 </div>
             `;
             
-            this.terminalOutput.appendChild(suggestionDiv);
+            this.extras.appendChild(suggestionDiv);
             this.scrollToBottom();
         }
     }
@@ -0,0 +1,110 @@
+"""
+Typed tabular results for builtin commands.
+
+Builtins such as ls, ps, df, free and top attach a table (typed columns
+plus rows of raw values) next to their formatted text. Clients that ask
+for a structured format get the table instead of the text, as JSON or
+MessagePack, and can sort, filter and render it themselves without
+another round trip. The helpers on Table do that for Python clients.
+
+Column types: 'str', 'int', 'float', 'bool', 'bytes' (an integer byte
+count), 'percent' and 'timestamp' (seconds since the epoch).
+"""
+
+try:
+    import msgpack
+except ImportError:  # optional: pip install msgpack
+    msgpack = None
+
+TEXT = 'text'
+JSON = 'json'
+MSGPACK = 'msgpack'
+# MessagePack is only offered when the package is installed
+FORMATS = (TEXT, JSON, MSGPACK) if msgpack is not None else (TEXT, JSON)
+
+
+class FormatError(Exception):
+    """A result cannot be encoded in the requested format"""
+
+
+class Table:
+    """Named, typed columns and rows of plain values"""
+
+    def __init__(self, columns, rows=None):
+        # [(name, type)]
+        self.columns = list(columns)
+        self.rows = [list(row) for row in rows or []]
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls([(c['name'], c['type']) for c in data['columns']], data['rows'])
+
+    def to_dict(self):
+        return {
+            'columns': [{'name': name, 'type': type_} for name, type_ in self.columns],
+            'rows': self.rows
+        }
+
+    def add(self, *values):
+        self.rows.append(list(values))
+
+    def index(self, column):
+        for i, (name, _) in enumerate(self.columns):
+            if name == column:
+                return i
+        raise KeyError(column)
+
+    def records(self):
+        names = [name for name, _ in self.columns]
+        return [dict(zip(names, row)) for row in self.rows]
+
+    def sorted(self, column, reverse=False):
+        """Copy sorted by `column`, with missing values last"""
+        i = self.index(column)
+        present = [row for row in self.rows if row[i] is not None]
+        missing = [row for row in self.rows if row[i] is None]
+        return Table(self.columns, sorted(present, key=lambda row: row[i], reverse=reverse) + missing)
+
+    def filtered(self, column, predicate):
+        """Copy with the rows whose `column` value satisfies `predicate`"""
+        i = self.index(column)
+        return Table(self.columns, [row for row in self.rows if predicate(row[i])])
+
+    def render(self):
+        """Plain fixed-width text with a header row"""
+        cells = [[name.upper() for name, _ in self.columns]]
+        cells += [[_format_cell(value, type_) for value, (_, type_) in zip(row, self.columns)]
+                  for row in self.rows]
+        widths = [max(len(row[i]) for row in cells) for i in range(len(self.columns))]
+        return '\n'.join('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+                         for row in cells)
+
+
+def _format_cell(value, type_):
+    if value is None:
+        return '-'
+    if type_ == 'percent':
+        return f'{value:.1f}%'
+    if type_ == 'float':
+        return f'{value:.2f}'
+    return str(value)
+
+
+def shape_result(result, fmt):
+    """Drop the table for text clients, or the text for structured ones"""
+    if fmt == TEXT or 'table' not in result:
+        result.pop('table', None)
+        return result
+    # The table replaces the text, which is the bulky part of the payload
+    result.pop('output', None)
+    result.pop('spool', None)
+    return result
+
+
+def encode(result, fmt):
+    """Payload for the client: the dict itself, or MessagePack bytes"""
+    if fmt not in FORMATS:
+        raise FormatError(f"unknown output format {fmt!r} (expected one of: {', '.join(FORMATS)})")
+    if fmt != MSGPACK:
+        return result
+    return msgpack.packb(result, use_bin_type=True)
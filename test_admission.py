@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for per-session rate limits and concurrency caps
+"""
+
+import os
+
+from admission import RateLimiter, ConcurrencyLimit, TokenBucket, limits_from_env
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+def test_token_bucket_refills_at_rate():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    assert [bucket.take() for _ in range(4)] == [True, True, True, False]
+    assert abs(bucket.retry_after() - 0.5) < 1e-9
+
+    clock.now += 0.5
+    assert bucket.take() and not bucket.take()
+    # Never refills beyond the burst
+    clock.now += 60
+    assert sum(bucket.take() for _ in range(10)) == 3
+
+def test_rate_limits_are_per_session_and_event():
+    clock = Clock()
+    limiter = RateLimiter({'command': (1, 2), 'get_history': (0, 1)}, default=(1, 1), clock=clock)
+    assert limiter.check('a', 'command') is None
+    assert limiter.check('a', 'command') is None
+    assert limiter.check('a', 'command') == 1.0
+    # Other sessions and other events have their own buckets
+    assert limiter.check('b', 'command') is None
+    assert limiter.check('a', 'explain_command') is None
+    assert limiter.check('a', 'explain_command') is not None
+    # A rate of 0 is unlimited
+    assert all(limiter.check('a', 'get_history') is None for _ in range(100))
+
+    limiter.forget('a')
+    assert 'a' not in limiter.buckets
+    assert limiter.check('a', 'command') is None
+
+def test_limits_from_env():
+    os.environ['RATE_LIMITS'] = 'command=5:10, get_system_info=0.5:2, bogus=x'
+    os.environ['RATE_LIMIT_DEFAULT'] = '3'
+    try:
+        limits, default = limits_from_env()
+    finally:
+        del os.environ['RATE_LIMITS'], os.environ['RATE_LIMIT_DEFAULT']
+    assert limits['command'] == (5.0, 10.0)
+    assert limits['get_system_info'] == (0.5, 2.0)
+    assert 'bogus' not in limits
+    assert limits['batch'] == (1, 3)
+    assert default == (3.0, 3.0)
+
+def test_concurrency_limit_never_waits():
+    slots = ConcurrencyLimit('subprocess', 2)
+    assert slots.acquire() and slots.acquire()
+    assert not slots.acquire()
+    assert slots.in_use == 2
+    slots.release()
+    assert slots.acquire()
+    assert 'all 2 subprocess slots' in slots.busy_message()
+
+    unlimited = ConcurrencyLimit('LLM call', 0)
+    assert all(unlimited.acquire() for _ in range(100))
+
+if __name__ == "__main__":
+    test_token_bucket_refills_at_rate()
+    test_rate_limits_are_per_session_and_event()
+    test_limits_from_env()
+    test_concurrency_limit_never_waits()
+    print("✅ Admission control tests passed!")
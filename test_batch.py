@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test script for batch command execution
+"""
+
+import time
+
+from batch import BatchRunner, BatchError, parse_request, parse_script
+
+def connectors(script):
+    return [(step.command, step.connector) for step in parse_script(script)]
+
+def test_parse_script():
+    """Operators split steps only outside quotes and redirections"""
+    assert connectors('mkdir a && cd a; ls\npwd') == [
+        ('mkdir a', '&&'), ('cd a', ';'), ('ls', ';'), ('pwd', ';')]
+    assert connectors('sleep 1 & sleep 2 & wait') == [('sleep 1', '&'), ('sleep 2', '&'), ('wait', ';')]
+    assert connectors('echo "a; b && c" \'&\' 2>&1 | grep a || true') == [
+        ('echo "a; b && c" \'&\' 2>&1 | grep a || true', ';')]
+    assert connectors('make &&\n  make test  # run tests\n\n') == [('make', '&&'), ('make test', ';')]
+    for bad in ('&& ls', 'echo "open'):
+        try:
+            parse_script(bad)
+            assert False, bad
+        except BatchError:
+            pass
+
+def test_parse_request():
+    steps = parse_request({'commands': ['a', ' ', 'b'], 'stop_on_error': False})
+    assert [(step.command, step.connector) for step in steps] == [('a', ';'), ('b', ';')]
+    assert parse_request({'commands': ['a', 'b']})[0].connector == '&&'
+    try:
+        parse_request({'script': ''})
+        assert False
+    except BatchError:
+        pass
+
+def run(script, **kwargs):
+    """Run with fake commands: 'fail' fails, 'sleep' takes 0.2s"""
+    reported = []
+    def execute(index, command):
+        if command == 'sleep':
+            time.sleep(0.2)
+        return {'type': 'output', 'output': command, 'return_code': 1 if command == 'fail' else 0}
+    runner = BatchRunner(execute, lambda index, command, result: reported.append((index, result['type'])), **kwargs)
+    results = runner.run(parse_script(script))
+    return [result['type'] for result in results], reported
+
+def test_failure_skips_and_chain_up_to_next_sequential_step():
+    types, reported = run('ok && fail && a && b; c')
+    assert types == ['output', 'output', 'skipped', 'skipped', 'output']
+    assert sorted(reported) == list(enumerate(types))
+
+def test_parallel_group():
+    started = time.monotonic()
+    types, _ = run('sleep & sleep & sleep && after')
+    assert time.monotonic() - started < 0.5
+    assert types == ['output'] * 4
+    
+    types, _ = run('sleep & fail && after; last')
+    assert types == ['output', 'output', 'skipped', 'output']
+    
+    started = time.monotonic()
+    run('sleep & sleep', max_parallel=1)
+    assert time.monotonic() - started >= 0.4
+
+if __name__ == "__main__":
+    test_parse_script()
+    test_parse_request()
+    test_failure_skips_and_chain_up_to_next_sequential_step()
+    test_parallel_group()
+    print("✅ Batch tests passed!")
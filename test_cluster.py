@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test script for multi-worker support: cross-worker broadcasts through a
+message queue stand-in, shared session state and sticky worker selection
+"""
+
+import json
+import os
+import queue
+import socket
+import stat
+import tempfile
+
+import eventlet
+import socketio
+
+from cluster import pick_workers, pipe
+from session_store import FileSessionStore, valid_session_id
+
+class LocalBroker:
+    """In-process stand-in for the message queue (e.g. Redis pub/sub)"""
+    
+    def __init__(self):
+        self.subscribers = []
+    
+    def publish(self, message):
+        for subscriber in self.subscribers:
+            subscriber.put(message)
+
+class LocalBrokerManager(socketio.PubSubManager):
+    name = 'local'
+    
+    def __init__(self, broker, **kwargs):
+        super().__init__(**kwargs)
+        self.broker = broker
+        self.inbox = queue.Queue()
+        broker.subscribers.append(self.inbox)
+    
+    def _publish(self, data):
+        self.broker.publish(data)
+    
+    def _listen(self):
+        while True:
+            yield self.inbox.get()
+
+def make_worker(broker):
+    server = socketio.Server(async_mode='threading', client_manager=LocalBrokerManager(broker))
+    server.manager.initialize()
+    server.manager_initialized = True
+    sent = queue.Queue()
+    # Capture what would be written to the client's Engine.IO connection
+    server._send_eio_packet = lambda eio_sid, eio_packet: sent.put((eio_sid, eio_packet.data))
+    return server, sent
+
+def test_metrics_room_broadcast_reaches_other_worker():
+    """An emit to the metrics room on one worker reaches subscribers on another"""
+    broker = LocalBroker()
+    worker_a, _ = make_worker(broker)
+    worker_b, sent_b = make_worker(broker)
+    
+    # A client connected to worker B joins the metrics room
+    sid = worker_b.manager.connect('eio-b', '/')
+    worker_b.enter_room(sid, 'metrics')
+    
+    worker_a.emit('worker_metrics', {'worker': 'a'}, to='metrics')
+    
+    eio_sid, data = sent_b.get(timeout=5)
+    assert eio_sid == 'eio-b'
+    assert data == '2' + json.dumps(['worker_metrics', {'worker': 'a'}], separators=(',', ':'))
+
+def test_session_state_shared_between_workers():
+    """State saved by one worker's store is loaded by another's"""
+    directory = tempfile.mkdtemp()
+    FileSessionStore(directory).save('tab-12345678', {'current_dir': '/tmp', 'command_history': ['ls', 'pwd']})
+    
+    state = FileSessionStore(directory).load('tab-12345678')
+    assert state == {'current_dir': '/tmp', 'command_history': ['ls', 'pwd']}
+    assert FileSessionStore(directory).load('unknown-session') is None
+    
+    assert not valid_session_id('../../etc/passwd')
+    assert not valid_session_id(None)
+
+def test_sticky_worker_choice():
+    """A client always starts at the same worker and falls back to the others"""
+    workers = ['w0', 'w1', 'w2']
+    order = pick_workers('10.0.0.7', workers)
+    assert order == pick_workers('10.0.0.7', workers)
+    assert sorted(order) == workers
+
+def test_file_store_is_private():
+    """Session ids grant file access, so only the owner may read the store"""
+    directory = os.path.join(tempfile.mkdtemp(), 'sessions')
+    store = FileSessionStore(directory)
+    store.save('tab-12345678', {'current_dir': '/tmp'})
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    for name in os.listdir(directory):
+        assert stat.S_IMODE(os.stat(os.path.join(directory, name)).st_mode) == 0o600
+
+    # An existing, too open directory is tightened
+    os.chmod(directory, 0o755)
+    FileSessionStore(directory)
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+def test_pipe_passes_half_close():
+    """EOF in one direction leaves the other open for the reply"""
+    client, proxy_in = socket.socketpair()
+    proxy_out, backend = socket.socketpair()
+    upstream = eventlet.spawn(pipe, proxy_in, proxy_out)
+    client.sendall(b'request')
+    client.shutdown(socket.SHUT_WR)
+    upstream.wait()
+    assert backend.recv(100) == b'request'
+    assert backend.recv(100) == b''
+
+    # The backend can still answer after the client finished sending
+    backend.sendall(b'reply')
+    backend.close()
+    pipe(proxy_out, proxy_in)
+    assert client.recv(100) == b'reply'
+    for sock in (client, proxy_in, proxy_out):
+        sock.close()
+
+if __name__ == "__main__":
+    test_metrics_room_broadcast_reaches_other_worker()
+    test_session_state_shared_between_workers()
+    test_sticky_worker_choice()
+    test_file_store_is_private()
+    test_pipe_passes_half_close()
+    print("✅ Cluster tests passed!")
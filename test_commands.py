@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test script for the builtin command registry
+"""
+
+import sys
+import types
+
+from commands import CommandRegistry
+
+def test_resolve_by_name():
+    """Builtins are found by name and get their arguments tokenised"""
+    registry = CommandRegistry()
+    registry.register('cat', lambda terminal, args: args, min_args=1, flags=())
+    
+    spec, args = registry.resolve('cat "my file.txt"')
+    assert spec.name == 'cat'
+    assert args == ['my file.txt']
+    
+    # Named but missing its operand
+    assert registry.resolve('cat') == (spec, None)
+    # Prefix matches are not builtins
+    assert registry.resolve('catalog x')[0] is None
+
+def test_schema_mismatch_goes_to_shell():
+    """Unknown flags or too many arguments fall through to the shell"""
+    registry = CommandRegistry()
+    registry.register('ps', lambda terminal, args: None, max_args=0)
+    registry.register('ls', lambda terminal, args: None, max_args=2, flags=('-l',))
+    
+    assert registry.resolve('ps')[0] is not None
+    assert registry.resolve('ps aux') == (None, ['ps', 'aux'])
+    assert registry.resolve('ls -l /tmp')[0] is not None
+    assert registry.resolve('ls -R')[0] is None
+
+def test_shell_operators_go_to_shell():
+    """Pipes, redirections and command lists are never builtin arguments"""
+    registry = CommandRegistry()
+    registry.register('ls', lambda terminal, args: None, max_args=2)
+    registry.register('cat', lambda terminal, args: None, min_args=1)
+    
+    assert registry.resolve('ls | grep x') == (None, ['ls', '|', 'grep', 'x'])
+    assert registry.resolve('cat a > b')[0] is None
+    assert registry.resolve('cat a>b')[0] is None
+    assert registry.resolve('ls;pwd')[0] is None
+    assert registry.resolve('cat a && ls')[0] is None
+    # Quoted operators are ordinary arguments
+    assert registry.resolve('cat "a|b" \'x > y\'') == (registry.get('cat'), ['a|b', 'x > y'])
+
+def test_load_plugins():
+    """Plugin modules register commands; broken ones are skipped"""
+    plugin = types.ModuleType('test_hello_plugin')
+    plugin.register = lambda registry: registry.register('hello', lambda terminal, args: 'hi', help='Say hi')
+    sys.modules['test_hello_plugin'] = plugin
+    try:
+        registry = CommandRegistry()
+        loaded = registry.load_plugins('test_hello_plugin, no_such_plugin_module')
+        assert loaded == ['test_hello_plugin']
+        assert registry.plugin_commands == ['hello']
+        assert registry.get('hello').handler(None, []) == 'hi'
+    finally:
+        del sys.modules['test_hello_plugin']
+
+def test_raw_command_gets_rest_of_line():
+    registry = CommandRegistry()
+    registry.register('time', lambda terminal, args: args, min_args=1, raw=True)
+    spec, args = registry.resolve('time ls -l "a b" | wc')
+    assert spec.name == 'time' and args == ['ls -l "a b" | wc']
+    assert registry.resolve('time')[1] is None
+
+if __name__ == "__main__":
+    test_resolve_by_name()
+    test_schema_mismatch_goes_to_shell()
+    test_shell_operators_go_to_shell()
+    test_load_plugins()
+    test_raw_command_gets_rest_of_line()
+    print("✅ Command registry tests passed!")
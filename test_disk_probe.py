@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test script for concurrent, cached partition usage probes
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from disk_probe import DiskProbe
+
+Partition = namedtuple('Partition', 'device mountpoint fstype')
+DiskUsage = namedtuple('DiskUsage', 'total used free')
+
+def make_probe(release, calls, **kwargs):
+    """DiskProbe over '/' and a '/mnt/stale' mount that hangs until released"""
+    def usage_fn(mountpoint):
+        calls.append(mountpoint)
+        if mountpoint == '/mnt/stale':
+            release.wait()
+        if mountpoint == '/mnt/secret':
+            raise PermissionError(13, 'Permission denied')
+        return DiskUsage(100, 25, 75)
+    partitions = [Partition('/dev/sda1', '/', 'ext4'), Partition('nfs:/export', '/mnt/stale', 'nfs'),
+                  Partition('/dev/sdb1', '/mnt/secret', 'ext4')]
+    return DiskProbe(usage_fn=usage_fn, partitions_fn=lambda: partitions, **kwargs)
+
+def test_hung_mount_is_flagged_without_blocking():
+    release = threading.Event()
+    calls = []
+    timeouts = []
+    probe = make_probe(release, calls, ttl=60, timeout=0.2, on_timeout=timeouts.append)
+    
+    started = time.monotonic()
+    root, stale, secret = probe.partitions()
+    assert time.monotonic() - started < 1.0
+    assert root.available and root.percent == 25
+    assert stale.hung and not stale.available
+    assert not secret.hung and secret.error == 'Permission denied'
+    assert timeouts == ['/mnt/stale']
+    
+    # The stuck probe is not started again, and is not waited for again
+    started = time.monotonic()
+    assert probe.partitions()[1].hung
+    assert time.monotonic() - started < 0.1
+    assert calls.count('/mnt/stale') == 1
+    
+    # Once the mount answers, its result is picked up and cached
+    release.set()
+    time.sleep(0.05)
+    assert probe.partitions()[1].available
+    assert calls.count('/mnt/stale') == 1
+
+def test_results_are_cached_for_ttl():
+    release = threading.Event()
+    release.set()
+    calls = []
+    probe = make_probe(release, calls, ttl=0.2, timeout=1.0)
+    
+    assert probe.usage('/').total == 100
+    assert probe.usage('/').total == 100
+    assert calls == ['/']
+    time.sleep(0.25)
+    probe.usage('/')
+    assert calls == ['/', '/']
+
+def test_cache_keeps_each_callers_device():
+    release = threading.Event()
+    release.set()
+    calls = []
+    probe = make_probe(release, calls, ttl=60, timeout=1.0)
+    
+    # The sidebar asks for '/' without knowing its device or type
+    assert probe.usage('/').device == '/'
+    root = probe.partitions()[0]
+    assert (root.device, root.fstype, root.used) == ('/dev/sda1', 'ext4', 25)
+    assert calls.count('/') == 1
+
+if __name__ == "__main__":
+    test_hung_mount_is_flagged_without_blocking()
+    test_results_are_cached_for_ttl()
+    test_cache_keeps_each_callers_device()
+    print("✅ Disk probe tests passed!")
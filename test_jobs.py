@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for background job control
+"""
+
+import os
+import signal
+import time
+
+from jobs import JobSupervisor, OutputRing, parse_signal, DONE, STOPPED
+
+def test_output_ring_is_bounded():
+    """Only the last lines are kept, and fg can resume where it left off"""
+    ring = OutputRing(max_lines=3)
+    ring.feed(b'a\nb\nc\nd\ne\n')
+    assert ring.text() == '... 2 earlier lines dropped ...\nc\nd\ne'
+    assert ring.text(since=3) == 'd\ne'
+
+def test_job_runs_in_background_and_is_reaped():
+    """Output is buffered and the exit status collected with wait4"""
+    changes = []
+    supervisor = JobSupervisor(on_change=changes.append)
+    job = supervisor.start('echo one; echo two; exit 3', cwd=os.getcwd())
+    
+    assert supervisor.wait(job, timeout=10)
+    assert job.state == DONE and job.return_code == 3
+    assert job.output.text() == 'one\ntwo'
+    assert job.rusage is not None
+    assert changes == [job]
+    
+    # Finished jobs are listed once, then forgotten
+    assert supervisor.listing() == [f'[1]+  Exit 3      echo one; echo two; exit 3']
+    assert supervisor.listing() == []
+
+def test_reported_jobs_are_not_listed_again():
+    """A job whose completion was already announced is left out of `jobs`"""
+    supervisor = JobSupervisor()
+    done = supervisor.start('true', cwd=os.getcwd())
+    running = supervisor.start('sleep 30', cwd=os.getcwd())
+    assert supervisor.wait(done, timeout=10)
+    done.reported = True
+    
+    assert supervisor.listing() == ['[2]+  Running     sleep 30 &']
+    assert supervisor.get('%1') is None
+    supervisor.close()
+
+def test_stop_continue_and_kill():
+    """Jobs can be stopped, resumed and signalled by job spec"""
+    supervisor = JobSupervisor()
+    job = supervisor.start('echo started; sleep 30', cwd=os.getcwd())
+    assert supervisor.get('%1') is job and supervisor.get() is job
+    while not job.output.total:
+        time.sleep(0.01)
+    
+    supervisor.stop(job)
+    assert supervisor.wait(job, timeout=10)
+    assert job.state == STOPPED
+    
+    supervisor.resume(job)
+    job.signal(signal.SIGTERM)
+    assert supervisor.wait(job, timeout=10)
+    assert job.return_code == -signal.SIGTERM
+    assert job.status_text() == 'Terminated'
+    supervisor.close()
+
+def test_close_while_supervisor_loop_waits():
+    """Hanging up jobs from a greenlet while the loop greenlet selects on their pipes"""
+    import eventlet
+    supervisor = JobSupervisor(spawn=eventlet.spawn)
+    jobs = [supervisor.start('sleep 30', cwd=os.getcwd()) for _ in range(3)]
+    # Let the loop start waiting on the pipes
+    eventlet.sleep(0.1)
+    supervisor.close()
+    assert all(job.done for job in jobs)
+
+def test_parse_signal():
+    assert parse_signal('9') == signal.SIGKILL
+    assert parse_signal('term') == signal.SIGTERM
+    assert parse_signal('SIGINT') == signal.SIGINT
+
+if __name__ == "__main__":
+    test_output_ring_is_bounded()
+    test_job_runs_in_background_and_is_reaped()
+    test_reported_jobs_are_not_listed_again()
+    test_stop_continue_and_kill()
+    test_close_while_supervisor_loop_waits()
+    test_parse_signal()
+    print("✅ Job control tests passed!")
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Test script for deferred imports and service objects
+"""
+
+import sys
+import types
+
+from lazy import lazy_import, LazyObject
+
+def test_lazy_import_defers_execution():
+    """The module body runs on first attribute access, not at import"""
+    sys.modules.pop('colorsys', None)
+    module = lazy_import('colorsys')
+    # type() does not trigger loading; the class reverts once loaded
+    assert type(module) is not types.ModuleType
+    
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert type(module) is types.ModuleType
+    assert lazy_import('colorsys') is sys.modules['colorsys']
+
+def test_lazy_object_builds_once_on_use():
+    """The factory is called on first use and the instance is reused"""
+    calls = []
+    
+    class Service:
+        def __init__(self):
+            calls.append(1)
+            self.mode = 'unix'
+    
+    service = LazyObject(Service)
+    assert not service.loaded and calls == []
+    
+    service.mode = 'windows'
+    assert service.mode == 'windows'
+    assert service.loaded and calls == [1]
+
+if __name__ == "__main__":
+    test_lazy_import_defers_execution()
+    test_lazy_object_builds_once_on_use()
+    print("✅ Lazy loading tests passed!")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test script for resource limits and usage accounting
+"""
+
+import os
+
+from limits import ResourceLimits, SessionBudget, Usage, run_limited
+
+def run(command, limits, timeout=10):
+    lines = []
+    result = run_limited(command, os.getcwd(), limits, lines.append, timeout)
+    return result, lines
+
+def test_usage_is_collected_with_wait4():
+    result, lines = run('echo one; echo two; exit 3', ResourceLimits())
+    assert lines == ['one', 'two']
+    assert result.return_code == 3
+    assert result.output_bytes == len('one\ntwo\n')
+    assert result.usage.wall_time > 0 and result.usage.max_rss_kb > 0
+    assert result.violation(ResourceLimits()) is None
+
+def test_cpu_limit_kills_busy_loop():
+    limits = ResourceLimits(cpu_seconds=1)
+    result, _ = run('while :; do :; done', limits)
+    assert result.stopped is None
+    assert result.usage.cpu_time >= 0.9
+    assert 'CPU time limit exceeded' in result.violation(limits)
+
+def test_output_limit_kills_command():
+    limits = ResourceLimits(output_bytes=1000)
+    result, lines = run('yes', limits)
+    assert result.stopped == 'output'
+    assert result.output_bytes == 1000
+    assert sum(len(line) + 1 for line in lines) <= 1001
+    assert 'Output limit exceeded' in result.violation(limits)
+
+def test_timeout_kills_process_group():
+    result, _ = run('sleep 30 & sleep 30', ResourceLimits(), timeout=0.5)
+    assert result.stopped == 'timeout'
+    assert result.usage.wall_time < 5
+
+def test_session_budget():
+    budget = SessionBudget(cpu_seconds=10, output_bytes=100)
+    assert budget.limits_for(ResourceLimits(cpu_seconds=30)).cpu_seconds == 10
+    budget.charge(Usage(1.0, user_time=6.0, system_time=1.0), 50)
+    assert budget.limits_for(ResourceLimits(cpu_seconds=30)).cpu_seconds == 3
+    assert budget.exhausted() is None
+    budget.charge(None, 50)
+    assert 'output limit' in budget.exhausted()
+
+def test_memory_rlimit_is_off_by_default():
+    os.environ.pop('TEST_MAX_MEMORY_MB', None)
+    assert ResourceLimits.from_env('TEST', cpu_default=30).memory_bytes is None
+    os.environ['TEST_MAX_MEMORY_MB'] = '512'
+    try:
+        assert ResourceLimits.from_env('TEST', cpu_default=30).memory_bytes == 512 * 1024 * 1024
+    finally:
+        del os.environ['TEST_MAX_MEMORY_MB']
+
+if __name__ == "__main__":
+    test_usage_is_collected_with_wait4()
+    test_cpu_limit_kills_busy_loop()
+    test_output_limit_kills_command()
+    test_timeout_kills_process_group()
+    test_session_budget()
+    test_memory_rlimit_is_off_by_default()
+    print("✅ Resource limit tests passed!")
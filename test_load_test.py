@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script for the load generator's parsing, statistics and reply matching
+"""
+
+import time
+
+from load_test import LatencyRecorder, LoadClient, parse_mix, percentile
+
+class RecordingSocket:
+    """Stands in for socketio.Client and keeps the ack callbacks"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def emit(self, event, data=None, callback=None):
+        self.callbacks.append((event, callback))
+
+def test_percentile():
+    assert percentile([], 95) == 0.0
+    assert percentile([5], 50) == 5 and percentile([5], 99) == 5
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    # Nearest rank never falls below the first sample
+    assert percentile([1, 2, 3], 0) == 1
+
+def test_parse_mix():
+    assert parse_mix('command=1,suggest=6,sysinfo=2') == {'command': 1.0, 'suggest': 6.0, 'sysinfo': 2.0}
+    # A missing weight counts as 1, blanks are ignored
+    assert parse_mix(' command , sysinfo=0.5,') == {'command': 1.0, 'sysinfo': 0.5}
+    for bad in ('bogus=1', '', 'command=0', 'command=x'):
+        try:
+            parse_mix(bad)
+            assert False, bad
+        except ValueError:
+            pass
+
+def test_acks_are_matched_per_request():
+    recorder = LatencyRecorder()
+    client = LoadClient('http://127.0.0.1:1', {'command': 1}, recorder, 1, ['pwd'], ['ls'], None)
+    client.sio = RecordingSocket()
+    for _ in range(3):
+        client._send('command')
+    first, second, third = (callback for _, callback in client.sio.callbacks)
+    # Sent 3, 2 and 1 seconds ago
+    now = time.perf_counter()
+    for request_id in client.pending:
+        client.pending[request_id] = ('command', now - 4 + request_id)
+
+    # Out of order: the last request is answered first, the first one is shed
+    third({'type': 'output'})
+    first({'type': 'busy'})
+    second({'type': 'output'})
+    assert not client.pending
+    assert recorder.sent['command'] == 3
+    assert recorder.shed['command'] == 1
+    assert len(recorder.samples['command']) == 2
+    # Each sample is timed from its own request, not the oldest one pending
+    third_latency, second_latency = recorder.samples['command']
+    assert 1 <= third_latency < 1.5 and 2 <= second_latency < 2.5
+
+    # Late or repeated acks are ignored
+    third({'type': 'output'})
+    assert len(recorder.samples['command']) == 2
+
+if __name__ == "__main__":
+    test_percentile()
+    test_parse_mix()
+    test_acks_are_matched_per_request()
+    print("✅ Load test helper tests passed!")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Test script for the Prometheus metrics registry
+"""
+
+from metrics import Registry
+
+def test_counter_and_gauge():
+    """Counters accumulate per label set; gauges move both ways"""
+    registry = Registry()
+    events = registry.counter('events_total', 'Events', ['handler'])
+    sessions = registry.gauge('sessions', 'Sessions')
+    
+    events.inc('command')
+    events.inc('command', amount=2)
+    events.inc('get_system_info')
+    sessions.inc()
+    sessions.inc()
+    sessions.dec()
+    
+    output = registry.render()
+    assert 'events_total{handler="command"} 3' in output
+    assert 'events_total{handler="get_system_info"} 1' in output
+    assert 'sessions 1' in output
+    assert '# TYPE events_total counter' in output
+
+def test_histogram_buckets():
+    """Histogram buckets are cumulative and end with +Inf"""
+    registry = Registry()
+    latency = registry.histogram('latency_seconds', 'Latency', ['handler'], buckets=(0.1, 1.0))
+    
+    latency.observe('ls', value=0.05)
+    latency.observe('ls', value=0.1)
+    latency.observe('ls', value=0.5)
+    latency.observe('ls', value=3.0)
+    
+    output = registry.render()
+    assert 'latency_seconds_bucket{handler="ls",le="0.1"} 2' in output
+    assert 'latency_seconds_bucket{handler="ls",le="1"} 3' in output
+    assert 'latency_seconds_bucket{handler="ls",le="+Inf"} 4' in output
+    assert 'latency_seconds_count{handler="ls"} 4' in output
+
+def test_label_escaping():
+    """Label values are escaped for the text exposition format"""
+    registry = Registry()
+    counter = registry.counter('odd_total', 'Odd labels', ['name'])
+    counter.inc('say "hi"\n')
+    
+    assert 'odd_total{name="say \\"hi\\"\\n"} 1' in registry.render()
+
+if __name__ == "__main__":
+    test_counter_and_gauge()
+    test_histogram_buckets()
+    test_label_escaping()
+    
+    print("✨ Metrics tests passed!")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent PTY-backed shell
+"""
+
+import os
+import signal
+import tempfile
+
+from pty_shell import PtyShell
+
+def test_exit_status_and_state_persist():
+    shell = PtyShell(tempfile.gettempdir())
+    try:
+        output, status, timed_out = shell.run('echo hello')
+        assert (output.strip(), status, timed_out) == ('hello', 0, False)
+        assert shell.run('false')[1] == 1
+        assert shell.run('(exit 7)')[1] == 7
+        # Variables and the directory survive between commands
+        shell.run('export GREETING=hi; cd /')
+        assert shell.run('echo $GREETING')[0].strip() == 'hi'
+        assert shell.cwd_now() == '/'
+    finally:
+        shell.close()
+
+def test_output_is_streamed():
+    shell = PtyShell(tempfile.gettempdir())
+    chunks = []
+    try:
+        output, status, _ = shell.run('for i in 1 2 3; do echo line$i; done', on_output=chunks.append)
+        assert output == '' and status == 0
+        assert ''.join(chunks).split() == ['line1', 'line2', 'line3']
+    finally:
+        shell.close()
+
+def test_timeout_interrupts_with_ctrl_c():
+    shell = PtyShell(tempfile.gettempdir())
+    try:
+        shell.run('export KEPT=yes')
+        pid = shell.pid
+        _, status, timed_out = shell.run('sleep 30', timeout=0.5)
+        assert timed_out
+        # bash reports the interrupted command as 128 + SIGINT
+        assert status == 128 + signal.SIGINT
+        # Same shell, still usable
+        assert shell.pid == pid
+        assert shell.run('echo $KEPT')[0].strip() == 'yes'
+    finally:
+        shell.close()
+
+def test_restart_after_exit_or_death():
+    shell = PtyShell(tempfile.gettempdir())
+    try:
+        shell.run('true')
+        first = shell.pid
+        output, status, timed_out = shell.run('exit', timeout=5)
+        assert status is None and not timed_out
+        assert shell.run('echo again')[0].strip() == 'again'
+        assert shell.pid != first
+
+        # Killed from outside: the next command starts a new shell
+        second = shell.pid
+        os.kill(second, signal.SIGKILL)
+        os.waitpid(second, 0)
+        output, status, _ = shell.run('echo revived', timeout=5)
+        assert (output.strip(), status) == ('revived', 0)
+        assert shell.pid != second
+    finally:
+        shell.close()
+
+def test_restart_in_given_directory():
+    start_dir = tempfile.mkdtemp()
+    later_dir = tempfile.mkdtemp()
+    shell = PtyShell(start_dir)
+    try:
+        assert shell.run('pwd')[0].strip() == os.path.realpath(start_dir)
+        shell.run('exit', timeout=5)
+        # The session moved on since the first start; the new bash follows it
+        assert shell.run('pwd', cwd=later_dir)[0].strip() == os.path.realpath(later_dir)
+        # A running shell keeps its own directory
+        assert shell.run('pwd', cwd=start_dir)[0].strip() == os.path.realpath(later_dir)
+    finally:
+        shell.close()
+
+if __name__ == "__main__":
+    test_exit_status_and_state_persist()
+    test_output_is_streamed()
+    test_timeout_interrupts_with_ctrl_c()
+    test_restart_after_exit_or_death()
+    test_restart_in_given_directory()
+    print("✅ PTY shell tests passed!")
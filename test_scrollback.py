@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script for the scrollback spool
+"""
+
+from scrollback import ScrollbackStore
+
+def test_small_output_is_inline():
+    """Outputs that fit in head + tail are sent whole and not kept"""
+    store = ScrollbackStore()
+    spool = store.open()
+    for i in range(10):
+        spool.write(f"line {i}")
+    result = store.finish(spool, {'type': 'output'})
+    
+    assert result['output'] == '\n'.join(f"line {i}" for i in range(10))
+    assert 'spool' not in result
+    assert store.get(spool.id) is None
+
+def test_large_output_is_paged():
+    """Large outputs are previewed and the middle is fetched by page"""
+    store = ScrollbackStore(page_lines=100, head_lines=10, tail_lines=20)
+    spool = store.open()
+    for i in range(10000):
+        spool.write(str(i))
+    result = store.finish(spool, {'type': 'output'})
+    
+    meta = result['spool']
+    assert meta['total_lines'] == 10000
+    assert meta['head_lines'] == 10 and meta['tail_lines'] == 20
+    lines = result['output'].split('\n')
+    assert lines[:10] == [str(i) for i in range(10)]
+    assert 'more lines' in lines[10]
+    assert lines[11:] == [str(i) for i in range(9980, 10000)]
+    
+    page, evicted = store.get(meta['id']).read(5050, 100)
+    assert page == [str(i) for i in range(5050, 5150)]
+    assert not evicted
+    # The preview lines are not counted against the byte cap, so they are
+    # dropped once sent; the pages still have the whole output
+    assert not spool.head and not spool.tail
+    assert store.get(meta['id']).read(0, 10)[0] == lines[:10]
+
+def test_store_is_size_capped():
+    """The oldest pages are evicted once the compressed size cap is hit"""
+    store = ScrollbackStore(max_bytes=4096, page_lines=50, head_lines=5, tail_lines=5)
+    spool = store.open()
+    for i in range(20000):
+        spool.write(f"{i:08x} some incompressible-ish text {i * 7919 % 104729}")
+    store.finish(spool, {'type': 'output'})
+    
+    assert store.total_bytes <= 4096
+    lines, evicted = spool.read(0, 10)
+    assert evicted
+    lines, evicted = spool.read(19990, 10)
+    assert not evicted and lines[-1].startswith(f"{19999:08x}")
+
+def test_spool_result_for_builtins():
+    """Already-built results are spooled only when they are too large"""
+    store = ScrollbackStore(head_lines=5, tail_lines=5)
+    small = store.spool_result({'type': 'output', 'output': 'a\nb'})
+    assert small['output'] == 'a\nb' and 'spool' not in small
+    
+    large = store.spool_result({'type': 'output', 'output': '\n'.join(map(str, range(100)))})
+    assert large['spool']['total_lines'] == 100
+
+if __name__ == "__main__":
+    test_small_output_is_inline()
+    test_large_output_is_paged()
+    test_store_is_size_capped()
+    test_spool_result_for_builtins()
+    
+    print("✨ Scrollback tests passed!")
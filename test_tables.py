@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script for structured builtin results
+"""
+
+import tables
+from tables import Table, FormatError, FORMATS, MSGPACK, encode, shape_result
+
+def make_table():
+    table = Table([('pid', 'int'), ('name', 'str'), ('cpu', 'percent')])
+    table.add(1, 'init', 0.0)
+    table.add(42, 'python', 12.5)
+    table.add(7, 'sshd', None)
+    return table
+
+def test_sort_filter_and_render():
+    table = make_table()
+    assert [row[0] for row in table.sorted('cpu', reverse=True).rows] == [42, 1, 7]
+    assert [row[0] for row in table.sorted('name').rows] == [1, 42, 7]
+    assert table.filtered('name', lambda name: name.startswith('py')).records() == [
+        {'pid': 42, 'name': 'python', 'cpu': 12.5}]
+    assert table.render().splitlines() == [
+        'PID  NAME    CPU',
+        '1    init    0.0%',
+        '42   python  12.5%',
+        '7    sshd    -',
+    ]
+    assert Table.from_dict(table.to_dict()).rows == table.rows
+
+def test_shape_result_picks_text_or_table():
+    result = {'type': 'output', 'output': 'text', 'table': make_table().to_dict()}
+    assert shape_result(dict(result), 'text') == {'type': 'output', 'output': 'text'}
+    assert 'output' not in shape_result(dict(result), 'json')
+    # Results without a table keep their text in every format
+    assert shape_result({'type': 'output', 'output': 'x'}, 'json') == {'type': 'output', 'output': 'x'}
+
+def test_encode():
+    result = {'type': 'output', 'table': make_table().to_dict()}
+    assert encode(result, 'json') is result
+    try:
+        encode(result, 'xml')
+        assert False
+    except FormatError:
+        pass
+    if tables.msgpack is None:
+        # Not advertised, and refused like any unknown format
+        assert MSGPACK not in FORMATS
+        try:
+            encode(result, MSGPACK)
+            assert False
+        except FormatError:
+            pass
+        return
+    assert MSGPACK in FORMATS
+    assert tables.msgpack.unpackb(encode(result, MSGPACK)) == result
+
+if __name__ == "__main__":
+    test_sort_filter_and_render()
+    test_shape_result_picks_text_or_table()
+    test_encode()
+    print("✅ Table tests passed!")
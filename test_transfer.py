@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test script for HTTP file download and upload
+"""
+
+import io
+import os
+import tempfile
+
+from transfer import TransferError, parse_content_range, receive_upload, upload_status
+
+def test_upload_resumes_with_content_range():
+    data = os.urandom(3000)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'file.bin')
+        status = receive_upload(io.BytesIO(data[:1000]), path, content_range='bytes 0-999/3000')
+        assert status == {'path': path, 'received': 1000, 'complete': False}
+        assert upload_status(path)['received'] == 1000 and not os.path.exists(path)
+        
+        # Gaps are refused; resuming at or before the end of the part works
+        try:
+            receive_upload(io.BytesIO(data[2000:]), path, content_range='bytes 2000-2999/3000')
+            assert False
+        except TransferError as e:
+            assert e.status == 416 and e.details['received'] == 1000
+        status = receive_upload(io.BytesIO(data[500:]), path, content_range='bytes 500-2999/3000')
+        assert status['complete'] and status['received'] == 3000
+        with open(path, 'rb') as f:
+            assert f.read() == data
+
+def test_upload_without_range_and_limits():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'file.txt')
+        # Chunked bodies have no length and end at EOF
+        assert receive_upload(io.BytesIO(b'hello'), path)['complete']
+        # A body cut short keeps its part for a resumed request
+        assert not receive_upload(io.BytesIO(b'abc'), path, content_length=10)['complete']
+        assert upload_status(path)['received'] == 3
+        for kwargs, status in (({'max_bytes': 4}, 413), ({'content_range': 'bytes 5-1/9'}, 416)):
+            try:
+                receive_upload(io.BytesIO(b'hello'), path, **kwargs)
+                assert False
+            except TransferError as e:
+                assert e.status == status
+    assert parse_content_range('bytes 0-9/*') == (0, 9, None)
+
+def test_download_endpoint():
+    import app
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, 'data.bin'), 'wb') as f:
+            f.write(bytes(range(256)) * 40)
+        terminal = app.TerminalBackend()
+        terminal.session_id = 'transfer-test-session'
+        terminal.current_dir = tmp
+        app.sessions['transfer-test'] = terminal
+        try:
+            client = app.app.test_client()
+            session = {'X-Session-Id': 'transfer-test-session'}
+            url = '/files/download?path=data.bin'
+            response = client.get(url, headers=session)
+            assert response.status_code == 200 and len(response.data) == 10240
+            response = client.get(url, headers=dict(session, Range='bytes=256-511'))
+            assert response.status_code == 206 and response.data == bytes(range(256))
+            assert client.get(url, headers=dict(session, **{'If-None-Match': response.headers['ETag']})).status_code == 304
+            assert client.get(url.replace('data.bin', 'missing'), headers=session).status_code == 404
+            assert client.get(url, headers={'X-Session-Id': 'unknown-session'}).status_code == 404
+            # The session id is never taken from the query string
+            assert client.get(url + '&session=transfer-test-session').status_code == 400
+            
+            # The URLs handed to the browser do not carry the session id
+            result = terminal.execute_command('download data.bin')
+            assert result['type'] == 'download' and 'session' not in result['url']
+            assert 'session' not in terminal.execute_command('upload')['url']
+            
+            response = client.put('/files/upload?path=up.txt', data=b'uploaded', headers=session)
+            assert response.status_code == 201 and response.get_json()['complete']
+            with open(os.path.join(tmp, 'up.txt'), 'rb') as f:
+                assert f.read() == b'uploaded'
+            
+            # Without a browser session there is no URL to hand out
+            terminal.session_id = None
+            assert terminal.execute_command('download data.bin')['type'] == 'error'
+            assert terminal.execute_command('upload')['type'] == 'error'
+        finally:
+            app.sessions.pop('transfer-test', None)
+            terminal.close()
+
+def test_sendfile_under_eventlet_wsgi():
+    """Downloads go out with os.sendfile() on the raw socket of a real eventlet.wsgi server"""
+    import http.client
+    import eventlet
+    import eventlet.wsgi
+    import app
+    from eventlet.patcher import original
+    
+    data = os.urandom(3 * 1024 * 1024 + 123)
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, 'data.bin'), 'wb') as f:
+            f.write(data)
+        terminal = app.TerminalBackend()
+        terminal.session_id = 'sendfile-test-session'
+        terminal.current_dir = tmp
+        app.sessions['sendfile-test'] = terminal
+        
+        listener = eventlet.listen(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        # The server gets its own hub on a real OS thread; this thread is the client
+        server = original('threading').Thread(
+            target=eventlet.wsgi.server, args=(listener, app.app),
+            kwargs={'log_output': False}, daemon=True)
+        server.start()
+        
+        def get(headers=None):
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            try:
+                connection.request('GET', '/files/download?path=data.bin',
+                                   headers=dict(headers or {}, **{'X-Session-Id': 'sendfile-test-session'}))
+                response = connection.getresponse()
+                return response.status, dict(response.getheaders()), response.read()
+            finally:
+                connection.close()
+        
+        sendfile_calls = []
+        real_sendfile = os.sendfile
+        def counting_sendfile(*args):
+            sendfile_calls.append(args[2:])
+            return real_sendfile(*args)
+        os.sendfile = counting_sendfile
+        try:
+            status, headers, body = get()
+            assert status == 200 and body == data
+            assert headers['Connection'] == 'close'
+            assert sendfile_calls and sendfile_calls[0][0] == 0
+            
+            del sendfile_calls[:]
+            status, headers, body = get({'Range': 'bytes=1048576-1049599'})
+            assert status == 206 and body == data[1048576:1049600]
+            assert headers['Content-Range'] == f'bytes 1048576-1049599/{len(data)}'
+            assert sendfile_calls == [(1048576, 1024)]
+            
+            # Not modified: no body, and nothing for sendfile to do
+            del sendfile_calls[:]
+            status, _, body = get({'If-None-Match': headers['ETag']})
+            assert status == 304 and body == b'' and not sendfile_calls
+            
+            # The server keeps serving after connections it handled itself
+            assert get()[0] == 200
+        finally:
+            os.sendfile = real_sendfile
+            listener.close()
+            app.sessions.pop('sendfile-test', None)
+            terminal.close()
+
+if __name__ == "__main__":
+    test_upload_resumes_with_content_range()
+    test_upload_without_range_and_limits()
+    test_download_endpoint()
+    test_sendfile_under_eventlet_wsgi()
+    print("✅ Transfer tests passed!")
@@ -0,0 +1,241 @@
+"""
+File download and upload over HTTP for terminal sessions.
+
+Downloads go through Flask's send_file, which handles conditional requests
+and Range. Its file is wrapped by SendfileWrapper (installed as
+wsgi.file_wrapper, which eventlet.wsgi does not provide), and
+SendfileMiddleware hands such responses to os.sendfile() on the raw client
+socket. The file is then copied by the kernel instead of being read into
+Python in chunks. Servers without a raw socket, and TLS connections, get
+the same wrapper as a plain chunked iterator.
+
+Uploads are copied from the request stream to a `<name>.part` file one
+chunk at a time and renamed into place when complete. A request with
+`Content-Range: bytes start-end/total` resumes a partial upload.
+"""
+
+import os
+import re
+
+try:
+    import eventlet.hubs
+    import eventlet.wsgi
+except ImportError:
+    eventlet = None
+
+CHUNK_SIZE = 1024 * 1024
+# Largest single sendfile() call; the loop yields to other greenlets between calls
+SENDFILE_CHUNK = 8 * CHUNK_SIZE
+PART_SUFFIX = '.part'
+
+
+class TransferError(Exception):
+    """An upload or download request that cannot be served"""
+
+    def __init__(self, status, message, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+    def to_dict(self):
+        return dict(self.details, error=str(self))
+
+
+class SendfileWrapper:
+    """wsgi.file_wrapper: iterates a file in chunks, or lets the middleware sendfile() it"""
+
+    def __init__(self, file, buffer_size=CHUNK_SIZE):
+        self.file = file
+        self.buffer_size = buffer_size
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        data = self.file.read(self.buffer_size)
+        if not data:
+            raise StopIteration()
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class SendfileMiddleware:
+    """Serve file responses of the wrapped app with os.sendfile() under eventlet.wsgi"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        wrappers = []
+
+        def file_wrapper(file, buffer_size=CHUNK_SIZE):
+            wrapper = SendfileWrapper(file, buffer_size)
+            wrappers.append(wrapper)
+            return wrapper
+
+        environ.setdefault('wsgi.file_wrapper', file_wrapper)
+        sock = _raw_socket(environ)
+        if sock is None:
+            return self.app(environ, start_response)
+
+        response = {}
+
+        def capture(status, headers, exc_info=None):
+            # Held back until we know whether the response is sent with sendfile()
+            response['args'] = (status, headers, exc_info)
+            return self._legacy_write(start_response, response)
+
+        app_iter = self.app(environ, capture)
+        if 'args' not in response:
+            return app_iter
+        status, headers, exc_info = response['args']
+        length = _header(headers, 'Content-Length')
+        if (len(wrappers) != 1 or length is None or environ.get('REQUEST_METHOD') != 'GET'
+                or not status.startswith(('200', '206'))):
+            if 'write' not in response:
+                start_response(status, headers, exc_info)
+            return app_iter
+
+        offset = 0
+        if status.startswith('206'):
+            match = re.match(r'bytes (\d+)-', _header(headers, 'Content-Range') or '')
+            offset = int(match.group(1)) if match else 0
+        try:
+            head = [f'HTTP/1.1 {status}']
+            head += [f'{name}: {value}' for name, value in headers if name.lower() != 'connection']
+            # eventlet closes handled connections, so say so
+            head.append('Connection: close')
+            sock.sendall(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+            sendfile(sock, wrappers[0].fileno(), offset, int(length))
+        except OSError:
+            # Client went away mid-transfer
+            pass
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        eventlet.wsgi.WSGI_LOCAL.already_handled = True
+        return []
+
+    @staticmethod
+    def _legacy_write(start_response, response):
+        def write(data):
+            if 'write' not in response:
+                response['write'] = start_response(*response['args'])
+            response['write'](data)
+        return write
+
+
+def _raw_socket(environ):
+    """The client socket of a plain-HTTP eventlet.wsgi request, or None"""
+    if eventlet is None or environ.get('wsgi.url_scheme') != 'http':
+        return None
+    get_socket = getattr(environ.get('eventlet.input'), 'get_socket', None)
+    sock = get_socket() if get_socket else None
+    if sock is None or hasattr(sock, 'do_handshake'):
+        return None
+    return sock
+
+
+def _header(headers, name):
+    for key, value in headers:
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+def sendfile(sock, fd, offset, count):
+    """os.sendfile() `count` bytes to a non-blocking green socket, waiting cooperatively"""
+    while count > 0:
+        try:
+            sent = os.sendfile(sock.fileno(), fd, offset, min(count, SENDFILE_CHUNK))
+        except BlockingIOError:
+            eventlet.hubs.trampoline(sock.fileno(), write=True)
+            continue
+        if sent == 0:
+            break
+        offset += sent
+        count -= sent
+
+
+def parse_content_range(value):
+    """(start, end, total) from 'bytes start-end/total'; total is None for '*'"""
+    match = re.fullmatch(r'bytes (\d+)-(\d+)/(\d+|\*)', value.strip())
+    if not match:
+        raise TransferError(400, f'Invalid Content-Range: {value}')
+    start, end = int(match.group(1)), int(match.group(2))
+    total = None if match.group(3) == '*' else int(match.group(3))
+    if end < start or (total is not None and end >= total):
+        raise TransferError(416, f'Invalid Content-Range: {value}')
+    return start, end, total
+
+
+def upload_status(path):
+    """How much of an upload to `path` has arrived"""
+    partial = path + PART_SUFFIX
+    if os.path.exists(partial):
+        return {'path': path, 'received': os.path.getsize(partial), 'complete': False}
+    if os.path.isfile(path):
+        return {'path': path, 'received': os.path.getsize(path), 'complete': True}
+    return {'path': path, 'received': 0, 'complete': False}
+
+
+def receive_upload(stream, path, content_length=None, content_range=None, max_bytes=None):
+    """Copy a request body to `path` chunk by chunk; return upload_status()"""
+    if os.path.isdir(path):
+        raise TransferError(409, f'{path}: Is a directory')
+    if not os.path.isdir(os.path.dirname(path) or '.'):
+        raise TransferError(404, f'{os.path.dirname(path)}: No such directory')
+    partial = path + PART_SUFFIX
+    if content_range:
+        start, end, total = parse_content_range(content_range)
+        length = end - start + 1
+        received = os.path.getsize(partial) if os.path.exists(partial) else 0
+        if start > received:
+            raise TransferError(416, f'Upload must resume at byte {received}', received=received)
+    else:
+        start, length, total = 0, content_length, content_length
+    size = total if total is not None else (start + length if length is not None else None)
+    if max_bytes and size is not None and size > max_bytes:
+        raise TransferError(413, f'Upload exceeds the limit of {max_bytes} bytes')
+
+    with open(partial, 'r+b' if start else 'wb') as f:
+        f.truncate(start)
+        f.seek(start)
+        copied = copy_stream(stream, f, length, None if not max_bytes else max_bytes - start)
+
+    received = start + copied
+    if length is not None and copied < length:
+        # Connection dropped: keep the part for a resumed request
+        return {'path': path, 'received': received, 'complete': False}
+    if content_range and (total is None or received < total):
+        return {'path': path, 'received': received, 'complete': False}
+    os.replace(partial, path)
+    return {'path': path, 'received': received, 'complete': True}
+
+
+def copy_stream(stream, f, length=None, max_bytes=None):
+    """Copy up to `length` bytes (all if None) from `stream` to `f`, never buffering more than a chunk"""
+    copied = 0
+    while length is None or copied < length:
+        data = stream.read(CHUNK_SIZE if length is None else min(CHUNK_SIZE, length - copied))
+        if not data:
+            break
+        copied += len(data)
+        if max_bytes is not None and copied > max_bytes:
+            raise TransferError(413, f'Upload exceeds the limit of {max_bytes} bytes')
+        f.write(data)
+    return copied